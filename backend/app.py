@@ -1,455 +1,657 @@
-from flask import Flask, jsonify
+from flask import Flask, Response, copy_current_request_context, g, has_request_context, jsonify, request
 from flask_cors import CORS
-import subprocess
-import re
+import applog
+import executor
+import httpcache
+import metrics
+import oui
+from namecache import NameCache
+from inventory import DeviceInventory
+from liveness import LivenessMonitor, SWEEP_INTERVAL, OFFLINE_AFTER
+from events import EventBroker
+from blocking import is_valid_ip, route_lines
+from reconciler import reconciler
+from blockstore import BlockStore, map_to_current_ips
+from scheduler import Scheduler, ScheduleStore
+from metering import QuotaRule, TrafficMeter, source_from_env
+from scanplan import ScanPlanner, SCAN_BUDGET, MAX_PROBES
+from netiface import hotspot
+from arptable import arp_table
+from firewall import rule_index
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+import argparse
+import contextvars
+import functools
 import json
+import logging
+import os
+import queue
 import time
-import socket
-from concurrent.futures import ThreadPoolExecutor, as_completed
-from functools import lru_cache
 import threading
 
+try:
+    from waitress import serve as waitress_serve
+except ImportError:  # Serveur de production absent : repli sur le serveur Flask (sans debug)
+    waitress_serve = None
+
+applog.setup_logging()
+log = logging.getLogger("hotspot")
+
 app = Flask(__name__)
 CORS(app)  # Permet les requêtes cross-origin depuis React
 
 # Cache pour les noms d'appareils
-device_name_cache = {}
-cache_lock = threading.Lock()
-CACHE_DURATION = 300  # 5 minutes
+NAME_CACHE_FILE = os.environ.get(
+    'HOTSPOT_NAME_CACHE_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'device_names.json')
+)
+name_cache = NameCache(NAME_CACHE_FILE, max_entries=1024, positive_ttl=3600, negative_ttl=60)
+name_cache.load()
+SCAN_INTERVAL = 5  # Intervalle du scan d'inventaire en arrière-plan
+DEVICE_FIELDS = ("ip", "mac", "name", "type", "vendor", "status", "presence", "last_seen")  # colonnes du format compact
+RULES_CACHE_TTL = 30  # secondes ; invalidé dès qu'un blocage modifie l'IP
+scan_planner = ScanPlanner(
+    time_budget=float(os.environ.get('HOTSPOT_SCAN_BUDGET', SCAN_BUDGET)),
+    max_probes=int(os.environ.get('HOTSPOT_MAX_PROBES', MAX_PROBES))
+)
+
+# Service HTTP : threads de requêtes, dont une partie toujours libre pour les lectures
+HTTP_THREADS = int(os.environ.get('HOTSPOT_THREADS', 8))
+FIREWALL_WORKERS = int(os.environ.get('HOTSPOT_FIREWALL_WORKERS', 1))
+FIREWALL_TIMEOUT = 60  # secondes d'attente maximale d'une opération sur le pare-feu
+RESERVED_READ_THREADS = 2
 
-@lru_cache(maxsize=256)
 def get_device_type_by_mac(mac):
-    """Détermine le type d'appareil basé sur l'adresse MAC (avec cache)"""
+    """Détermine le type d'appareil à partir du fabricant (base OUI)"""
     try:
-        # Types génériques basés sur les patterns
-        if any(x in mac.upper() for x in ['DC:85', '34:CF', '98:B8']):
-            return 'Mobile/IoT'
-        elif any(x in mac.upper() for x in ['00:1A', '00:50']):
-            return 'Ordinateur'
-        else:
-            return 'Appareil réseau'
-            
+        return oui.lookup(mac)[1]
     except:
         return 'Inconnu'
 
-def get_device_name_fast(ip):
-    """Version rapide de récupération du nom avec cache et timeout"""
-    current_time = time.time()
+def get_device_vendor(mac):
+    try:
+        return oui.lookup(mac)[0]
+    except:
+        return None
+
+def short_name(hostname):
+    """Nom d'hôte sans le domaine (.mshome.net, .local...)"""
+    return hostname.strip().split('.')[0]
+
+def default_device_name(ip):
+    return f"Appareil-{ip.split('.')[-1]}"
+
+def get_device_names(ips_macs):
+    """Noms de plusieurs appareils : cache, puis une seule résolution asynchrone groupée"""
+    return resolve_device_names(ips_macs)[0]
+
+def resolve_device_names(ips_macs, probe=None, timeout=None):
+    """Retourne ``(noms, résultats de résolution)``.
+
+    ``probe`` limite la résolution à ces ``(ip, mac)`` (plan du scan) ; sans
+    plan, tous les noms absents ou périmés sont résolus.
+    """
+    with metrics.section("names"):
+        return _resolve_device_names(ips_macs, probe, timeout)
+
+def _resolve_device_names(ips_macs, probe, timeout):
+    names = {}
+    missing = []
     
-    # Vérifier le cache
-    with cache_lock:
-        if ip in device_name_cache:
-            cached_name, timestamp = device_name_cache[ip]
-            if current_time - timestamp < CACHE_DURATION:
-                return cached_name
+    for ip, mac in ips_macs:
+        cached = name_cache.lookup(ip, mac)
+        if cached:
+            names[ip] = cached[0]
+            if cached[1]:
+                continue
+        if probe is None:
+            missing.append((ip, mac))
+        else:
+            # Hors plan : nom connu (même périmé) ou nom par défaut, sans requête
+            names.setdefault(ip, default_device_name(ip))
+    if probe is not None:
+        missing = list(probe)
     
-    # Essayer seulement la méthode la plus rapide
-    try:
-        # Méthode 1: Résolution DNS inverse avec timeout très court
-        socket.setdefaulttimeout(2)  # 2 secondes maximum
-        try:
-            hostname = socket.gethostbyaddr(ip)[0]
-            if hostname and hostname != ip and '.' in hostname:
-                # Extraire juste le nom de l'hôte sans le domaine
-                device_name = hostname.split('.')[0]
-                with cache_lock:
-                    device_name_cache[ip] = (device_name, current_time)
-                return device_name
-        except:
-            pass
-        
-        # Méthode 2: ping rapide avec résolution de nom
+    resolved = {}
+    if missing:
         try:
-            # Ping avec timeout de 1 seconde et résolution de nom
-            ping_result = subprocess.check_output(
-                f'ping -a -n 1 -w 1000 {ip}', 
-                shell=True, 
-                timeout=3,
-                stderr=subprocess.DEVNULL,
-                text=True
-            )
-            match = re.search(r'Pinging ([^\s\[]+)', ping_result)
-            if match and match.group(1) != ip:
-                device_name = match.group(1).split('.')[0]  # Nom sans domaine
-                with cache_lock:
-                    device_name_cache[ip] = (device_name, current_time)
-                return device_name
-        except:
-            pass
-        
-        # Nom par défaut basé sur l'IP
-        default_name = f"Appareil-{ip.split('.')[-1]}"
-        with cache_lock:
-            device_name_cache[ip] = (default_name, current_time)
-        return default_name
-            
-    except Exception:
-        # En cas d'erreur, retourner un nom par défaut
-        default_name = f"Appareil-{ip.split('.')[-1]}"
-        with cache_lock:
-            device_name_cache[ip] = (default_name, current_time)
-        return default_name
-    finally:
-        socket.setdefaulttimeout(None)  # Reset timeout
-
-def process_device(ip, mac):
-    """Traite un appareil individuel en parallèle"""
+            resolved = executor.resolve_names([ip for ip, _ in missing], nameserver=hotspot.get().gateway,
+                                              timeout=timeout)
+        except Exception as e:
+            log.warning("Erreur de résolution des noms: %s", e)
+            resolved = {}
+        for ip, mac in missing:
+            hostname = resolved.get(ip)
+            if hostname:
+                names[ip] = short_name(hostname)
+                name_cache.store(ip, mac, names[ip], resolved=True)
+            else:
+                # Un nom connu (même périmé) reste préférable au nom par défaut
+                names.setdefault(ip, default_device_name(ip))
+                name_cache.store(ip, mac, names[ip], resolved=False)
+        name_cache.save()
+    
+    return names, resolved
+
+def get_device_name_fast(ip, mac=None):
+    """Nom d'un seul appareil (voir get_device_names)"""
+    return get_device_names([(ip, mac)])[ip]
+
+def format_last_seen(seen):
+    return time.strftime("%H:%M:%S", time.localtime(seen)) if seen else None
+
+def process_device(ip, mac, device_name=None, device_status=None):
+    """Construit la fiche d'un appareil"""
     try:
-        device_name = get_device_name_fast(ip)
+        if device_name is None:
+            device_name = get_device_name_fast(ip, mac)
         device_type = get_device_type_by_mac(mac)
-        device_status = get_device_status_fast(ip)
+        if device_status is None:
+            device_status = get_device_status_fast(ip)
         
         return {
             "ip": ip,
             "mac": mac,
             "name": device_name,
             "type": device_type,
+            "vendor": get_device_vendor(mac),
             "status": device_status,
-            "last_seen": time.strftime("%H:%M:%S")
+            "presence": liveness.presence(ip, mac),
+            "last_seen": format_last_seen(liveness.last_seen(ip, mac))
         }
     except Exception as e:
-        print(f"Erreur lors du traitement de {ip}: {e}")
+        log.warning("Erreur lors du traitement de %s: %s", ip, e)
         return None
 
 def get_device_status_fast(ip):
-    """Version rapide de vérification du statut"""
+    """Statut lu dans l'index des règles (un seul netsh pour tous les appareils)"""
     try:
-        # Vérification rapide des règles firewall seulement
-        result = subprocess.check_output(
-            f'netsh advfirewall firewall show rule name="HOTSPOT_BLOCK_{ip}_OUT"',
-            shell=True,
-            timeout=2,
-            stderr=subprocess.DEVNULL,
-            text=True
-        )
-        return "blocked" if "HOTSPOT_BLOCK_" in result else "active"
+        with metrics.section("status"):
+            return "blocked" if rule_index.is_blocked(ip) else "active"
     except:
         return "active"
 
+last_scan_trace = None
+
 def get_devices():
-    """Version optimisée avec parallélisation"""
+    """Scan complet, tracé : la répartition du dernier scan est servie par /devices?trace=1"""
+    global last_scan_trace
+    with metrics.trace() as scan_trace:
+        devices = scan_devices()
+    last_scan_trace = scan_trace
+    return devices
+
+def scan_devices():
+    """Scan complet : table ARP, noms (en lot) et statut (index des règles)"""
     devices = []
     
     try:
-        # Récupération rapide des IPs et MACs
-        arp_result = subprocess.check_output(
-            "arp -a",
-            shell=True,
-            timeout=5,
-            text=True
-        )
-        
-        # Extraction des IPs et MACs du hotspot
-        device_ips_macs = []
-        for line in arp_result.splitlines():
-            match = re.search(r'(\d+\.\d+\.\d+\.\d+)\s+([a-fA-F0-9-:]{17})', line)
-            if match and "192.168.137" in match.group(1):
-                ip = match.group(1)
-                mac = match.group(2)
-                # Éviter l'IP de la passerelle
-                if not ip.endswith('.1'):
-                    device_ips_macs.append((ip, mac))
-        
-        # Traitement en parallèle avec un maximum de 8 threads
-        with ThreadPoolExecutor(max_workers=min(8, len(device_ips_macs))) as executor:
-            # Soumettre toutes les tâches
-            futures = {
-                executor.submit(process_device, ip, mac): (ip, mac) 
-                for ip, mac in device_ips_macs
-            }
-            
-            # Récupérer les résultats avec timeout
-            for future in as_completed(futures, timeout=10):
-                try:
-                    result = future.result(timeout=5)
-                    if result:
-                        devices.append(result)
-                except Exception as e:
-                    ip, mac = futures[future]
-                    print(f"Timeout/erreur pour {ip}: {e}")
-                    # Ajouter un appareil avec des infos minimales
-                    devices.append({
-                        "ip": ip,
-                        "mac": mac,
-                        "name": f"Appareil-{ip.split('.')[-1]}",
-                        "type": get_device_type_by_mac(mac),
-                        "status": "active",
-                        "last_seen": time.strftime("%H:%M:%S")
-                    })
+        # Table ARP lue en flux, limitée aux clients du hotspot
+        with metrics.section("arp_table"):
+            arp = arp_table.refresh(hotspot.get())
+        device_ips_macs = list(arp.current.items())
+        if arp.changed:
+            sync_blocklist(arp.current)
+        # Une entrée ARP ne prouve pas la présence : sonde demandée pour les nouvelles
+        liveness.note_arrivals(arp.added)
+        
+        # Statuts lus dans l'index des règles (recherches en mémoire)
+        statuses = {ip: get_device_status_fast(ip) for ip, _ in device_ips_macs}
+        scan_planner.observe(arp.current, statuses)
+        if not device_ips_macs:
+            return devices
+        
+        # Noms : seuls les appareils prioritaires sont sondés, dans le budget du scan
+        probe = scan_planner.plan(arp.current, name_cache.peek)
+        start = time.perf_counter()
+        names, resolved = resolve_device_names(device_ips_macs, probe, timeout=scan_planner.probe_timeout())
+        scan_planner.record(probe, resolved, time.perf_counter() - start)
+        
+        for ip, mac in device_ips_macs:
+            result = process_device(ip, mac, names.get(ip), statuses[ip])
+            if result is None:
+                # Ajouter un appareil avec des infos minimales
+                result = {
+                    "ip": ip,
+                    "mac": mac,
+                    "name": default_device_name(ip),
+                    "type": get_device_type_by_mac(mac),
+                    "status": "active",
+                    "presence": liveness.presence(ip, mac),
+                    "last_seen": format_last_seen(liveness.last_seen(ip, mac))
+                }
+            devices.append(result)
     
     except Exception as e:
-        print(f"Erreur lors de la récupération des appareils: {e}")
+        log.exception("Erreur lors de la récupération des appareils: %s", e)
     
     return devices
 
 def get_network_interface():
-    """Version optimisée de récupération de l'interface"""
-    try:
-        result = subprocess.check_output('ipconfig', shell=True, timeout=3, text=True)
-        lines = result.split('\n')
-        
-        for i, line in enumerate(lines):
-            if "192.168.137.1" in line:
-                # Remonte pour trouver le nom de l'interface
-                for j in range(i-1, max(0, i-10), -1):
-                    if "adaptateur" in lines[j].lower() or "adapter" in lines[j].lower():
-                        interface_name = lines[j].split(':')[0].strip()
-                        return interface_name
-                break
-        return None
-    except:
-        return None
+    """Nom de la carte du hotspot (détection partagée, voir netiface)"""
+    return hotspot.get().interface
+
+inventory = DeviceInventory(get_devices, interval=SCAN_INTERVAL)
+event_broker = EventBroker(boot_id=httpcache.BOOT_ID)
+inventory.add_listener(event_broker.on_snapshot)
+
+liveness = LivenessMonitor(
+    hotspot.get, arp_table.entries,
+    interval=float(os.environ.get('HOTSPOT_SWEEP_INTERVAL', SWEEP_INTERVAL)),
+    offline_after=float(os.environ.get('HOTSPOT_OFFLINE_AFTER', OFFLINE_AFTER))
+)
+# Présence modifiée : nouvel instantané sans attendre le prochain scan
+liveness.add_listener(lambda ips: inventory.refresh())
+
+device_bodies = httpcache.VersionedBodies()
+rules_cache = httpcache.ResultCache(ttl=RULES_CACHE_TTL)
+
+def after_block_change(ips):
+    """Invalide les caches concernés et publie le nouveau statut quand le pare-feu a été modifié"""
+    desired = reconciler.desired()
+    for ip in ips:
+        name_cache.invalidate(ip)
+        rules_cache.invalidate(ip)
+    # /devices reflète le blocage tout de suite ; le scan demandé confirme ensuite
+    inventory.patch({ip: {"status": "blocked" if ip in desired else "active"} for ip in ips})
+    inventory.refresh()
+
+reconciler.add_listener(after_block_change)
+
+block_store = BlockStore()
+restore_lock = threading.Lock()
+blocklist_restore = None
+
+def start_background_tasks():
+    """Scan d'inventaire, réconciliation périodique et programmations (idempotent)"""
+    restore_blocklist()
+    inventory.start()
+    liveness.start()
+    reconciler.start()
+    scheduler.start()
+    traffic_meter.start()
+
+@app.before_request
+def begin_request_trace():
+    g.request_started = time.perf_counter()
+    metrics.begin_trace()
+
+@app.after_request
+def record_request_metrics(response):
+    """Histogramme par endpoint et, sur demande (?trace=1 ou X-Trace), en-tête Server-Timing"""
+    duration = time.perf_counter() - g.get('request_started', time.perf_counter())
+    endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+    metrics.request_duration.observe(duration, endpoint, request.method, response.status_code)
+    if request.args.get('trace') or request.headers.get('X-Trace'):
+        timings = [f'total;dur={duration * 1000:.1f}']
+        trace = metrics.current_trace()
+        if trace:
+            timings += trace.server_timing()
+        if request.endpoint in ('devices', 'status') and last_scan_trace:
+            # Ces endpoints lisent l'instantané : on joint la répartition du dernier scan
+            timings += last_scan_trace.server_timing(prefix='scan_')
+        response.headers['Server-Timing'] = ', '.join(timings)
+    return response
+
+@app.teardown_request
+def end_request_trace(error=None):
+    metrics.end_trace()
+
+@app.route("/metrics")
+def prometheus_metrics():
+    """Histogrammes de latence et compteurs au format texte Prometheus"""
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 @app.route("/devices")
 def devices():
-    start_time = time.time()
-    result = jsonify(get_devices())
-    end_time = time.time()
-    print(f"⏱️ Récupération des appareils terminée en {end_time - start_time:.2f}s")
-    return result
+    """Dernier instantané de l'inventaire (le scan tourne en arrière-plan)
 
-@app.route("/block/<ip>")
-def block(ip):
-    try:
-        print(f"\n{'='*70}")
-        print(f"🚫 BLOCAGE DE {ip} - MÉTHODE HOTSPOT")
-        print(f"{'='*70}")
-        
-        # ÉTAPE 0: Nettoyage complet
-        print(f"\n📋 NETTOYAGE: Suppression des anciennes règles...")
-        subprocess.run(
-            f'netsh advfirewall firewall delete rule name=all remoteip={ip}',
-            shell=True, capture_output=True, text=True, timeout=10
-        )
-        subprocess.run(
-            f'netsh advfirewall firewall delete rule name=all localip={ip}',
-            shell=True, capture_output=True, text=True, timeout=10
-        )
-        
-        # STRATÉGIE: Bloquer TOUS les protocoles dans TOUTES les directions
-        # en ciblant spécifiquement le trafic passant par l'interface hotspot
-        
-        print(f"\n📋 CRÉATION DES RÈGLES DE BLOCAGE...")
-        
-        rules = []
-        success_count = 0
-        
-        # RÈGLE 1: Bloquer TOUT le trafic sortant depuis cette IP vers Internet
-        # (Bloque HTTP, HTTPS, DNS, tout protocole)
-        rule1 = {
-            'name': f'HOTSPOT_BLOCK_{ip}_OUT',
-            'cmd': f'netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_{ip}_OUT" dir=out action=block localip={ip} interfacetype=any'
-        }
-        rules.append(rule1)
-        
-        # RÈGLE 2: Bloquer tout le trafic entrant vers cette IP depuis Internet
-        rule2 = {
-            'name': f'HOTSPOT_BLOCK_{ip}_IN',
-            'cmd': f'netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_{ip}_IN" dir=in action=block remoteip={ip} interfacetype=any'
-        }
-        rules.append(rule2)
-        
-        # RÈGLE 3: Bloquer spécifiquement les protocoles web (TCP 80, 443)
-        rule3 = {
-            'name': f'HOTSPOT_BLOCK_{ip}_WEB',
-            'cmd': f'netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_{ip}_WEB" dir=out action=block protocol=TCP localip={ip} remoteport=80,443'
-        }
-        rules.append(rule3)
-        
-        # RÈGLE 4: Bloquer le DNS (port 53)
-        rule4 = {
-            'name': f'HOTSPOT_BLOCK_{ip}_DNS',
-            'cmd': f'netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_{ip}_DNS" dir=out action=block protocol=UDP localip={ip} remoteport=53'
-        }
-        rules.append(rule4)
-        
-        # RÈGLE 5: Bloquer ICMP (ping)
-        rule5 = {
-            'name': f'HOTSPOT_BLOCK_{ip}_ICMP',
-            'cmd': f'netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_{ip}_ICMP" dir=out action=block protocol=icmpv4 localip={ip}'
+    ETag = version de l'inventaire : ``If-None-Match`` donne un 304 tant que rien
+    n'a changé. ``?format=compact`` renvoie un tableau de tableaux ; gzip si accepté.
+    """
+    start_background_tasks()
+    snapshot = inventory.snapshot(wait=15)
+    info = snapshot.info()
+    headers = {
+        'X-Inventory-Version': str(info['version']),
+        'X-Last-Scan': str(info['last_scan']),
+        'X-Scan-Duration': str(info['scan_duration']),
+    }
+
+    def payload(fmt):
+        if fmt == 'compact':
+            return {**httpcache.compact(snapshot.device_list(), DEVICE_FIELDS), "version": info['version']}
+        return snapshot.device_list()
+
+    return httpcache.versioned_response(info['version'], payload, headers, bodies=device_bodies)
+
+@app.route("/devices/version")
+def devices_version():
+    """Version de l'inventaire : relève légère par un contrôleur avant de relire /devices"""
+    start_background_tasks()
+    snapshot = inventory.snapshot(wait=15)
+    return jsonify({"version": snapshot.version, "boot": httpcache.BOOT_ID})
+
+@app.route("/devices/stream")
+def devices_stream():
+    """Flux SSE : instantané initial puis événements joined/left/name_resolved/blocked/active/presence"""
+    start_background_tasks()
+    if event_broker.subscriber_count() >= max_streams:
+        # Chaque flux occupe un thread du serveur : on en garde pour les autres requêtes
+        return jsonify({"error": "Trop de flux ouverts", "success": False}), 503, {"Retry-After": "5"}
+    stream = event_broker.stream(lambda: inventory.snapshot(wait=15), request.headers.get('Last-Event-ID'))
+    return Response(stream, mimetype='text/event-stream', headers={
+        'Cache-Control': 'no-cache',
+        'X-Accel-Buffering': 'no'
+    })
+
+def request_actor():
+    """Auteur d'une action : adresse du client HTTP (et client d'origine derrière un contrôleur)"""
+    if not has_request_context():
+        return None
+    origin = request.headers.get('X-Hotspot-Actor')
+    return f"{origin} via {request.remote_addr}" if origin else request.remote_addr
+
+def block_devices(ips, reason=None, actor=None):
+    """Enregistre l'intention de blocage (par MAC) puis l'applique"""
+    restore_blocklist()
+    arp_entries = arp_table.entries()
+    hotspot_info = hotspot.get()
+    for ip in ips:
+        # Une IP refusée par le réconciliateur ne doit pas être restaurée au démarrage
+        if hotspot_info.contains(ip):
+            block_store.add(ip, mac=arp_entries.get(ip), reason=reason)
+    results, duration = reconciler.block(ips)
+    actor = actor or request_actor()
+    for ip, result in results.items():
+        applog.audit("block", ip, actor=actor, mac=arp_entries.get(ip), reason=reason,
+                     success=result['success'], rules=result.get('rules'), route=result.get('route'),
+                     changes=result.get('changes'), duration=round(duration, 3))
+    return results, duration
+
+def unblock_devices(ips, actor=None):
+    restore_blocklist()
+    arp_entries = arp_table.entries()
+    for ip in ips:
+        block_store.remove(ip, mac=arp_entries.get(ip))
+    results, duration = reconciler.unblock(ips)
+    actor = actor or request_actor()
+    for ip, result in results.items():
+        applog.audit("unblock", ip, actor=actor, mac=arp_entries.get(ip), success=result['success'],
+                     removed=result.get('removed'), duration=round(duration, 3))
+    return results, duration
+
+def apply_schedule(action, jobs):
+    """Applique en un seul lot les programmations arrivées à échéance"""
+    ip_by_mac = {mac: ip for ip, mac in arp_table.entries().items()}
+    ips = [ip_by_mac.get(job['mac'], job['ip']) if job['mac'] else job['ip'] for job in jobs]
+    if action == 'block':
+        results, duration = block_devices(ips, reason="programmation", actor="scheduler")
+    else:
+        results, duration = unblock_devices(ips, actor="scheduler")
+    log.info("Programmation: %s de %d appareils en %.2fs", action, len(ips), duration)
+    return results
+
+scheduler = Scheduler(apply_schedule, ScheduleStore())
+log.info("%d programmations rechargées", scheduler.load())
+
+def metered_clients():
+    """Clients connectés et non bloqués (source de trafic simulée)"""
+    blocked = reconciler.desired()
+    return [ip for ip in arp_table.entries() if ip not in blocked]
+
+def on_quota_exceeded(ips, rule):
+    """Dépassement de quota : même chemin de blocage que /block"""
+    ips = [ip for ip in ips if ip not in reconciler.desired()]
+    if ips:
+        results, duration = block_devices(ips, reason=f"quota {rule.limit_bytes / 1e6:g} Mo / {rule.window:g}s",
+                                          actor="quota")
+        log.warning("Quota dépassé: %d appareils bloqués en %.2fs", len(ips), duration, extra={"ips": ips})
+
+traffic_meter = TrafficMeter(source_factory=lambda: source_from_env(metered_clients, hotspot.get()))
+traffic_meter.add_listener(on_quota_exceeded)
+
+def restore_blocklist():
+    """Réapplique en un seul lot les blocages enregistrés (une fois, au démarrage)"""
+    global blocklist_restore
+    with restore_lock:
+        if blocklist_restore is not None:
+            return blocklist_restore
+        start = time.time()
+        arp = arp_table.refresh(hotspot.get())
+        entries = block_store.entries()
+        if not entries:
+            # Première exécution : reprendre les blocages déjà présents dans le pare-feu
+            reconciler.reconcile(scope=())
+            for ip in reconciler.desired():
+                block_store.add(ip, mac=arp.current.get(ip), reason="repris du pare-feu")
+            entries = block_store.entries()
+        
+        desired, moves = map_to_current_ips(entries, arp.current)
+        block_store.update_ips(moves)
+        reconciler.set_desired(desired)
+        _, plan = reconciler.reconcile()
+        
+        blocklist_restore = {
+            "restored_devices": len(entries),
+            "moved_ips": len(moves),
+            "operations": len(plan),
+            "duration": round(time.time() - start, 3)
         }
-        rules.append(rule5)
-        
-        # Créer toutes les règles
-        for rule in rules:
-            print(f"\n   🔧 {rule['name']}")
-            result = subprocess.run(
-                rule['cmd'],
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=15
-            )
-            
-            if result.returncode == 0 and "Ok." in result.stdout:
-                print(f"   ✅ Créée")
-                success_count += 1
-            else:
-                print(f"   ❌ Échec: {result.stderr}")
-        
-        # ÉTAPE CRITIQUE: Bloquer au niveau du routage avec une route statique
-        print(f"\n📋 BLOCAGE AU NIVEAU ROUTAGE...")
+        log.info("%d blocages restaurés en %.2fs (%d opérations)", len(entries),
+                 blocklist_restore['duration'], len(plan), extra=blocklist_restore)
+        return blocklist_restore
+
+def sync_blocklist(arp_entries):
+    """Suit les appareils bloqués qui ont changé d'IP (nouveau bail DHCP) ou dont l'IP a été réattribuée"""
+    if blocklist_restore is None:
+        return
+    desired, moves = map_to_current_ips(block_store.entries(), arp_entries)
+    previous = reconciler.desired()
+    if moves or desired != previous:
+        block_store.update_ips(moves)
+        reconciler.set_desired(desired)
+        reconciler.reconcile(scope=previous ^ desired)
+        if moves:
+            log.info("%d appareils bloqués ont changé d'IP", len(moves), extra={"moves": moves})
+
+def request_ips():
+    """Liste d'IPs du corps JSON : {"ips": [...]} ou directement [...]"""
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('ips')
+    if isinstance(data, list) and all(isinstance(ip, str) for ip in data):
+        return data
+    return None
+
+firewall_pool = ThreadPoolExecutor(max_workers=FIREWALL_WORKERS, thread_name_prefix="firewall")
+firewall_slots = None
+max_streams = None
+# Place pare-feu de la requête en cours : {"release": ..., "kept": bool}
+current_firewall_slot = contextvars.ContextVar('current_firewall_slot', default=None)
+
+def configure_workers(threads):
+    """Répartit les threads HTTP : flux SSE, opérations pare-feu et lectures"""
+    global firewall_slots, max_streams
+    max_streams = max(1, threads // 4)
+    firewall_slots = threading.BoundedSemaphore(max(1, threads - max_streams - RESERVED_READ_THREADS))
+
+configure_workers(HTTP_THREADS)
+
+def firewall_route(view):
+    """Exécute la vue sur le worker pare-feu dédié.
+
+    Les commandes netsh/route lentes ne s'exécutent jamais sur les threads
+    du serveur, et le nombre de requêtes pare-feu en attente est borné pour
+    que /devices et /status restent servis pendant un gros blocage.
+    """
+    @functools.wraps(view)
+    def wrapper(*args, **kwargs):
+        slots = firewall_slots
+        if not slots.acquire(blocking=False):
+            return jsonify({"error": "Pare-feu occupé, réessayez", "success": False}), 503, {"Retry-After": "1"}
+        slot = {"release": slots.release, "kept": False}
         try:
-            # Ajouter une route statique qui redirige tout le trafic de cette IP vers nulle part
-            route_cmd = f'route add {ip} mask 255.255.255.255 0.0.0.0 metric 1'
-            route_result = subprocess.run(
-                route_cmd,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            
-            if route_result.returncode == 0 or "existe" in route_result.stdout.lower():
-                print(f"   ✅ Route de blocage ajoutée")
-                success_count += 1
-            else:
-                print(f"   ⚠️  Route: {route_result.stdout.strip()}")
-        except Exception as e:
-            print(f"   ⚠️  Erreur route: {e}")
-        
-        # Forcer la déconnexion
-        print(f"\n📋 DÉCONNEXION FORCÉE...")
+            # La trace de la requête suit la vue dans le worker
+            context = contextvars.copy_context()
+            context.run(current_firewall_slot.set, slot)
+            future = firewall_pool.submit(context.run, copy_current_request_context(view), *args, **kwargs)
+        except BaseException:
+            slots.release()
+            raise
+        # Place libérée à la fin de l'opération, même si la requête a abandonné l'attente,
+        # sauf si la vue l'a gardée pour une tâche qui continue après la réponse
+        future.add_done_callback(lambda _: slot["kept"] or slots.release())
         try:
-            # Supprimer l'entrée ARP pour forcer reconnexion
-            subprocess.run(f'arp -d {ip}', shell=True, timeout=5, capture_output=True)
-            print(f"   ✅ Cache ARP vidé")
-            
-            # Optionnel: Tuer les connexions existantes avec netstat (si possible)
-            subprocess.run(
-                f'netsh interface ip delete arpcache',
-                shell=True, timeout=5, capture_output=True
-            )
-        except:
-            pass
-        
-        with cache_lock:
-            if ip in device_name_cache:
-                del device_name_cache[ip]
-        
-        print(f"\n{'='*70}")
-        print(f"📊 RÉSULTAT: {success_count} protections activées")
-        
-        if success_count >= 3:
-            print(f"✅ BLOCAGE MULTI-COUCHES ACTIF")
-            print(f"{'='*70}\n")
-            return jsonify({
+            return future.result(timeout=FIREWALL_TIMEOUT)
+        except FutureTimeout:
+            return jsonify({"error": "Opération pare-feu trop longue (toujours en cours)", "success": False}), 504
+    return wrapper
+
+def keep_firewall_slot():
+    """Garde la place pare-feu de la vue en cours après sa réponse.
+
+    Retourne la fonction qui la libère (sans effet hors d'une ``firewall_route``).
+    """
+    slot = current_firewall_slot.get()
+    if slot is None:
+        return lambda: None
+    slot["kept"] = True
+    return slot["release"]
+
+@app.route("/block/<ip>")
+@firewall_route
+def block(ip):
+    if not is_valid_ip(ip):
+        return jsonify({"status": f"Invalid IP {ip}", "success": False}), 400
+    try:
+        minutes = request.args.get('minutes', type=float)
+        if minutes is not None and minutes <= 0:
+            return jsonify({"status": "minutes doit être positif", "success": False}), 400
+        # Un nouveau blocage remplace un éventuel déblocage programmé
+        scheduler.cancel_for(ip)
+        results, duration = block_devices([ip], reason=request.args.get('reason'))
+        result = results[ip]
+        log.info("Blocage de %s : %d protections en %.2fs", ip, result['protections'], duration)
+        
+        if result['success']:
+            response = {
                 "status": f"Blocked {ip}",
                 "success": True,
-                "protections": success_count
-            })
-        else:
-            print(f"⚠️  BLOCAGE PARTIEL")
-            print(f"{'='*70}\n")
-            return jsonify({
-                "status": f"Partial block {ip}",
-                "success": False,
-                "protections": success_count
-            }), 500
+                "protections": result['protections']
+            }
+            if minutes is not None:
+                # Blocage temporaire : déblocage programmé
+                job = scheduler.schedule_once('unblock', ip, time.time() + minutes * 60,
+                                              mac=arp_table.entries().get(ip))
+                response["unblock_at"] = job['due_at']
+                response["schedule_id"] = job['id']
+                log.info("Déblocage automatique de %s à %s", ip, job['due_at'])
+            return jsonify(response)
+        log.warning("Blocage partiel de %s (%d protections)", ip, result['protections'])
+        return jsonify({
+            "status": f"Partial block {ip}",
+            "success": False,
+            "protections": result['protections']
+        }), 500
     
     except Exception as e:
-        print(f"\n❌ ERREUR: {e}")
-        import traceback
-        traceback.print_exc()
+        log.exception("Erreur de blocage de %s: %s", ip, e)
         return jsonify({
             "status": f"Error: {str(e)}",
             "success": False
         }), 500
 
 @app.route("/unblock/<ip>")
+@firewall_route
 def unblock(ip):
+    if not is_valid_ip(ip):
+        return jsonify({"status": f"Invalid IP {ip}", "success": False}), 400
     try:
-        print(f"\n{'='*70}")
-        print(f"✅ DÉBLOCAGE DE {ip}")
-        print(f"{'='*70}")
-        
-        deleted = 0
-        
-        # Supprimer toutes les règles firewall
-        print(f"📋 Suppression des règles firewall...")
-        rule_names = [
-            f'HOTSPOT_BLOCK_{ip}_OUT',
-            f'HOTSPOT_BLOCK_{ip}_IN',
-            f'HOTSPOT_BLOCK_{ip}_WEB',
-            f'HOTSPOT_BLOCK_{ip}_DNS',
-            f'HOTSPOT_BLOCK_{ip}_ICMP'
-        ]
-        
-        for rule_name in rule_names:
-            result = subprocess.run(
-                f'netsh advfirewall firewall delete rule name="{rule_name}"',
-                shell=True, capture_output=True, text=True, timeout=10
-            )
-            if "Ok." in result.stdout:
-                deleted += 1
-        
-        # Nettoyage complet
-        subprocess.run(
-            f'netsh advfirewall firewall delete rule name=all remoteip={ip}',
-            shell=True, capture_output=True, timeout=10
-        )
-        subprocess.run(
-            f'netsh advfirewall firewall delete rule name=all localip={ip}',
-            shell=True, capture_output=True, timeout=10
-        )
-        
-        # CRITIQUE: Supprimer la route statique
-        print(f"📋 Suppression de la route de blocage...")
-        try:
-            route_cmd = f'route delete {ip}'
-            route_result = subprocess.run(
-                route_cmd,
-                shell=True,
-                capture_output=True,
-                text=True,
-                timeout=10
-            )
-            if route_result.returncode == 0:
-                print(f"   ✅ Route supprimée")
-                deleted += 1
-            else:
-                print(f"   ℹ️  {route_result.stdout.strip()}")
-        except Exception as e:
-            print(f"   ⚠️  {e}")
-        
-        # Rafraîchir ARP
-        subprocess.run(f'arp -d {ip}', shell=True, timeout=5, capture_output=True)
-        subprocess.run('netsh interface ip delete arpcache', shell=True, timeout=5, capture_output=True)
-        
-        with cache_lock:
-            if ip in device_name_cache:
-                del device_name_cache[ip]
-        
-        print(f"✅ Déblocage terminé ({deleted} protections retirées)")
-        print(f"{'='*70}\n")
+        scheduler.cancel_for(ip)
+        results, duration = unblock_devices([ip])
+        log.info("Déblocage de %s : %d protections retirées en %.2fs", ip, results[ip]['removed'], duration)
         
         return jsonify({
             "status": f"Unblocked {ip}",
             "success": True,
-            "removed": deleted
+            "removed": results[ip]['removed']
         })
     
     except Exception as e:
-        print(f"❌ Erreur: {e}\n")
+        log.exception("Erreur de déblocage de %s: %s", ip, e)
         return jsonify({
             "status": f"Error: {str(e)}",
             "success": False
         }), 500
 
+@app.route("/block", methods=["POST"])
+@firewall_route
+def block_batch():
+    """Bloque plusieurs appareils en une seule transaction netsh"""
+    ips = request_ips()
+    if not ips:
+        return jsonify({"error": "Corps JSON attendu: {\"ips\": [...]}", "success": False}), 400
+    try:
+        data = request.get_json(silent=True)
+        reason = data.get('reason') if isinstance(data, dict) else None
+        results, duration = block_devices(ips, reason=reason)
+        log.info("Blocage groupé de %d appareils en %.2fs", len(ips), duration)
+        return jsonify({
+            "results": results,
+            "success": all(r['success'] for r in results.values()),
+            "duration": round(duration, 3)
+        })
+    except Exception as e:
+        log.exception("Erreur blocage groupé: %s", e)
+        return jsonify({"error": str(e), "success": False}), 500
+
+@app.route("/unblock", methods=["POST"])
+@firewall_route
+def unblock_batch():
+    """Débloque plusieurs appareils en une seule transaction netsh"""
+    ips = request_ips()
+    if not ips:
+        return jsonify({"error": "Corps JSON attendu: {\"ips\": [...]}", "success": False}), 400
+    try:
+        results, duration = unblock_devices(ips)
+        log.info("Déblocage groupé de %d appareils en %.2fs", len(ips), duration)
+        return jsonify({
+            "results": results,
+            "success": all(r['success'] for r in results.values()),
+            "duration": round(duration, 3)
+        })
+    except Exception as e:
+        log.exception("Erreur déblocage groupé: %s", e)
+        return jsonify({"error": str(e), "success": False}), 500
+
 @app.route("/status")
 def status():
     """Endpoint pour vérifier le statut du serveur"""
     try:
-        devices = get_devices()
+        start_background_tasks()
+        snapshot = inventory.snapshot(wait=15)
+        devices = snapshot.device_list()
+        info = snapshot.info()
         return jsonify({
             "status": "running",
             "hotspot_active": check_hotspot_status(),
             "interface": get_network_interface(),
-            "connected_devices": len(devices),
-            "blocked_devices": len([d for d in devices if d['status'] == 'blocked'])
+            "gateway": hotspot.get().gateway,
+            "subnet": str(hotspot.get().network),
+            "connected_devices": len([d for d in devices if d.get('presence') != 'offline']),
+            "offline_devices": len([d for d in devices if d.get('presence') == 'offline']),
+            "blocked_devices": len([d for d in devices if d['status'] == 'blocked']),
+            "inventory_version": info['version'],
+            "blocklist_restore": blocklist_restore,
+            "scheduled_actions": scheduler.pending(),
+            "scan_plan": scan_planner.info(),
+            "liveness": liveness.info(),
+            "last_scan": info['last_scan'],
+            "scan_duration": info['scan_duration']
         })
     except Exception as e:
-        print(f"Erreur status: {e}")
+        log.exception("Erreur status: %s", e)
         return jsonify({
             "status": "error",
             "hotspot_active": False,
@@ -459,121 +661,256 @@ def status():
         })
 
 def check_hotspot_status():
-    """Version optimisée de vérification du hotspot"""
-    try:
-        result = subprocess.check_output('ipconfig', shell=True, timeout=3, text=True)
-        return "192.168.137.1" in result
-    except:
-        return False
+    """Le hotspot est actif si sa carte a été trouvée dans ipconfig"""
+    return hotspot.get().active
 
 @app.route("/cache/clear")
 def clear_cache():
-    """Endpoint pour vider le cache des noms"""
-    with cache_lock:
-        device_name_cache.clear()
+    """Endpoint pour vider le cache des noms et des règles"""
+    name_cache.clear()
+    rules_cache.clear()
     return jsonify({"status": "Cache cleared", "success": True})
 
 @app.route("/cache/info")
 def cache_info():
-    """Informations sur le cache"""
-    with cache_lock:
-        return jsonify({
-            "cached_devices": len(device_name_cache),
-            "cache_entries": list(device_name_cache.keys())
-        })
+    """Informations sur les caches (noms, règles par IP, réponses /devices)"""
+    return jsonify({
+        **name_cache.info(),
+        "rules": rules_cache.info(),
+        "device_bodies": {"hits": device_bodies.hits, "misses": device_bodies.misses}
+    })
+
+def read_rules(ip):
+    """Règles de pare-feu et routes d'une IP"""
+    rules_found = rule_index.rules_for(ip)
+    
+    # Vérifier aussi les routes
+    routes = route_lines(ip)
+    
+    return {
+        "ip": ip,
+        "rules_count": len(rules_found),
+        "rules": rules_found,
+        "routes": '\n'.join(routes) or None
+    }
 
 @app.route("/rules/<ip>")
 def check_rules(ip):
     """Vérifier les règles de pare-feu pour une IP spécifique"""
+    if not is_valid_ip(ip):
+        return jsonify({"error": f"Invalid IP {ip}"}), 400
     try:
-        result = subprocess.run(
-            'netsh advfirewall firewall show rule name=all',
-            shell=True, capture_output=True, text=True, timeout=15
-        )
-        
-        rules_found = []
-        current_rule = {}
-        
-        for line in result.stdout.split('\n'):
-            line = line.strip()
-            
-            if line.startswith('Rule Name:'):
-                if current_rule and (ip in str(current_rule.values())):
-                    rules_found.append(current_rule)
-                current_rule = {'name': line.split(':', 1)[1].strip()}
-            elif ':' in line and current_rule:
-                key, value = line.split(':', 1)
-                current_rule[key.strip()] = value.strip()
-        
-        if current_rule and (ip in str(current_rule.values())):
-            rules_found.append(current_rule)
-        
-        # Vérifier aussi les routes
-        route_result = subprocess.run(
-            f'route print | findstr {ip}',
-            shell=True, capture_output=True, text=True, timeout=5
-        )
-        
-        return jsonify({
-            "ip": ip,
-            "rules_count": len(rules_found),
-            "rules": rules_found,
-            "routes": route_result.stdout.strip() if route_result.stdout else None
-        })
+        # Résultat gardé RULES_CACHE_TTL secondes, invalidé par block/unblock
+        return httpcache.cached_response(rules_cache.get(ip, lambda: read_rules(ip)))
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route("/blocklist")
+def blocklist():
+    """Appareils bloqués enregistrés (par MAC) et résultat de la restauration au démarrage"""
+    return jsonify({
+        "devices": block_store.entries(),
+        "restore": restore_blocklist()
+    })
+
+def schedule_request(data):
+    """Crée les programmations décrites par le corps JSON de POST /schedules"""
+    ips = data.get('ips') or ([data['ip']] if data.get('ip') else [])
+    if not ips or not all(isinstance(ip, str) and is_valid_ip(ip) for ip in ips):
+        raise ValueError("IP(s) invalide(s) : \"ip\" ou \"ips\" attendu")
+    arp_entries = arp_table.entries()
+    jobs = []
+    if data.get('start') and data.get('end'):
+        for ip in ips:
+            jobs.append(scheduler.schedule_daily(ip, data['start'], data['end'], mac=arp_entries.get(ip)))
+        return jobs
+    
+    if data.get('at') is not None:
+        due = float(data['at'])
+    elif data.get('in_minutes') is not None:
+        due = time.time() + float(data['in_minutes']) * 60
+    else:
+        raise ValueError("\"at\", \"in_minutes\" ou \"start\"/\"end\" attendu")
+    for ip in ips:
+        jobs.append(scheduler.schedule_once(data.get('action', 'block'), ip, due, mac=arp_entries.get(ip)))
+    return jobs
+
+@app.route("/schedules")
+def list_schedules():
+    """Programmations en attente (blocages temporaires et plages quotidiennes)"""
+    return jsonify({"schedules": scheduler.jobs(), "pending": scheduler.pending()})
+
+@app.route("/schedules", methods=["POST"])
+def create_schedule():
+    """Programme un blocage/déblocage ponctuel ou une plage quotidienne"""
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        return jsonify({"error": "Corps JSON attendu", "success": False}), 400
+    try:
+        jobs = schedule_request(data)
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({"error": str(e), "success": False}), 400
+    start_background_tasks()
+    return jsonify({"schedules": jobs, "success": True})
+
+@app.route("/schedules/<job_id>", methods=["DELETE"])
+def delete_schedule(job_id):
+    if not scheduler.cancel(job_id):
+        return jsonify({"error": f"Programmation inconnue: {job_id}", "success": False}), 404
+    return jsonify({"status": f"Schedule {job_id} cancelled", "success": True})
+
+@app.route("/traffic")
+def traffic():
+    """Débit et volume cumulé de chaque appareil"""
+    start_background_tasks()
+    window = request.args.get('window', 10, type=float)
+    return jsonify({**traffic_meter.info(), "traffic": traffic_meter.rates(window)})
+
+@app.route("/traffic/<ip>")
+def traffic_history(ip):
+    """Historique des débits d'un appareil (``limit`` derniers intervalles)"""
+    if not is_valid_ip(ip):
+        return jsonify({"error": f"Invalid IP {ip}"}), 400
+    history = traffic_meter.history(ip, request.args.get('limit', type=int))
+    if history is None:
+        return jsonify({"error": f"Aucun trafic mesuré pour {ip}"}), 404
+    return jsonify({"ip": ip, "interval": traffic_meter.interval, "history": history})
+
+@app.route("/traffic/quotas", methods=["GET", "POST", "DELETE"])
+def traffic_quotas():
+    """Quotas de blocage automatique : {"quotas": [{"limit_mb": 500, "window": 900}]}"""
+    if request.method == "POST":
+        data = request.get_json(silent=True)
+        rules = data.get('quotas', [data]) if isinstance(data, dict) else data
+        if not isinstance(rules, list):
+            return jsonify({"error": "Quota invalide: liste de quotas attendue", "success": False}), 400
+        try:
+            traffic_meter.set_quotas([QuotaRule.from_dict(rule) for rule in rules])
+        except ValueError as e:
+            # Messages rédigés par QuotaRule / TrafficMeter, sans détail interne
+            return jsonify({"error": f"Quota invalide: {e}", "success": False}), 400
+    elif request.method == "DELETE":
+        traffic_meter.set_quotas([])
+    return jsonify({"quotas": traffic_meter.info()['quotas'], "success": True})
+
+@app.route("/rules/reconcile")
+@firewall_route
+def reconcile_rules():
+    """Passe de réconciliation immédiate : répare les règles et routes manquantes ou en trop"""
+    try:
+        _, plan = reconciler.reconcile()
+        return jsonify({**reconciler.info(), "operations": len(plan), "success": True})
+    except Exception as e:
+        return jsonify({"error": str(e), "success": False}), 500
+
+def run_cleanup(dry_run=False, actor=None, progress=None):
+    """Nettoyage complet du pare-feu (voir BlockReconciler.cleanup)"""
+    if not dry_run:
+        block_store.clear()
+    result = reconciler.cleanup(dry_run=dry_run, progress=progress)
+    if not dry_run:
+        rules_cache.clear()
+        inventory.refresh()
+        log.info("Nettoyage complet : %d règles et %d routes supprimées en %.1fs",
+                 result['rules_deleted'], result['routes_deleted'], result['duration'])
+        applog.audit("cleanup", "*", actor=actor, rules_deleted=result['rules_deleted'],
+                     routes_deleted=result['routes_deleted'], duration=round(result['duration'], 3))
+    return result
+
+def stream_cleanup(dry_run, actor):
+    """Lance le nettoyage sur le worker pare-feu et diffuse sa progression (NDJSON)"""
+    events = queue.SimpleQueue()
+
+    def job():
+        try:
+            run_cleanup(dry_run, actor, progress=events.put)
+        except Exception as e:
+            log.exception("Erreur de nettoyage: %s", e)
+            events.put({"phase": "error", "error": str(e), "success": False})
+
+    # Le nettoyage continue après la réponse : sa place n'est rendue qu'à la fin
+    release = keep_firewall_slot()
+    try:
+        future = firewall_pool.submit(contextvars.copy_context().run, job)
+    except BaseException:
+        release()
+        raise
+    future.add_done_callback(lambda _: release())
+
+    def generate():
+        while True:
+            event = events.get()
+            yield json.dumps(event, ensure_ascii=False) + '\n'
+            if event['phase'] in ('done', 'error'):
+                return
+
+    return Response(generate(), mimetype='application/x-ndjson', headers={'X-Accel-Buffering': 'no'})
+
 @app.route("/rules/cleanup")
+@firewall_route
 def cleanup_all_rules():
-    """Supprimer toutes les règles de blocage créées par l'application"""
+    """Supprimer toutes les règles et routes de blocage créées par l'application
+
+    ``?dry_run=1`` liste seulement ce qui serait supprimé ; ``?stream=1`` renvoie
+    la progression au fil de l'eau, une ligne JSON par étape.
+    """
+    dry_run = request.args.get('dry_run', '').lower() in ('1', 'true', 'yes')
+    if request.args.get('stream'):
+        return stream_cleanup(dry_run, request_actor())
     try:
-        print(f"\n🧹 NETTOYAGE COMPLET")
-        
-        result = subprocess.run(
-            'netsh advfirewall firewall show rule name=all',
-            shell=True, capture_output=True, text=True, timeout=15
-        )
-        
-        rules_to_delete = []
-        for line in result.stdout.split('\n'):
-            if 'Rule Name:' in line and 'HOTSPOT_BLOCK_' in line:
-                rule_name = line.split('Rule Name:')[1].strip()
-                rules_to_delete.append(rule_name)
-        
-        deleted = 0
-        for rule_name in set(rules_to_delete):
-            result = subprocess.run(
-                f'netsh advfirewall firewall delete rule name="{rule_name}"',
-                shell=True, capture_output=True, timeout=5, text=True
-            )
-            if result.returncode == 0:
-                deleted += 1
-        
-        # Nettoyer aussi toutes les routes vers 192.168.137.x
-        subprocess.run(
-            'route print | findstr "192.168.137" | findstr "255.255.255.255"',
-            shell=True, capture_output=True, timeout=5
-        )
-        
-        print(f"✅ {deleted} règles supprimées\n")
-        
+        result = run_cleanup(dry_run, request_actor())
         return jsonify({
-            "status": "cleanup completed",
-            "rules_deleted": deleted,
-            "success": True
+            "status": "dry run" if dry_run else "cleanup completed",
+            **result,
+            "success": dry_run or (not result['remaining_rules'] and not result['remaining_routes'])
         })
     except Exception as e:
+        log.exception("Erreur de nettoyage: %s", e)
         return jsonify({"error": str(e), "success": False}), 500
 
+def serve(host="0.0.0.0", port=5000, threads=HTTP_THREADS, dev=False):
+    """Démarre les tâches de fond puis le serveur HTTP"""
+    configure_workers(threads)
+    if dev:
+        # Serveur de développement : rechargement automatique, un seul démarrage des tâches
+        if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+            start_background_tasks()
+        app.run(host=host, port=port, debug=True, threaded=True)
+        return
+    
+    start_background_tasks()
+    if waitress_serve is not None:
+        log.info("waitress : %d threads de requêtes, %d worker(s) pare-feu", threads, FIREWALL_WORKERS)
+        waitress_serve(app, host=host, port=port, threads=threads, channel_timeout=120)
+    else:
+        log.warning("waitress non installé (pip install waitress) : serveur Flask multithread")
+        app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+
 if __name__ == "__main__":
-    print("🔥 Serveur de gestion du hotspot démarré sur http://0.0.0.0:5000")
+    parser = argparse.ArgumentParser(description="Serveur de gestion du hotspot")
+    parser.add_argument('--host', default=os.environ.get('HOTSPOT_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('HOTSPOT_PORT', 5000)))
+    parser.add_argument('--threads', type=int, default=HTTP_THREADS, help="Threads de requêtes HTTP")
+    parser.add_argument('--dev', action='store_true', help="Serveur de développement Flask (debug, rechargement)")
+    args = parser.parse_args()
+    
+    print(f"🔥 Serveur de gestion du hotspot démarré sur http://{args.host}:{args.port}")
     print("⚠️  IMPORTANT: Exécutez en tant qu'ADMINISTRATEUR!")
     print("\n📋 Endpoints disponibles:")
-    print("   - GET /devices : Liste des appareils")
-    print("   - GET /block/<ip> : Bloquer un appareil") 
+    print("   - GET /devices[?format=compact] : Liste des appareils (ETag, 304 si inchangée)")
+    print("   - GET /devices/version : Version de l'inventaire (relève par un contrôleur)")
+    print("   - GET /devices/stream : Flux SSE des changements d'appareils")
+    print("   - GET /block/<ip>[?minutes=N] : Bloquer un appareil (temporairement)") 
     print("   - GET /unblock/<ip> : Débloquer un appareil")
+    print("   - POST /block, POST /unblock : Blocage/déblocage groupé {\"ips\": [...]}")
+    print("   - GET/POST /schedules, DELETE /schedules/<id> : Blocages programmés")
+    print("   - GET /traffic, GET /traffic/<ip> : Débit et historique par appareil")
+    print("   - GET/POST/DELETE /traffic/quotas : Quotas de blocage automatique")
     print("   - GET /status : Statut du serveur")
+    print("   - GET /metrics : Latences (Prometheus) ; ?trace=1 ajoute Server-Timing")
     print("   - GET /rules/<ip> : Vérifier les règles pour une IP")
-    print("   - GET /rules/cleanup : Nettoyer toutes les règles")
+    print("   - GET /blocklist : Appareils bloqués enregistrés (par MAC)")
+    print("   - GET /rules/reconcile : Réparer l'état de blocage")
+    print("   - GET /rules/cleanup[?dry_run=1&stream=1] : Nettoyer toutes les règles et routes")
     print("\n" + "="*70 + "\n")
-    app.run(host="0.0.0.0", port=5000, debug=True)
\ No newline at end of file
+    serve(args.host, args.port, args.threads, dev=args.dev)
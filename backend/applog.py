@@ -0,0 +1,109 @@
+"""Journalisation structurée (JSON) non bloquante et journal d'audit.
+
+Les modules journalisent avec ``logging.getLogger(__name__)`` ; les
+enregistrements sont déposés dans une file et écrits par un thread
+d'arrière-plan (``QueueListener``), si bien qu'une console Windows lente
+ne ralentit plus les requêtes.
+
+Sorties :
+    console        texte lisible (ou JSON avec HOTSPOT_LOG_FORMAT=json)
+    hotspot.log    tous les enregistrements, JSON, rotation par taille
+    audit.log      actions de blocage/déblocage uniquement, JSON, rotation
+
+Variables d'environnement :
+    HOTSPOT_LOG_LEVEL=INFO     niveau minimal
+    HOTSPOT_LOG_FORMAT=text    format de la console (text|json)
+    HOTSPOT_LOG_DIR=...        dossier des fichiers (défaut : backend/logs)
+"""
+import atexit
+import json
+import logging
+import os
+import queue
+import time
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+LOG_DIR = os.environ.get(
+    'HOTSPOT_LOG_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'logs')
+)
+LOG_MAX_BYTES = 5 * 1024 * 1024
+LOG_BACKUPS = 5
+AUDIT_LOGGER = 'hotspot.audit'
+
+# Attributs standard d'un LogRecord : tout le reste vient de ``extra``
+_RECORD_FIELDS = set(vars(logging.makeLogRecord({}))) | {'message', 'asctime', 'taskName'}
+
+audit_log = logging.getLogger(AUDIT_LOGGER)
+_listener = None
+
+
+class JsonFormatter(logging.Formatter):
+    """Une ligne JSON par enregistrement, champs ``extra`` inclus"""
+
+    def format(self, record):
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.localtime(record.created)) + f".{int(record.msecs):03d}",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        for key, value in record.__dict__.items():
+            if key not in _RECORD_FIELDS and not key.startswith('_'):
+                entry[key] = value
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, ensure_ascii=False, default=str)
+
+
+class _AuditFilter(logging.Filter):
+    def __init__(self, audit):
+        super().__init__()
+        self.audit = audit
+
+    def filter(self, record):
+        return (record.name == AUDIT_LOGGER) == self.audit
+
+
+def setup_logging(level=None, console_format=None, log_dir=LOG_DIR):
+    """Installe la file et le thread d'écriture (idempotent)"""
+    global _listener
+    if _listener is not None:
+        return _listener
+    level = (level or os.environ.get('HOTSPOT_LOG_LEVEL', 'INFO')).upper()
+    console_format = (console_format or os.environ.get('HOTSPOT_LOG_FORMAT', 'text')).lower()
+
+    console = logging.StreamHandler()
+    console.setFormatter(JsonFormatter() if console_format == 'json' else logging.Formatter(
+        "%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S"))
+    handlers = [console]
+    try:
+        os.makedirs(log_dir, exist_ok=True)
+        app_file = RotatingFileHandler(os.path.join(log_dir, 'hotspot.log'), maxBytes=LOG_MAX_BYTES,
+                                       backupCount=LOG_BACKUPS, encoding='utf-8', delay=True)
+        app_file.setFormatter(JsonFormatter())
+        app_file.addFilter(_AuditFilter(False))
+        audit_file = RotatingFileHandler(os.path.join(log_dir, 'audit.log'), maxBytes=LOG_MAX_BYTES,
+                                         backupCount=LOG_BACKUPS, encoding='utf-8', delay=True)
+        audit_file.setFormatter(JsonFormatter())
+        audit_file.addFilter(_AuditFilter(True))
+        handlers += [app_file, audit_file]
+    except OSError as e:
+        console.handle(logging.makeLogRecord({
+            'name': __name__, 'levelno': logging.WARNING, 'levelname': 'WARNING',
+            'msg': f"Journaux fichiers désactivés ({log_dir}): {e}"
+        }))
+
+    log_queue = queue.SimpleQueue()
+    root = logging.getLogger()
+    root.handlers[:] = [QueueHandler(log_queue)]
+    root.setLevel(level)
+    _listener = QueueListener(log_queue, *handlers, respect_handler_level=True)
+    _listener.start()
+    atexit.register(_listener.stop)
+    return _listener
+
+
+def audit(action, ip, actor=None, **fields):
+    """Événement d'audit (blocage, déblocage...) écrit dans audit.log"""
+    audit_log.info("%s %s", action, ip, extra={"action": action, "ip": ip, "actor": actor, **fields})
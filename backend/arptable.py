@@ -0,0 +1,97 @@
+"""Lecture de la table ARP en flux et suivi des entrées ajoutées/retirées.
+
+La sortie de ``arp -a`` est lue ligne par ligne avec des expressions
+précompilées ; l'appartenance au sous-réseau du hotspot est un vrai test
+de réseau (``HotspotInfo.contains``) et les MAC sont normalisées
+(``AA:BB:CC:DD:EE:FF``).
+"""
+import re
+import threading
+
+import executor
+
+# L'IP est validée ensuite par HotspotInfo.contains ; l'expression reste simple pour aller vite
+ENTRY_PATTERN = re.compile(r'\s*([\d.]{7,15})\s+([0-9A-Fa-f]{2}[-:][0-9A-Fa-f-:]{14})(?:\s|$)')
+INTERFACE_PATTERN = re.compile(r'^\s*Interface\s*:\s*(\d{1,3}(?:\.\d{1,3}){3})', re.IGNORECASE)
+_HEX_ONLY = re.compile(r'[^0-9A-Fa-f]')
+
+
+def normalize_mac(mac):
+    """``aa-bb-cc-dd-ee-ff``, ``aabb.ccdd.eeff``... -> ``AA:BB:CC:DD:EE:FF`` (None si invalide)"""
+    if not mac:
+        return None
+    digits = _HEX_ONLY.sub('', mac).upper()
+    if len(digits) != 12:
+        return None
+    return ':'.join(digits[i:i + 2] for i in range(0, 12, 2))
+
+
+def is_group_mac(mac):
+    """Adresse de diffusion ou multicast (bit I/G du premier octet)"""
+    return mac[1] in '13579bBdDfF'
+
+
+def parse_arp_lines(lines, hotspot_info=None):
+    """Génère ``(ip, mac)`` pour chaque client, au fil de la lecture"""
+    skip_section = False
+    for line in lines:
+        match = ENTRY_PATTERN.match(line)
+        if match is None:
+            header = INTERFACE_PATTERN.match(line)
+            if header and hotspot_info is not None and hotspot_info.active:
+                # Sections des autres cartes ignorées sans analyser leurs lignes
+                skip_section = header.group(1) != hotspot_info.gateway
+            continue
+        if skip_section:
+            continue
+
+        ip = match.group(1)
+        if hotspot_info is not None and not hotspot_info.contains(ip):
+            continue
+        # Format déjà validé par l'expression : seule la casse et le séparateur changent
+        mac = match.group(2).replace('-', ':').upper()
+        if not is_group_mac(mac):
+            yield ip, mac
+
+
+class ArpDiff:
+    __slots__ = ('current', 'added', 'removed')
+
+    def __init__(self, current, added, removed):
+        self.current = current
+        self.added = added
+        self.removed = removed
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed)
+
+
+class ArpTable:
+    """Dernière table ARP connue ; chaque mise à jour retourne les différences"""
+
+    def __init__(self):
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def entries(self):
+        with self._lock:
+            return dict(self._entries)
+
+    def update(self, pairs):
+        """Remplace la table ; une IP dont la MAC change est à la fois retirée et ajoutée"""
+        current = dict(pairs)
+        with self._lock:
+            previous = self._entries
+            added = {ip: mac for ip, mac in current.items() if previous.get(ip) != mac}
+            removed = {ip: mac for ip, mac in previous.items() if current.get(ip) != mac}
+            self._entries = current
+        return ArpDiff(current, added, removed)
+
+    def refresh(self, hotspot_info=None, timeout=5):
+        """Lit ``arp -a`` en flux et met la table à jour"""
+        lines = executor.iter_lines("arp -a", timeout=timeout)
+        return self.update(parse_arp_lines(lines, hotspot_info))
+
+
+arp_table = ArpTable()
@@ -0,0 +1,83 @@
+"""Microbenchmark de l'analyse de la table ARP sur de grandes sorties synthétiques.
+
+Compare l'ancienne boucle (``re.search`` non compilé + tests de sous-chaînes)
+à ``arptable.parse_arp_lines`` puis mesure le calcul des différences.
+
+Le nouvel analyseur n'est pas notablement plus rapide (rapport entre 0,8 et
+1,5 selon la taille et la machine) : il fait plus de travail (test réel du
+sous-réseau, filtre des MAC de groupe, normalisation). Le banc vérifie
+qu'il ne coûte pas plus cher ; le gain vient de ``ArpTable.update``, qui
+ne transmet que les différences.
+
+    python benchmarks/bench_arp.py --lines 5000 --repeat 20
+"""
+import argparse
+import os
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+from arptable import ArpTable, parse_arp_lines  # noqa: E402
+from executor import SimulatedHotspot  # noqa: E402
+from netiface import HotspotInfo  # noqa: E402
+
+
+def legacy_parse(output):
+    """Boucle d'origine de get_devices"""
+    pairs = []
+    for line in output.splitlines():
+        match = re.search(r'(\d+\.\d+\.\d+\.\d+)\s+([a-fA-F0-9-:]{17})', line)
+        if match and "192.168.137" in match.group(1):
+            if not match.group(1).endswith('.1'):
+                pairs.append((match.group(1), match.group(2)))
+    return pairs
+
+
+def synthetic_dump(lines):
+    """Sortie arp -a : clients du hotspot puis entrées d'autres cartes"""
+    hotspot = SimulatedHotspot(clients=min(lines // 2, 65000))
+    output = hotspot.arp_output()
+    other = [f"\nInterface: 192.168.1.46 --- 0x7", '  Internet Address      Physical Address      Type']
+    for n in range(lines - len(hotspot.clients)):
+        other.append(f"  10.{n >> 16 & 255}.{n >> 8 & 255}.{n & 255:<14}00-1a-2b-{n >> 16 & 255:02x}-{n >> 8 & 255:02x}-{n & 255:02x}     dynamic")
+    return hotspot, output + '\n'.join(other) + '\n'
+
+
+def best_of(func, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--lines', type=int, default=5000)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    hotspot, output = synthetic_dump(args.lines)
+    info = HotspotInfo('hotspot', hotspot.gateway, hotspot.network, True, time.time())
+    lines = output.splitlines()
+
+    legacy = best_of(lambda: legacy_parse(output), args.repeat)
+    streamed = best_of(lambda: list(parse_arp_lines(lines, info)), args.repeat)
+
+    table = ArpTable()
+    pairs = list(parse_arp_lines(lines, info))
+    table.update(pairs)
+    changed = pairs[1:] + [('192.168.137.254', 'AA:BB:CC:DD:EE:FF')]
+    diff_time = best_of(lambda: table.update(changed) and table.update(pairs), args.repeat) / 2
+
+    print(f"lignes: {len(lines)}  clients du hotspot: {len(pairs)}")
+    print(f"ancienne analyse     : {legacy * 1000:8.2f} ms")
+    print(f"analyse en flux      : {streamed * 1000:8.2f} ms  (rapport {legacy / streamed:.2f})")
+    print(f"différences (update) : {diff_time * 1000:8.2f} ms")
+
+
+if __name__ == '__main__':
+    main()
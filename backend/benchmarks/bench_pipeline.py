@@ -0,0 +1,297 @@
+"""Banc d'essai des chemins scan (get_devices, /devices) et blocage (/block, /unblock).
+
+Chaque nombre d'appareils est mesuré dans un processus séparé, sur le
+hotspot simulé (``HOTSPOT_EXECUTOR=replay``) avec une latence fixe par
+commande, pour partir d'un état propre (caches, règles, base SQLite).
+
+Scénarios :
+    scan_cold            get_devices() caches vidés (ipconfig, arp, netsh, DNS)
+    scan_warm            get_devices() caches chauds
+    block_cold           GET /block/<ip> d'un appareil non bloqué
+    block_warm           GET /block/<ip> d'un appareil déjà bloqué (aucune opération)
+    unblock              GET /unblock/<ip>
+    block_batch          POST /block avec tous les appareils
+    unblock_batch        POST /unblock avec tous les appareils
+    devices_concurrent   GET /devices par N clients simultanés
+
+    python benchmarks/bench_pipeline.py                        # comparaison à baseline.json
+    python benchmarks/bench_pipeline.py --devices 1 50 --latency 0.01
+    python benchmarks/bench_pipeline.py --save-baseline        # enregistre la référence
+
+Chaque nombre d'appareils est mesuré ``--runs`` fois (processus distincts,
+après ``--warmup`` passes non comptées) ; le rapport retient la médiane des
+passes et leur dispersion relative ((max - min) / médiane).
+
+Le code retour vaut 1 si un p50 ou un p95 dépasse la référence de plus de
+la tolérance : ``--threshold`` (25 % par défaut), élargie à deux fois la
+dispersion observée entre passes si elle est plus grande.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+BACKEND_DIR = os.path.dirname(BENCH_DIR)
+BASELINE_FILE = os.path.join(BENCH_DIR, 'baseline.json')
+sys.path.insert(0, BACKEND_DIR)
+DEFAULT_DEVICES = [1, 10, 50, 100, 250, 500]
+NOISE_FLOOR = 0.002  # secondes : écarts plus petits ignorés (bruit de mesure)
+SPREAD_FACTOR = 2    # tolérance minimale en multiples de la dispersion entre passes
+COMPARED_STATS = ('p50', 'p95')
+
+
+def percentile(samples, p):
+    ordered = sorted(samples)
+    if not ordered:
+        return None
+    k = (len(ordered) - 1) * p / 100
+    low = int(k)
+    high = min(low + 1, len(ordered) - 1)
+    return ordered[low] + (ordered[high] - ordered[low]) * (k - low)
+
+
+def summarize(samples, wall=None):
+    """Statistiques d'une série de durées (secondes)"""
+    wall = wall if wall is not None else sum(samples)
+    return {
+        "n": len(samples),
+        "p50": percentile(samples, 50),
+        "p95": percentile(samples, 95),
+        "p99": percentile(samples, 99),
+        "mean": sum(samples) / len(samples),
+        "throughput": len(samples) / wall if wall else None,
+    }
+
+
+def timed(func, *args, **kwargs):
+    start = time.perf_counter()
+    func(*args, **kwargs)
+    return time.perf_counter() - start
+
+
+# --- Mesures dans le processus isolé ---
+
+def run_worker(args):
+    import app
+
+    client = app.app.test_client()
+    results = {}
+
+    def reset_caches():
+        app.name_cache.clear()
+        app.rule_index.invalidate()
+        app.hotspot.invalidate()
+
+    # Passes de chauffe non comptées (imports paresseux, compilation des expressions, SQLite)
+    for _ in range(args.warmup):
+        reset_caches()
+        app.get_devices()
+        app.get_devices()
+
+    cold, warm = [], []
+    for _ in range(args.repeat):
+        reset_caches()
+        cold.append(timed(app.get_devices))
+        warm.append(timed(app.get_devices))
+    results["scan_cold"] = summarize(cold)
+    results["scan_warm"] = summarize(warm)
+
+    # Restauration de la liste de blocage (une fois au démarrage) hors mesure
+    app.restore_blocklist()
+    ips = list(app.arp_table.entries())
+    for ip in ips[:args.warmup]:
+        client.get(f'/block/{ip}')
+        client.get(f'/unblock/{ip}')
+    block_cold, block_warm, unblock = [], [], []
+    for i in range(args.block_samples):
+        # Peu d'appareils : les mêmes sont bloqués plusieurs fois pour garder assez d'échantillons
+        ip = ips[i % len(ips)]
+        block_cold.append(timed(client.get, f'/block/{ip}'))
+        block_warm.append(timed(client.get, f'/block/{ip}'))
+        unblock.append(timed(client.get, f'/unblock/{ip}'))
+    results["block_cold"] = summarize(block_cold)
+    results["block_warm"] = summarize(block_warm)
+    results["unblock"] = summarize(unblock)
+
+    all_ips = list(app.arp_table.entries())
+    for _ in range(args.warmup):
+        client.post('/block', json={"ips": all_ips})
+        client.post('/unblock', json={"ips": all_ips})
+    block_batch, unblock_batch = [], []
+    for _ in range(args.repeat):
+        block_batch.append(timed(client.post, '/block', json={"ips": all_ips}))
+        unblock_batch.append(timed(client.post, '/unblock', json={"ips": all_ips}))
+    results["block_batch"] = summarize(block_batch)
+    results["unblock_batch"] = summarize(unblock_batch)
+
+    # Clients simultanés sur /devices, pendant que le scan tourne en arrière-plan
+    app.start_background_tasks()
+    client.get('/devices')
+    samples = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + args.duration
+
+    def reader():
+        local = []
+        while time.perf_counter() < deadline:
+            local.append(timed(client.get, '/devices'))
+        with lock:
+            samples.extend(local)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=reader) for _ in range(args.clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results["devices_concurrent"] = summarize(samples, wall=time.perf_counter() - start)
+    results["devices_concurrent"]["clients"] = args.clients
+
+    json.dump(results, sys.stdout)
+
+
+def run_once(devices, args):
+    """Lance le processus isolé pour ``devices`` appareils"""
+    with tempfile.TemporaryDirectory(prefix='hotspot_bench_') as tmp:
+        env = dict(
+            os.environ,
+            HOTSPOT_EXECUTOR='replay',
+            HOTSPOT_REPLAY_CLIENTS=str(devices),
+            HOTSPOT_REPLAY_LATENCY=str(args.latency),
+            HOTSPOT_DB_FILE=os.path.join(tmp, 'hotspot.db'),
+            HOTSPOT_NAME_CACHE_FILE=os.path.join(tmp, 'device_names.json'),
+            HOTSPOT_LOG_DIR=os.path.join(tmp, 'logs'),
+            HOTSPOT_LOG_LEVEL='WARNING',
+            HOTSPOT_METER_SOURCE='off',
+        )
+        cmd = [
+            sys.executable, os.path.abspath(__file__), '--worker',
+            '--repeat', str(args.repeat), '--warmup', str(args.warmup), '--block-samples', str(args.block_samples),
+            '--clients', str(args.clients), '--duration', str(args.duration),
+        ]
+        completed = subprocess.run(cmd, cwd=BACKEND_DIR, env=env, capture_output=True, text=True)
+        if completed.returncode != 0:
+            raise RuntimeError(f"Échec de la mesure ({devices} appareils):\n{completed.stderr}")
+        return json.loads(completed.stdout)
+
+
+def merge_runs(runs):
+    """Médiane de chaque statistique sur les passes, et dispersion relative de p50/p95"""
+    merged = {}
+    for scenario in runs[0]:
+        series = [run[scenario] for run in runs]
+        stats = {key: statistics.median(s[key] for s in series) if series[0][key] is not None else None
+                 for key in series[0]}
+        stats["runs"] = len(series)
+        stats["spread"] = {}
+        for stat in COMPARED_STATS:
+            values = [s[stat] for s in series]
+            middle = statistics.median(values)
+            stats["spread"][stat] = (max(values) - min(values)) / middle if middle else 0.0
+        merged[scenario] = stats
+    return merged
+
+
+def measure(devices, args):
+    """Médiane de ``args.runs`` mesures isolées pour ``devices`` appareils"""
+    return merge_runs([run_once(devices, args) for _ in range(args.runs)])
+
+
+# --- Rapport et comparaison ---
+
+def compare(results, baseline, threshold):
+    """Liste des régressions : (clé, statistique, référence, mesure)"""
+    regressions = []
+    for devices, scenarios in results.items():
+        for scenario, stats in scenarios.items():
+            reference = baseline.get(devices, {}).get(scenario)
+            if not reference:
+                continue
+            for stat in COMPARED_STATS:
+                before, after = reference.get(stat), stats.get(stat)
+                if before is None or after is None:
+                    continue
+                spread = max(reference.get('spread', {}).get(stat, 0), stats.get('spread', {}).get(stat, 0))
+                tolerance = max(threshold, SPREAD_FACTOR * spread)
+                if after > before * (1 + tolerance) and after - before > NOISE_FLOOR:
+                    regressions.append((f"{scenario}@{devices}", stat, before, after))
+    return regressions
+
+
+def print_report(results, baseline):
+    print(f"{'scénario':<20}{'appareils':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'op/s':>10}{'disp.':>8}{'Δp50':>9}")
+    for devices, scenarios in results.items():
+        for scenario, stats in scenarios.items():
+            reference = baseline.get(devices, {}).get(scenario)
+            delta = ''
+            if reference and reference.get('p50'):
+                delta = f"{(stats['p50'] / reference['p50'] - 1) * 100:+.0f}%"
+            print(f"{scenario:<20}{devices:>10}{stats['p50'] * 1000:>10.1f}{stats['p95'] * 1000:>10.1f}"
+                  f"{stats['p99'] * 1000:>10.1f}{stats['throughput'] or 0:>10.1f}"
+                  f"{stats.get('spread', {}).get('p50', 0):>8.0%}{delta:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Banc d'essai des chemins scan et blocage")
+    parser.add_argument('--devices', type=int, nargs='+', default=DEFAULT_DEVICES)
+    parser.add_argument('--latency', type=float, default=0.02, help="Latence simulée par commande (s)")
+    parser.add_argument('--repeat', type=int, default=15, help="Répétitions des scénarios scan et lot")
+    parser.add_argument('--warmup', type=int, default=2, help="Passes de chauffe non comptées")
+    parser.add_argument('--runs', type=int, default=3, help="Mesures isolées par nombre d'appareils (médiane)")
+    parser.add_argument('--block-samples', type=int, default=20, help="Blocages unitaires mesurés")
+    parser.add_argument('--clients', type=int, default=8, help="Clients simultanés sur /devices")
+    parser.add_argument('--duration', type=float, default=2.0, help="Durée du scénario concurrent (s)")
+    parser.add_argument('--baseline', default=BASELINE_FILE)
+    parser.add_argument('--save-baseline', action='store_true', help="Enregistrer les résultats comme référence")
+    parser.add_argument('--threshold', type=float, default=0.25, help="Régression tolérée (0.25 = +25 %%)")
+    parser.add_argument('--output', help="Écrire les résultats bruts (JSON)")
+    parser.add_argument('--worker', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    results = {}
+    for devices in args.devices:
+        print(f"⏱  {devices} appareils (latence {args.latency * 1000:.0f} ms/commande, {args.runs} passes)...",
+              file=sys.stderr)
+        results[str(devices)] = measure(devices, args)
+
+    baseline = {}
+    if os.path.exists(args.baseline):
+        with open(args.baseline, encoding='utf-8') as f:
+            stored = json.load(f)
+        if stored.get('latency') == args.latency:
+            baseline = stored['results']
+        else:
+            print(f"Référence ignorée : mesurée avec une latence de {stored.get('latency')} s", file=sys.stderr)
+
+    print_report(results, baseline)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump({"latency": args.latency, "results": results}, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, 'w', encoding='utf-8') as f:
+            json.dump({"latency": args.latency, "results": results}, f, indent=2)
+        print(f"Référence enregistrée dans {args.baseline}")
+        return
+
+    regressions = compare(results, baseline, args.threshold)
+    for key, stat, before, after in regressions:
+        print(f"❌ Régression {key} {stat}: {before * 1000:.1f} ms -> {after * 1000:.1f} ms")
+    if regressions:
+        sys.exit(1)
+    if baseline:
+        print(f"✅ Aucune régression au-delà de {args.threshold:.0%}")
+
+
+if __name__ == '__main__':
+    main()
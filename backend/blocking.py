@@ -0,0 +1,117 @@
+"""Primitives de blocage : règles par appareil, script netsh, routes.
+
+Toutes les commandes netsh d'un lot sont écrites dans un script exécuté
+par un seul ``netsh -f``. Seules les routes, que netsh ne sait pas gérer,
+restent des commandes ``route`` individuelles, lancées en parallèle.
+"""
+import ipaddress
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+import executor
+from firewall import RULE_PREFIX
+
+HOST_ROUTE_PATTERN = re.compile(r'^\s*(\d{1,3}(?:\.\d{1,3}){3})\s+255\.255\.255\.255\s')
+
+# Règles créées pour chaque appareil bloqué : (suffixe, paramètres netsh)
+BLOCK_RULES = [
+    # Tout le trafic sortant depuis cette IP vers Internet
+    ('OUT', 'dir=out action=block localip={ip} interfacetype=any'),
+    # Tout le trafic entrant vers cette IP depuis Internet
+    ('IN', 'dir=in action=block remoteip={ip} interfacetype=any'),
+    # Protocoles web (TCP 80, 443)
+    ('WEB', 'dir=out action=block protocol=TCP localip={ip} remoteport=80,443'),
+    # DNS (port 53)
+    ('DNS', 'dir=out action=block protocol=UDP localip={ip} remoteport=53'),
+    # ICMP (ping)
+    ('ICMP', 'dir=out action=block protocol=icmpv4 localip={ip}'),
+]
+
+BLOCK_PARAMS = dict(BLOCK_RULES)
+
+MIN_PROTECTIONS = 3  # En dessous, le blocage est considéré comme partiel
+ROUTE_WORKERS = 8
+
+
+def rule_name(ip, suffix):
+    return f'{RULE_PREFIX}{ip}_{suffix}'
+
+
+def is_valid_ip(ip):
+    try:
+        ipaddress.IPv4Address(ip)
+        return True
+    except ValueError:
+        return False
+
+
+def add_rule_line(ip, suffix):
+    """Commande netsh (sans le préfixe ``netsh``) créant une règle de blocage"""
+    params = BLOCK_PARAMS[suffix].format(ip=ip)
+    return f'advfirewall firewall add rule name="{rule_name(ip, suffix)}" {params}'
+
+
+def delete_rule_line(name):
+    return f'advfirewall firewall delete rule name="{name}"'
+
+
+def run_netsh_script(lines, timeout=None):
+    """Exécute toutes les lignes dans un seul processus ``netsh -f``"""
+    fd, path = tempfile.mkstemp(prefix='hotspot_', suffix='.netsh', text=True)
+    try:
+        with os.fdopen(fd, 'w', encoding='ascii') as f:
+            f.write('\n'.join(lines) + '\n')
+        return executor.run(f'netsh -f "{path}"', timeout=timeout or 15 + len(lines))
+    finally:
+        os.unlink(path)
+
+
+def add_route(ip):
+    result = executor.run(f'route add {ip} mask 255.255.255.255 0.0.0.0 metric 1', timeout=10)
+    output = result.stdout.lower()
+    return result.returncode == 0 or "existe" in output or "exists" in output
+
+
+def delete_route(ip):
+    return executor.run(f'route delete {ip}', timeout=10).returncode == 0
+
+
+def run_routes(func, ips):
+    if not ips:
+        return {}
+    with ThreadPoolExecutor(max_workers=min(ROUTE_WORKERS, len(ips))) as pool:
+        return dict(zip(ips, pool.map(func, ips)))
+
+
+def split_valid_ips(ips):
+    """Sépare les IPs valides (dédupliquées) des invalides, déjà en erreur"""
+    valid, results = [], {}
+    for ip in dict.fromkeys(ips):
+        if is_valid_ip(ip):
+            valid.append(ip)
+        else:
+            results[ip] = {"success": False, "error": "Adresse IP invalide"}
+    return valid, results
+
+
+def parse_host_routes(output, hotspot_info, extra=()):
+    """IPs ayant une route d'hôte (/32) dans ``route print`` : clients du hotspot et IPs de ``extra``"""
+    ips = set()
+    for line in output.splitlines():
+        match = HOST_ROUTE_PATTERN.match(line)
+        if match and (match.group(1) in extra or hotspot_info.contains(match.group(1))):
+            ips.add(match.group(1))
+    return ips
+
+
+def route_lines(ip):
+    """Lignes de ``route print`` dont la destination est exactement ``ip``"""
+    output = executor.run('route print -4', timeout=10).stdout
+    return [line.strip() for line in output.splitlines() if line.split(None, 1)[:1] == [ip]]
+
+
+def host_routes(hotspot_info, extra=()):
+    """Routes de blocage actuellement présentes (une seule commande)"""
+    return parse_host_routes(executor.run('route print -4', timeout=10).stdout, hotspot_info, extra)
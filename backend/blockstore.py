@@ -0,0 +1,113 @@
+"""Liste persistante des appareils bloqués, indexée par MAC (SQLite).
+
+Les règles netsh sont liées à une IP ; cette liste garde l'intention de
+blocage par appareil. Au démarrage, et à chaque changement de la table
+ARP, les MAC bloquées sont rapprochées de leur IP actuelle pour que le
+réconciliateur applique les règles au bon endroit, même après un
+nouveau bail DHCP.
+"""
+import os
+import sqlite3
+import threading
+import time
+
+DB_FILE = os.environ.get(
+    'HOTSPOT_DB_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'hotspot.db')
+)
+
+
+class BlockStore:
+    def __init__(self, path=DB_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS blocked (
+                    id INTEGER PRIMARY KEY,
+                    mac TEXT UNIQUE,
+                    ip TEXT NOT NULL,
+                    reason TEXT,
+                    blocked_at REAL NOT NULL,
+                    updated_at REAL NOT NULL
+                )"""
+            )
+            self._conn.execute("CREATE INDEX IF NOT EXISTS blocked_ip ON blocked (ip)")
+
+    def entries(self):
+        with self._lock:
+            rows = self._conn.execute("SELECT mac, ip, reason, blocked_at, updated_at FROM blocked").fetchall()
+        return [dict(row) for row in rows]
+
+    def add(self, ip, mac=None, reason=None):
+        """Enregistre un blocage ; la MAC (si connue) identifie l'appareil"""
+        now = time.time()
+        with self._lock, self._conn:
+            if mac:
+                # L'IP n'appartient plus à un éventuel autre appareil enregistré sans MAC
+                self._conn.execute("DELETE FROM blocked WHERE mac IS NULL AND ip = ?", (ip,))
+                self._conn.execute(
+                    """INSERT INTO blocked (mac, ip, reason, blocked_at, updated_at) VALUES (?, ?, ?, ?, ?)
+                       ON CONFLICT(mac) DO UPDATE SET ip = excluded.ip, updated_at = excluded.updated_at,
+                       reason = COALESCE(excluded.reason, blocked.reason)""",
+                    (mac, ip, reason, now, now)
+                )
+            elif not self._conn.execute("SELECT 1 FROM blocked WHERE ip = ?", (ip,)).fetchone():
+                self._conn.execute(
+                    "INSERT INTO blocked (mac, ip, reason, blocked_at, updated_at) VALUES (NULL, ?, ?, ?, ?)",
+                    (ip, reason, now, now)
+                )
+
+    def remove(self, ip, mac=None):
+        """Retire le blocage de l'appareil ; celui d'une autre MAC en attente sur cette IP est gardé"""
+        with self._lock, self._conn:
+            if mac:
+                self._conn.execute("DELETE FROM blocked WHERE mac = ? OR (mac IS NULL AND ip = ?)", (mac, ip))
+            else:
+                self._conn.execute("DELETE FROM blocked WHERE ip = ?", (ip,))
+
+    def clear(self):
+        with self._lock, self._conn:
+            self._conn.execute("DELETE FROM blocked")
+
+    def update_ips(self, moves):
+        """``moves`` : MAC -> nouvelle IP (nouveau bail DHCP)"""
+        now = time.time()
+        with self._lock, self._conn:
+            self._conn.executemany(
+                "UPDATE blocked SET ip = ?, updated_at = ? WHERE mac = ?",
+                [(ip, now, mac) for mac, ip in moves.items()]
+            )
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def map_to_current_ips(entries, arp_entries):
+    """Rapproche les MAC bloquées de la table ARP.
+
+    Retourne ``(IPs à bloquer, déplacements MAC -> nouvelle IP)``. Une MAC
+    absente de la table ARP reste bloquée à sa dernière IP connue, sauf si
+    cette IP appartient maintenant à un autre appareil : le blocage reste
+    alors en attente du retour de la MAC.
+    """
+    ip_by_mac = {mac: ip for ip, mac in arp_entries.items()}
+    desired = set()
+    moves = {}
+    for entry in entries:
+        mac = entry['mac']
+        if mac and mac in ip_by_mac:
+            ip = ip_by_mac[mac]
+            if ip != entry['ip']:
+                moves[mac] = ip
+        else:
+            ip = entry['ip']
+            owner = arp_entries.get(ip)
+            if mac and owner and owner != mac:
+                continue
+        desired.add(ip)
+    return desired, moves
@@ -0,0 +1,601 @@
+"""Mode contrôleur : inventaire agrégé de plusieurs hôtes hotspot.
+
+Chaque hôte Windows exécute ``app.py`` (l'agent). Le contrôleur interroge
+les agents en parallèle sur des connexions HTTP persistantes, avec
+``If-None-Match`` : un agent dont l'inventaire n'a pas changé répond 304
+sans corps. Les listes reçues sont fusionnées en un seul index (par agent,
+par IP, par MAC) ; les blocages sont transmis à l'agent concerné.
+
+Tous les hotspots Windows utilisent le même sous-réseau (192.168.137.x) :
+une IP peut donc exister sur plusieurs agents. Un appareil est désigné par
+son MAC, par ``agent/ip``, ou par son IP si elle n'est présente que sur un
+seul agent (sinon 409 avec les candidats).
+
+    python controller.py --agent salle1=http://10.0.0.5:5000 --agent salle2=http://10.0.0.6:5000
+    HOTSPOT_AGENTS="salle1=http://10.0.0.5:5000,salle2=http://10.0.0.6:5000" python controller.py
+    python controller.py --local-agents 3 --clients 20    # agents simulés sur 127.0.0.1
+"""
+import argparse
+import atexit
+import gzip
+import http.client
+import json
+import logging
+import os
+import queue
+import re
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.parse
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import Flask, jsonify, request
+from flask_cors import CORS
+
+import applog
+import httpcache
+from arptable import normalize_mac
+from blocking import is_valid_ip
+
+log = logging.getLogger(__name__)
+
+POLL_INTERVAL = 5     # secondes entre deux relevés des agents
+AGENT_TIMEOUT = 10    # délai d'une requête vers un agent (lecture)
+ACTION_TIMEOUT = 90   # délai d'un blocage transmis (le worker pare-feu de l'agent peut être occupé)
+POOL_SIZE = 4         # connexions persistantes gardées par agent
+MAC_PATTERN = re.compile(r'^[0-9a-f]{2}([-:])[0-9a-f]{2}(\1[0-9a-f]{2}){4}$', re.IGNORECASE)
+
+
+class AgentError(Exception):
+    """Agent injoignable ou réponse inattendue"""
+
+
+class ConnectionPool:
+    """Connexions HTTP/1.1 persistantes vers un agent, réutilisées d'une requête à l'autre"""
+
+    def __init__(self, url, size=POOL_SIZE, timeout=AGENT_TIMEOUT):
+        parsed = urllib.parse.urlsplit(url)
+        self.https = parsed.scheme == 'https'
+        self.host = parsed.hostname
+        self.port = parsed.port or (443 if self.https else 80)
+        self.base_path = parsed.path.rstrip('/')
+        self.size = size
+        self.timeout = timeout
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self.created = 0
+        self.reused = 0
+
+    def _connect(self, timeout):
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        with self._lock:
+            self.created += 1
+        return connection_class(self.host, self.port, timeout=timeout)
+
+    def _acquire(self, timeout):
+        try:
+            connection = self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect(timeout), False
+        connection.timeout = timeout
+        if connection.sock is not None:
+            connection.sock.settimeout(timeout)
+        with self._lock:
+            self.reused += 1
+        return connection, True
+
+    def _release(self, connection, response):
+        if response.will_close or self._idle.qsize() >= self.size:
+            connection.close()
+        else:
+            self._idle.put(connection)
+
+    def request(self, method, path, body=None, headers=None, timeout=None):
+        """``(statut, en-têtes, corps)`` ; une connexion fermée par l'agent est rouverte une fois"""
+        timeout = timeout or self.timeout
+        for attempt in (1, 2):
+            connection, reused = self._acquire(timeout)
+            try:
+                connection.request(method, self.base_path + path, body=body, headers=headers or {})
+                response = connection.getresponse()
+                data = response.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                connection.close()
+                if reused and attempt == 1:
+                    continue  # connexion persistante expirée côté agent
+                raise AgentError(f"{self.host}:{self.port}: {e}") from e
+            except (OSError, http.client.HTTPException) as e:
+                connection.close()
+                raise AgentError(f"{self.host}:{self.port}: {e}") from e
+            self._release(connection, response)
+            return response.status, response.headers, data
+
+    def close(self):
+        while True:
+            try:
+                self._idle.get_nowait().close()
+            except queue.Empty:
+                return
+
+    def info(self):
+        return {"idle": self._idle.qsize(), "created": self.created, "reused": self.reused}
+
+
+class Agent:
+    """Un hôte hotspot et la dernière liste d'appareils reçue"""
+
+    def __init__(self, name, url, timeout=AGENT_TIMEOUT):
+        self.name = name
+        self.url = url.rstrip('/')
+        self.pool = ConnectionPool(self.url, timeout=timeout)
+        self.devices = []
+        self.etag = None
+        self.token = None      # démarrage-version de la dernière liste reçue
+        self.versioned = True  # l'agent expose /devices/version
+        self.version = None
+        self.online = False
+        self.last_ok = None
+        self.last_error = None
+        self.latency = None
+        self.polls = 0
+        self.not_modified = 0
+
+    def call(self, method, path, payload=None, headers=None, timeout=None):
+        """Requête JSON vers l'agent : ``(statut, en-têtes, contenu décodé)``"""
+        body = json.dumps(payload).encode('utf-8') if payload is not None else None
+        headers = {'Accept': 'application/json', 'Accept-Encoding': 'gzip', **(headers or {})}
+        if body is not None:
+            headers['Content-Type'] = 'application/json'
+        status, response_headers, data = self.pool.request(method, path, body, headers, timeout)
+        if response_headers.get('Content-Encoding') == 'gzip':
+            try:
+                data = gzip.decompress(data)
+            except (OSError, zlib.error, EOFError):
+                # Corps tronqué ou corrompu (connexion coupée en cours de réponse)
+                raise AgentError(f"{self.name}: réponse gzip invalide ({status})") from None
+        try:
+            content = json.loads(data) if data else None
+        except ValueError:
+            raise AgentError(f"{self.name}: réponse non JSON ({status})")
+        return status, response_headers, content
+
+    def _fetch_devices(self):
+        """``(liste, jeton de version)`` ; ``(None, None)`` si la liste n'a pas changé (304)"""
+        status, headers, content = self.call(
+            'GET', '/devices', headers={'If-None-Match': self.etag} if self.etag else None)
+        if status == 304:
+            return None, None
+        if status != 200 or not isinstance(content, list):
+            raise AgentError(f"{self.name}: /devices HTTP {status}")
+        self.etag = headers.get('ETag')
+        return content, headers.get('X-Inventory-Version')
+
+    def poll(self):
+        """Relit l'inventaire de l'agent ; retourne True si la liste ou la disponibilité a changé
+
+        La version est lue d'abord (petite réponse, connexion gardée ouverte) ; la
+        liste n'est relue que si elle a changé. Un agent sans ``/devices/version``
+        est relu par requête conditionnelle (304).
+        """
+        was_online = self.online
+        start = time.perf_counter()
+        try:
+            devices, version = None, None
+            if self.versioned:
+                status, _, content = self.call('GET', '/devices/version')
+                if status == 404:
+                    self.versioned = False
+                elif status != 200 or not isinstance(content, dict):
+                    raise AgentError(f"{self.name}: /devices/version HTTP {status}")
+                elif f"{content.get('boot')}-{content.get('version')}" != self.token:
+                    devices, version = self._fetch_devices()
+                    self.token = f"{content.get('boot')}-{version}"
+            if not self.versioned:
+                devices, version = self._fetch_devices()
+        except AgentError as e:
+            self.online = False
+            if was_online or self.last_error is None:
+                log.warning("Agent %s injoignable: %s", self.name, e, extra={"agent": self.name})
+            self.last_error = str(e)
+            return was_online
+        self.polls += 1
+        self.latency = time.perf_counter() - start
+        self.online = True
+        self.last_ok = time.time()
+        self.last_error = None
+        if devices is None:
+            self.not_modified += 1
+            return not was_online
+        self.devices = devices
+        self.version = version
+        if not was_online:
+            log.info("Agent %s disponible (%d appareils)", self.name, len(devices), extra={"agent": self.name})
+        return True
+
+    def info(self):
+        return {
+            "name": self.name,
+            "url": self.url,
+            "online": self.online,
+            "devices": len(self.devices),
+            "inventory_version": self.version,
+            "last_ok": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_ok)) if self.last_ok else None,
+            "last_error": self.last_error,
+            "latency": round(self.latency, 4) if self.latency is not None else None,
+            "polls": self.polls,
+            "not_modified": self.not_modified,
+            "connections": self.pool.info(),
+        }
+
+
+class MergedInventory:
+    """Index immuable des appareils de tous les agents"""
+
+    __slots__ = ('version', 'devices', 'by_mac', 'by_ip', 'built_at')
+
+    def __init__(self, version=0, devices=(), built_at=None):
+        self.version = version
+        self.devices = list(devices)
+        self.by_mac = {}  # MAC -> (agent, ip)
+        self.by_ip = {}   # IP -> [(agent, ip), ...]
+        self.built_at = built_at
+        for device in self.devices:
+            key = (device['agent'], device['ip'])
+            mac = normalize_mac(device.get('mac'))
+            if mac:
+                self.by_mac[mac] = key
+            self.by_ip.setdefault(device['ip'], []).append(key)
+
+
+class Aggregator:
+    """Relève périodique des agents et fusion de leurs inventaires"""
+
+    def __init__(self, agents, interval=POLL_INTERVAL):
+        self.agents = {agent.name: agent for agent in agents}
+        self.interval = interval
+        self._view = MergedInventory()
+        self._pool = ThreadPoolExecutor(max_workers=max(1, len(self.agents)), thread_name_prefix="agent")
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Démarre la relève en arrière-plan (sans effet si elle tourne déjà)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="agent-poller", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def refresh(self):
+        """Demande une relève immédiate (après un blocage par exemple)"""
+        self._wakeup.set()
+
+    def snapshot(self, wait=None):
+        if wait:
+            self._ready.wait(wait)
+        return self._view
+
+    def poll_once(self):
+        """Relève tous les agents en parallèle ; republie l'index si l'un d'eux a changé"""
+        changed = list(self._pool.map(lambda agent: agent.poll(), self.agents.values()))
+        if any(changed) or not self._ready.is_set():
+            devices = [
+                {**device, "agent": agent.name, "id": f"{agent.name}/{device['ip']}"}
+                for agent in self.agents.values() if agent.online
+                for device in agent.devices
+            ]
+            self._view = MergedInventory(self._view.version + 1, devices, time.time())
+        self._ready.set()
+        return self._view
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                self.poll_once()
+            except Exception as e:
+                log.exception("Erreur de relève des agents: %s", e)
+            self._wakeup.wait(self.interval)
+
+    def locate(self, target, agent=None):
+        """Appareils désignés par ``target`` (IP, MAC ou agent/ip) : liste de ``(agent, ip)``"""
+        if '/' in target and agent is None:
+            agent, target = target.split('/', 1)
+        if agent is not None and agent not in self.agents:
+            return []
+        view = self._view
+        if MAC_PATTERN.match(target):
+            key = view.by_mac.get(normalize_mac(target))
+            return [key] if key and (agent is None or key[0] == agent) else []
+        if not is_valid_ip(target):
+            return []
+        if agent is not None:
+            # Appareil peut-être arrivé depuis la dernière relève : l'agent tranchera
+            return [(agent, target)]
+        return list(view.by_ip.get(target, ()))
+
+    def fan_out(self, action, targets, reason=None, actor=None):
+        """Transmet ``block``/``unblock`` à chaque agent concerné, en parallèle
+
+        ``targets`` : liste de ``(agent, ip)``. Retourne ``{agent: réponse}``.
+        """
+        by_agent = {}
+        for agent_name, ip in targets:
+            by_agent.setdefault(agent_name, []).append(ip)
+        headers = {'X-Hotspot-Actor': actor} if actor else None
+
+        def send(agent_name):
+            agent = self.agents[agent_name]
+            payload = {"ips": by_agent[agent_name]}
+            if reason:
+                payload["reason"] = reason
+            try:
+                status, _, content = agent.call('POST', f'/{action}', payload, headers=headers,
+                                                timeout=ACTION_TIMEOUT)
+            except AgentError as e:
+                return {"success": False, "error": str(e)}
+            if not isinstance(content, dict):
+                return {"success": False, "error": f"HTTP {status}"}
+            return {**content, "status_code": status}
+
+        # Pool dédié : une relève en cours ne retarde pas les blocages
+        with ThreadPoolExecutor(max_workers=len(by_agent) or 1, thread_name_prefix="agent-action") as pool:
+            results = dict(zip(by_agent, pool.map(send, list(by_agent))))
+        for agent_name, result in results.items():
+            applog.audit(action, ','.join(by_agent[agent_name]), actor=actor, agent=agent_name,
+                         success=result.get('success'), error=result.get('error'))
+        self.refresh()
+        return results
+
+    def info(self):
+        view = self._view
+        return {
+            "version": view.version,
+            "devices": len(view.devices),
+            "last_merge": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(view.built_at)) if view.built_at else None,
+            "interval": self.interval,
+            "agents": [agent.info() for agent in self.agents.values()],
+        }
+
+
+# --- API du contrôleur ---
+
+app = Flask(__name__)
+CORS(app)
+aggregator = Aggregator([])
+device_bodies = httpcache.VersionedBodies()
+DEVICE_FIELDS = ("id", "agent", "ip", "mac", "name", "type", "vendor", "status", "presence", "last_seen")
+
+
+def resolve_targets(data):
+    """Appareils d'un corps JSON : {"devices": ["agent/ip" | mac | ip, ...], "agent": ...}
+
+    Retourne ``(cibles, erreurs)`` ; une IP présente sur plusieurs agents est une erreur.
+    """
+    if isinstance(data, list):
+        data = {"devices": data}
+    if not isinstance(data, dict):
+        return [], {"": "Corps JSON attendu: {\"devices\": [...]}"}
+    items = data.get('devices') or data.get('ips') or data.get('macs') or []
+    targets, errors = [], {}
+    for item in items:
+        if not isinstance(item, str):
+            errors[str(item)] = "Désignation invalide"
+            continue
+        found = aggregator.locate(item, data.get('agent'))
+        if len(found) == 1:
+            targets.append(found[0])
+        elif not found:
+            errors[item] = "Appareil inconnu"
+        else:
+            errors[item] = "IP présente sur plusieurs agents: " + ', '.join(f"{a}/{ip}" for a, ip in found)
+    return list(dict.fromkeys(targets)), errors
+
+
+@app.route("/devices")
+def devices():
+    """Inventaire fusionné de tous les agents (ETag, 304, ?format=compact, gzip)"""
+    aggregator.start()
+    view = aggregator.snapshot(wait=AGENT_TIMEOUT)
+
+    def payload(fmt):
+        if fmt == 'compact':
+            return {**httpcache.compact(view.devices, DEVICE_FIELDS), "version": view.version}
+        return view.devices
+
+    return httpcache.versioned_response(view.version, payload, {'X-Inventory-Version': str(view.version)},
+                                        bodies=device_bodies)
+
+
+@app.route("/agents")
+def agents():
+    """État de chaque agent (disponibilité, latence, connexions réutilisées)"""
+    return jsonify(aggregator.info())
+
+
+@app.route("/status")
+def status():
+    aggregator.start()
+    view = aggregator.snapshot(wait=AGENT_TIMEOUT)
+    return jsonify({
+        "status": "running",
+        "mode": "controller",
+        "agents": len(aggregator.agents),
+        "agents_online": sum(1 for agent in aggregator.agents.values() if agent.online),
+        "connected_devices": sum(1 for d in view.devices if d.get('presence') == 'online'),
+        "offline_devices": sum(1 for d in view.devices if d.get('presence') == 'offline'),
+        "blocked_devices": sum(1 for d in view.devices if d.get('status') == 'blocked'),
+        "inventory_version": view.version,
+    })
+
+
+def single_action(action, target):
+    found = aggregator.locate(target, request.args.get('agent'))
+    if not found:
+        return jsonify({"error": f"Appareil inconnu: {target}", "success": False}), 404
+    if len(found) > 1:
+        return jsonify({
+            "error": "IP présente sur plusieurs agents : préciser ?agent= ou agent/ip",
+            "candidates": [f"{a}/{ip}" for a, ip in found],
+            "success": False
+        }), 409
+    agent_name, ip = found[0]
+    agent = aggregator.agents[agent_name]
+    query = urllib.parse.urlencode({k: v for k, v in request.args.items() if k != 'agent'})
+    try:
+        status, _, content = agent.call('GET', f'/{action}/{ip}' + (f'?{query}' if query else ''),
+                                        headers={'X-Hotspot-Actor': request.remote_addr}, timeout=ACTION_TIMEOUT)
+    except AgentError as e:
+        return jsonify({"error": str(e), "agent": agent_name, "success": False}), 502
+    applog.audit(action, ip, actor=request.remote_addr, agent=agent_name,
+                 success=isinstance(content, dict) and content.get('success'))
+    aggregator.refresh()
+    return jsonify({**(content if isinstance(content, dict) else {}), "agent": agent_name, "ip": ip}), status
+
+
+@app.route("/block/<path:target>")
+def block(target):
+    """Bloque un appareil (IP, MAC ou agent/ip) sur son agent"""
+    return single_action('block', target)
+
+
+@app.route("/unblock/<path:target>")
+def unblock(target):
+    return single_action('unblock', target)
+
+
+def batch_action(action):
+    data = request.get_json(silent=True)
+    targets, errors = resolve_targets(data)
+    if not targets:
+        return jsonify({"errors": errors, "success": False}), 400
+    reason = data.get('reason') if isinstance(data, dict) else None
+    results = aggregator.fan_out(action, targets, reason=reason, actor=request.remote_addr)
+    return jsonify({
+        "agents": results,
+        "errors": errors,
+        "success": not errors and all(r.get('success') for r in results.values())
+    })
+
+
+@app.route("/block", methods=["POST"])
+def block_batch():
+    """Blocage groupé réparti entre les agents : {"devices": [...]}"""
+    return batch_action('block')
+
+
+@app.route("/unblock", methods=["POST"])
+def unblock_batch():
+    return batch_action('unblock')
+
+
+# --- Démarrage ---
+
+def parse_agents(specs):
+    """``nom=url`` (ou ``url`` seule, nommée d'après l'hôte) -> liste d'agents"""
+    agents = []
+    for spec in specs:
+        spec = spec.strip()
+        if not spec:
+            continue
+        # Le nom s'arrête au premier '=' : l'URL peut en contenir (paramètres de requête)
+        name, sep, url = spec.partition('=')
+        if not sep or '://' in name:
+            name, url = '', spec
+        agents.append(Agent(name or urllib.parse.urlsplit(url).netloc, url))
+    return agents
+
+
+def launch_local_agents(count, clients, base_port, workdir=None):
+    """Agents simulés (HOTSPOT_EXECUTOR=replay) sur 127.0.0.1 : ``(agents, arrêt)``"""
+    backend_dir = os.path.dirname(os.path.abspath(__file__))
+    workdir = workdir or tempfile.mkdtemp(prefix='hotspot_agents_')
+    processes, agents = [], []
+    for n in range(count):
+        port = base_port + n
+        env = dict(
+            os.environ,
+            HOTSPOT_EXECUTOR='replay',
+            HOTSPOT_REPLAY_CLIENTS=str(clients),
+            HOTSPOT_REPLAY_HOST=str(n + 1),
+            HOTSPOT_DB_FILE=os.path.join(workdir, f'agent{n + 1}.db'),
+            HOTSPOT_NAME_CACHE_FILE=os.path.join(workdir, f'agent{n + 1}_names.json'),
+            HOTSPOT_LOG_DIR=os.path.join(workdir, f'logs{n + 1}'),
+            HOTSPOT_METER_SOURCE='off',
+        )
+        processes.append(subprocess.Popen(
+            [sys.executable, os.path.join(backend_dir, 'app.py'), '--host', '127.0.0.1', '--port', str(port)],
+            cwd=backend_dir, env=env, stdout=subprocess.DEVNULL
+        ))
+        agents.append(Agent(f"local{n + 1}", f"http://127.0.0.1:{port}"))
+
+    def stop():
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.wait(timeout=10)
+
+    return agents, stop
+
+
+def spawn_local_agents(count, clients, base_port):
+    """Agents simulés lancés pour la durée du contrôleur"""
+    agents, stop = launch_local_agents(count, clients, base_port)
+    atexit.register(stop)
+    # Arrêt par SIGTERM : passer par sys.exit pour que les agents soient arrêtés aussi
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    return agents
+
+
+def serve(agents, host="0.0.0.0", port=5050, threads=8, interval=POLL_INTERVAL):
+    global aggregator
+    aggregator = Aggregator(agents, interval=interval)
+    aggregator.start()
+    try:
+        from waitress import serve as waitress_serve
+    except ImportError:
+        waitress_serve = None
+    if waitress_serve is not None:
+        waitress_serve(app, host=host, port=port, threads=threads)
+    else:
+        app.run(host=host, port=port, debug=False, threaded=True, use_reloader=False)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Contrôleur : inventaire agrégé de plusieurs hotspots")
+    parser.add_argument('--agent', action='append', default=[], help="nom=http://hote:5000 (répétable)")
+    parser.add_argument('--host', default=os.environ.get('HOTSPOT_HOST', '0.0.0.0'))
+    parser.add_argument('--port', type=int, default=int(os.environ.get('HOTSPOT_CONTROLLER_PORT', 5050)))
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--interval', type=float, default=POLL_INTERVAL, help="Relève des agents (s)")
+    parser.add_argument('--local-agents', type=int, default=0, help="Lancer N agents simulés sur 127.0.0.1")
+    parser.add_argument('--clients', type=int, default=10, help="Clients simulés par agent local")
+    parser.add_argument('--agent-port', type=int, default=5101, help="Premier port des agents locaux")
+    args = parser.parse_args()
+
+    applog.setup_logging()
+    agents = parse_agents(args.agent + os.environ.get('HOTSPOT_AGENTS', '').split(','))
+    if args.local_agents:
+        agents += spawn_local_agents(args.local_agents, args.clients, args.agent_port)
+    if not agents:
+        parser.error("aucun agent : --agent nom=url, HOTSPOT_AGENTS ou --local-agents N")
+
+    print(f"🛰  Contrôleur démarré sur http://{args.host}:{args.port} ({len(agents)} agents)")
+    for agent in agents:
+        print(f"   - {agent.name}: {agent.url}")
+    print("\n📋 Endpoints : GET /devices, GET /agents, GET /status, "
+          "GET /block|/unblock/<ip|mac|agent/ip>[?agent=], POST /block|/unblock {\"devices\": [...]}")
+    serve(agents, args.host, args.port, args.threads, args.interval)
@@ -0,0 +1,140 @@
+"""Flux des changements de l'inventaire (arrivée, départ, nom, blocage, présence).
+
+Chaque nouvelle version de l'inventaire est comparée à la précédente et
+seules les différences sont diffusées aux abonnés du flux SSE.
+
+L'identifiant SSE d'un événement est ``<démarrage>-<version>`` : les
+versions repartent de zéro à chaque démarrage, un ``Last-Event-ID`` d'un
+processus précédent ne doit pas passer pour la version courante.
+"""
+import json
+import queue
+import threading
+
+KEEPALIVE_INTERVAL = 15  # secondes entre deux commentaires SSE de maintien
+SUBSCRIBER_QUEUE_SIZE = 256
+
+
+def diff_devices(old, new):
+    """Liste des événements pour passer de ``old`` à ``new`` (dictionnaires ip -> appareil)"""
+    events = []
+    for ip, device in new.items():
+        previous = old.get(ip)
+        if previous is None:
+            events.append({"type": "joined", "device": device})
+            continue
+        if previous.get('mac') != device.get('mac'):
+            # Même IP attribuée à un autre appareil
+            events.append({"type": "left", "ip": ip, "mac": previous.get('mac')})
+            events.append({"type": "joined", "device": device})
+            continue
+        if previous.get('name') != device.get('name'):
+            events.append({"type": "name_resolved", "ip": ip, "name": device.get('name'), "previous": previous.get('name')})
+        if previous.get('status') != device.get('status'):
+            events.append({"type": device.get('status'), "ip": ip, "mac": device.get('mac')})
+        if previous.get('presence') != device.get('presence'):
+            events.append({"type": "presence", "ip": ip, "presence": device.get('presence'),
+                           "last_seen": device.get('last_seen')})
+
+    for ip, previous in old.items():
+        if ip not in new:
+            events.append({"type": "left", "ip": ip, "mac": previous.get('mac')})
+    return events
+
+
+class Subscriber:
+    def __init__(self):
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+        # Mis à True si le client est trop lent : il recevra un instantané complet
+        self.resync = False
+
+
+class EventBroker:
+    """Diffuse les différences d'inventaire à tous les abonnés"""
+
+    def __init__(self, boot_id=''):
+        self.boot_id = boot_id
+        self._subscribers = set()
+        self._lock = threading.Lock()
+
+    def subscribe(self):
+        subscriber = Subscriber()
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+    def on_snapshot(self, old, new):
+        """Listener de ``DeviceInventory`` : calcule le diff une seule fois pour tous"""
+        with self._lock:
+            subscribers = list(self._subscribers)
+        if not subscribers:
+            return
+        events = diff_devices(old.devices, new.devices)
+        if not events:
+            return
+        message = (new.version, events)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.resync = True
+
+    def event_id(self, version):
+        return f"{self.boot_id}-{version}"
+
+    def stream(self, snapshot_provider, last_event_id=None):
+        """Générateur SSE : instantané initial puis uniquement les différences
+
+        L'abonnement n'est pris qu'à la première itération (une réponse fermée
+        avant d'avoir été lue n'en laisse pas). Chaque lot d'événements porte
+        la version qu'il produit ; les lots déjà couverts par l'instantané
+        envoyé sont ignorés.
+        """
+        subscriber = self.subscribe()
+        try:
+            snapshot = snapshot_provider()
+            if last_event_id != self.event_id(snapshot.version):
+                yield format_sse("snapshot", snapshot.device_list(), self.event_id(snapshot.version))
+            while True:
+                if subscriber.resync:
+                    subscriber.resync = False
+                    _drain(subscriber.queue)
+                    snapshot = snapshot_provider()
+                    yield format_sse("snapshot", snapshot.device_list(), self.event_id(snapshot.version))
+                try:
+                    version, events = subscriber.queue.get(timeout=KEEPALIVE_INTERVAL)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+                    continue
+                if version <= snapshot.version:
+                    # Publié avant l'instantané envoyé (abonnement antérieur à sa lecture) : déjà inclus
+                    continue
+                for event in events:
+                    yield format_sse(event["type"], event, self.event_id(version))
+        finally:
+            self.unsubscribe(subscriber)
+
+
+def _drain(q):
+    try:
+        while True:
+            q.get_nowait()
+    except queue.Empty:
+        pass
+
+
+def format_sse(event, data, event_id=None):
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event}")
+    lines.append(f"data: {json.dumps(data, ensure_ascii=False, separators=(',', ':'))}")
+    return '\n'.join(lines) + '\n\n'
@@ -0,0 +1,487 @@
+"""Couche d'exécution des commandes système (arp, ipconfig, netsh, route, ping).
+
+Toutes les commandes externes de l'application passent par l'exécuteur
+courant, ce qui permet de remplacer les outils Windows par une sortie
+enregistrée (``ReplayExecutor``) pour mesurer les chemins critiques sur
+n'importe quelle machine.
+
+Sélection par variables d'environnement :
+    HOTSPOT_EXECUTOR=replay          utiliser le hotspot simulé
+    HOTSPOT_REPLAY_CLIENTS=50        nombre de clients simulés
+    HOTSPOT_REPLAY_LATENCY=0.05      latence (s) ajoutée à chaque commande
+    HOTSPOT_REPLAY_HOST=1            numéro de l'hôte simulé (MAC distinctes entre agents)
+    HOTSPOT_REPLAY_GONE=3            clients partis mais encore présents dans ``arp -a``
+"""
+import ipaddress
+import os
+import queue
+import re
+import subprocess
+import threading
+import time
+
+import metrics
+from prober import IcmpProber, PROBE_CONCURRENCY
+from resolver import AsyncResolver, RESOLVER_CONCURRENCY
+
+
+class CommandResult:
+    """Résultat d'une commande, compatible avec ``subprocess.CompletedProcess``"""
+
+    __slots__ = ('args', 'returncode', 'stdout', 'stderr')
+
+    def __init__(self, args, returncode=0, stdout='', stderr=''):
+        self.args = args
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+
+    def __repr__(self):
+        return f"CommandResult({self.args!r}, returncode={self.returncode})"
+
+
+class SubprocessExecutor:
+    """Exécuteur réel : lance la commande via le shell Windows"""
+
+    def run(self, cmd, timeout=None):
+        completed = subprocess.run(
+            cmd,
+            shell=True,
+            capture_output=True,
+            text=True,
+            timeout=timeout
+        )
+        return CommandResult(cmd, completed.returncode, completed.stdout, completed.stderr)
+
+    def iter_lines(self, cmd, timeout=None):
+        """Lit la sortie ligne par ligne sans attendre la fin de la commande"""
+        deadline = time.monotonic() + timeout if timeout else None
+        proc = subprocess.Popen(
+            cmd,
+            shell=True,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.DEVNULL,
+            text=True
+        )
+        # La lecture bloquante se fait dans un thread : le délai reste
+        # respecté même si la commande se bloque sans rien écrire
+        lines = queue.Queue()
+
+        def reader():
+            try:
+                for line in proc.stdout:
+                    lines.put(line)
+            finally:
+                proc.stdout.close()
+                lines.put(None)
+
+        threading.Thread(target=reader, name='iter-lines', daemon=True).start()
+        try:
+            while True:
+                try:
+                    line = lines.get(timeout=max(0, deadline - time.monotonic()) if deadline else None)
+                except queue.Empty:
+                    raise subprocess.TimeoutExpired(cmd, timeout)
+                if line is None:
+                    break
+                yield line.rstrip('\r\n')
+            proc.wait(timeout=max(0.1, deadline - time.monotonic()) if deadline else None)
+        finally:
+            if proc.poll() is None:
+                proc.kill()
+
+    def resolve_names(self, ips, nameserver=None, timeout=None):
+        return AsyncResolver(nameserver=nameserver, timeout=timeout or 1.0).resolve_many(ips)
+
+    def probe_hosts(self, ips, timeout=None, concurrency=None):
+        return IcmpProber(timeout=timeout or 0.5, concurrency=concurrency or PROBE_CONCURRENCY).probe(ips)
+
+
+class ReplayExecutor:
+    """Exécuteur factice : sert des sorties enregistrées avec une latence configurable.
+
+    Chaque réponse est associée à une expression régulière appliquée à la
+    commande. La réponse peut être une chaîne (stdout, code retour 0), un
+    ``CommandResult`` ou une fonction ``(cmd, match) -> CommandResult | str``
+    pour simuler un état (règles ajoutées, routes supprimées...).
+    """
+
+    def __init__(self, latency=0.0, hostnames=None, prober=None):
+        self.latency = latency
+        self.hostnames = dict(hostnames or {})
+        self.prober = prober  # ips -> IPs qui répondent à ICMP
+        self.calls = []
+        self._responses = []
+        self._lock = threading.Lock()
+
+    def add(self, pattern, response, latency=None):
+        """Enregistre une réponse ; la première règle correspondante gagne"""
+        self._responses.append((re.compile(pattern, re.IGNORECASE), response, latency))
+        return self
+
+    def _lookup(self, cmd):
+        for pattern, response, latency in self._responses:
+            match = pattern.search(cmd)
+            if match:
+                return match, response, latency
+        return None, None, None
+
+    def run(self, cmd, timeout=None):
+        with self._lock:
+            self.calls.append(cmd)
+        match, response, latency = self._lookup(cmd)
+        delay = self.latency if latency is None else latency
+        if delay:
+            if timeout is not None and delay > timeout:
+                time.sleep(timeout)
+                raise subprocess.TimeoutExpired(cmd, timeout)
+            time.sleep(delay)
+        return self._respond(cmd, match, response)
+
+    def dispatch(self, cmd):
+        """Répond immédiatement, sans latence (commandes d'un script netsh -f)"""
+        match, response, _ = self._lookup(cmd)
+        return self._respond(cmd, match, response)
+
+    @staticmethod
+    def _respond(cmd, match, response):
+        if response is None:
+            return CommandResult(cmd, 1, '', f"Commande non simulée: {cmd}")
+        if callable(response):
+            response = response(cmd, match)
+        if isinstance(response, CommandResult):
+            response.args = cmd
+            return response
+        return CommandResult(cmd, 0, response, '')
+
+    def iter_lines(self, cmd, timeout=None):
+        result = self.run(cmd, timeout=timeout)
+        for line in result.stdout.splitlines():
+            yield line
+
+    def resolve_names(self, ips, nameserver=None, timeout=None):
+        # Les requêtes asynchrones partent en parallèle, par vagues de RESOLVER_CONCURRENCY
+        if self.latency and ips:
+            time.sleep(self.latency * -(-len(ips) // RESOLVER_CONCURRENCY))
+        return {ip: self.hostnames.get(ip) for ip in ips}
+
+    def probe_hosts(self, ips, timeout=None, concurrency=None):
+        # Sondes en parallèle par vagues de ``concurrency`` ; une adresse muette coûte tout le délai
+        ips = list(ips)
+        if self.latency and ips:
+            time.sleep(self.latency * -(-len(ips) // (concurrency or PROBE_CONCURRENCY)))
+        return self.prober(ips) if self.prober else set()
+
+
+class SimulatedHotspot:
+    """Hotspot Windows simulé : génère les sorties de arp, ipconfig, netsh et route.
+
+    L'état des règles et des routes est conservé, de sorte que les
+    chemins block/unblock/cleanup se comportent comme sur une vraie machine.
+    """
+
+    def __init__(self, clients=5, gateway='192.168.137.1', netmask=None, background_rules=50, host_id=0, gone=0):
+        if netmask is None:
+            # /24 comme le hotspot Windows, élargi si le nombre de clients l'exige
+            prefixlen = 24
+            while (1 << (32 - prefixlen)) - 3 < clients:
+                prefixlen -= 1
+            netmask = str(ipaddress.ip_network(f"0.0.0.0/{prefixlen}").netmask)
+        self.gateway = gateway
+        self.netmask = netmask
+        self.network = ipaddress.ip_interface(f"{gateway}/{netmask}").network
+        self.clients = {}
+        self.rules = []
+        self.routes = set()
+        self.probed = set()
+        self.lock = threading.Lock()
+        hosts = (str(h) for h in self.network.hosts() if str(h) != gateway)
+        for n in range(clients):
+            ip = next(hosts)
+            mac = '-'.join(f"{b:02x}" for b in (0x3c, 0x22, 0xfb, (n >> 16 ^ host_id) & 0xff, n >> 8 & 0xff, n & 0xff))
+            self.clients[ip] = mac
+        # Partis depuis peu : toujours dans le cache ARP, ne répondent plus
+        self.gone = set(list(self.clients)[len(self.clients) - gone:]) if gone else set()
+        # Un client sur quatre ignore ICMP (pare-feu Windows) mais répond à ARP
+        self.silent = {ip for i, ip in enumerate(self.clients) if i % 4 == 3}
+        for n in range(background_rules):
+            self.rules.append({
+                'Rule Name': f"Core Networking - Rule {n}",
+                'Enabled': 'Yes',
+                'Direction': 'In' if n % 2 else 'Out',
+                'Profiles': 'Domain,Private,Public',
+                'Grouping': 'Core Networking',
+                'LocalIP': 'Any',
+                'RemoteIP': 'Any',
+                'Protocol': 'UDP',
+                'Edge traversal': 'No',
+                'Action': 'Allow',
+            })
+
+    def hostnames(self):
+        """Noms DNS inverses : un client sur deux est résolvable"""
+        return {
+            ip: f"client-{ip.rsplit('.', 1)[-1]}.mshome.net"
+            for i, ip in enumerate(self.clients) if i % 2 == 0
+        }
+
+    # --- Générateurs de sortie ---
+
+    def arp_output(self, cmd=None, match=None):
+        lines = ['', f"Interface: {self.gateway} --- 0xc",
+                 '  Internet Address      Physical Address      Type']
+        for ip, mac in self.clients.items():
+            lines.append(f"  {ip:<22}{mac:<22}dynamic")
+        lines.append(f"  {str(self.network.broadcast_address):<22}{'ff-ff-ff-ff-ff-ff':<22}static")
+        lines.append(f"  {'224.0.0.22':<22}{'01-00-5e-00-00-16':<22}static")
+        return '\n'.join(lines) + '\n'
+
+    def probe(self, ips):
+        """Sonde ICMP : le cache des voisins est mis à jour pour chaque adresse sondée"""
+        with self.lock:
+            self.probed.update(ips)
+        return {ip for ip in ips if ip in self.clients and ip not in self.gone and ip not in self.silent}
+
+    def neighbors_output(self, cmd=None, match=None):
+        lines = ['', 'Interface 12: Local Area Connection* 10', '', '',
+                 f"{'Internet Address':<46}{'Physical Address':<19}Type",
+                 f"{'-' * 44}  {'-' * 17}  {'-' * 11}"]
+        with self.lock:
+            probed = set(self.probed)
+        for ip, mac in self.clients.items():
+            if ip in self.gone:
+                state = 'Unreachable' if ip in probed else 'Stale'
+                mac = '00-00-00-00-00-00' if ip in probed else mac
+            else:
+                state = 'Reachable' if ip in probed else 'Stale'
+            lines.append(f"{ip:<46}{mac:<19}{state}")
+        lines.append(f"{str(self.network.broadcast_address):<46}{'ff-ff-ff-ff-ff-ff':<19}Permanent")
+        return '\n'.join(lines) + '\n'
+
+    def ipconfig_output(self, cmd=None, match=None):
+        return (
+            "\nWindows IP Configuration\n\n\n"
+            "Ethernet adapter Ethernet:\n\n"
+            "   Media State . . . . . . . . . . . : Media disconnected\n\n"
+            "Wireless LAN adapter Local Area Connection* 10:\n\n"
+            "   Connection-specific DNS Suffix  . :\n"
+            "   Link-local IPv6 Address . . . . . : fe80::5d1c:3b2a:91e0:7f4d%12\n"
+            f"   IPv4 Address. . . . . . . . . . . : {self.gateway}\n"
+            f"   Subnet Mask . . . . . . . . . . . : {self.netmask}\n"
+            "   Default Gateway . . . . . . . . . :\n\n"
+            "Wireless LAN adapter Wi-Fi:\n\n"
+            "   Connection-specific DNS Suffix  . : home\n"
+            "   IPv4 Address. . . . . . . . . . . : 192.168.1.46\n"
+            "   Subnet Mask . . . . . . . . . . . : 255.255.255.0\n"
+            "   Default Gateway . . . . . . . . . : 192.168.1.1\n"
+        )
+
+    @staticmethod
+    def _format_rule(rule):
+        lines = [f"{'Rule Name:':<38}{rule['Rule Name']}", '-' * 70]
+        for key, value in rule.items():
+            if key != 'Rule Name':
+                lines.append(f"{key + ':':<38}{value}")
+        return '\n'.join(lines) + '\n'
+
+    def show_rules(self, cmd, match):
+        name_match = re.search(r'name=(?:"([^"]+)"|(\S+))', cmd)
+        name = name_match.group(1) or name_match.group(2)
+        with self.lock:
+            rules = list(self.rules) if name.lower() == 'all' else [
+                r for r in self.rules if r['Rule Name'] == name
+            ]
+        if not rules:
+            return CommandResult(cmd, 1, "No rules match the specified criteria.\n")
+        return '\n' + '\n'.join(self._format_rule(r) for r in rules) + 'Ok.\n\n'
+
+    def add_rule(self, cmd, match):
+        params = dict(re.findall(r'(\w+)=("[^"]*"|\S+)', cmd))
+        params = {k.lower(): v.strip('"') for k, v in params.items()}
+        rule = {
+            'Rule Name': params['name'],
+            'Enabled': 'Yes',
+            'Direction': params.get('dir', 'in').capitalize(),
+            'Profiles': 'Domain,Private,Public',
+            'Grouping': '',
+            'LocalIP': _format_ip_list(params.get('localip')),
+            'RemoteIP': _format_ip_list(params.get('remoteip')),
+            'Protocol': params.get('protocol', 'Any'),
+            'Edge traversal': 'No',
+            'Action': params.get('action', 'allow').capitalize(),
+        }
+        if 'remoteport' in params:
+            rule['RemotePort'] = params['remoteport']
+        with self.lock:
+            self.rules.append(rule)
+        return "Ok.\n\n"
+
+    def delete_rules(self, cmd, match):
+        name_match = re.search(r'name=(?:"([^"]+)"|(\S+))', cmd)
+        name = name_match.group(1) or name_match.group(2)
+        ip_match = re.search(r'(localip|remoteip)=(\S+)', cmd, re.IGNORECASE)
+        with self.lock:
+            kept = []
+            for rule in self.rules:
+                if name.lower() != 'all' and rule['Rule Name'] != name:
+                    kept.append(rule)
+                elif ip_match:
+                    field = 'LocalIP' if ip_match.group(1).lower() == 'localip' else 'RemoteIP'
+                    if ip_match.group(2) not in rule[field].replace('/32', '').split(','):
+                        kept.append(rule)
+            deleted = len(self.rules) - len(kept)
+            self.rules = kept
+        if not deleted:
+            return CommandResult(cmd, 1, "No rules match the specified criteria.\n")
+        return f"\nDeleted {deleted} rule(s).\nOk.\n\n"
+
+    def route_print(self, cmd=None, match=None):
+        lines = [
+            '=' * 75, 'IPv4 Route Table', '=' * 75, 'Active Routes:',
+            'Network Destination        Netmask          Gateway       Interface  Metric',
+            f"          0.0.0.0          0.0.0.0      192.168.1.1     192.168.1.46     35",
+            f"{str(self.network.network_address):>17}  {self.netmask:>15}         On-link {self.gateway:>16}    281",
+            f"{self.gateway:>17}  255.255.255.255         On-link {self.gateway:>16}    281",
+            f"{str(self.network.broadcast_address):>17}  255.255.255.255         On-link {self.gateway:>16}    281",
+        ]
+        with self.lock:
+            for ip in sorted(self.routes):
+                lines.append(f"{ip:>17}  255.255.255.255         On-link {self.gateway:>16}      2")
+        lines += ['=' * 75, 'Persistent Routes:', '  None', '']
+        return '\n'.join(lines) + '\n'
+
+    def route_add(self, cmd, match):
+        with self.lock:
+            if match.group(1) in self.routes:
+                return CommandResult(cmd, 1, "The route addition failed: The object already exists.\n")
+            self.routes.add(match.group(1))
+        return " OK!\n"
+
+    def route_delete(self, cmd, match):
+        with self.lock:
+            if match.group(1) not in self.routes:
+                return CommandResult(cmd, 1, "The route deletion failed: Element not found.\n")
+            self.routes.discard(match.group(1))
+        return " OK!\n"
+
+    def ping_output(self, cmd, match):
+        ip = match.group(1)
+        if ip not in self.clients:
+            return CommandResult(cmd, 1, f"\nPinging {ip} with 32 bytes of data:\nRequest timed out.\n")
+        return (
+            f"\nPinging {ip} with 32 bytes of data:\n"
+            f"Reply from {ip}: bytes=32 time=3ms TTL=64\n"
+        )
+
+    def executor(self, latency=0.0):
+        """Construit un ``ReplayExecutor`` branché sur ce hotspot"""
+        replay = ReplayExecutor(latency=latency, hostnames=self.hostnames(), prober=self.probe)
+
+        def netsh_script(cmd, match):
+            # netsh -f : chaque ligne du script est une commande netsh
+            with open(match.group(1), encoding='ascii') as f:
+                outputs = [replay.dispatch(f"netsh {line.strip()}") for line in f if line.strip()]
+            returncode = 0 if all(r.returncode == 0 for r in outputs) else 1
+            return CommandResult(cmd, returncode, ''.join(r.stdout for r in outputs))
+
+        return (
+            replay
+            .add(r'^netsh -f "?([^"]+)"?$', netsh_script)
+            .add(r'^arp -a', self.arp_output)
+            .add(r'^arp -d', "")
+            .add(r'^ipconfig', self.ipconfig_output)
+            .add(r'netsh advfirewall firewall show rule', self.show_rules)
+            .add(r'netsh advfirewall firewall add rule', self.add_rule)
+            .add(r'netsh advfirewall firewall delete rule', self.delete_rules)
+            .add(r'netsh interface ip delete arpcache', "Ok.\n")
+            .add(r'netsh interface ipv4 show neighbors', self.neighbors_output)
+            .add(r'^route print', self.route_print)
+            .add(r'^route add (\S+)', self.route_add)
+            .add(r'^route delete (\S+)', self.route_delete)
+            .add(r'^ping .*?(\d+\.\d+\.\d+\.\d+)', self.ping_output)
+        )
+
+
+def _format_ip_list(value):
+    if not value or value.lower() == 'any':
+        return 'Any'
+    return ','.join(f"{ip}/32" if '/' not in ip and '-' not in ip else ip for ip in value.split(','))
+
+
+def _executor_from_env():
+    if os.environ.get('HOTSPOT_EXECUTOR', '').lower() == 'replay':
+        hotspot = SimulatedHotspot(clients=int(os.environ.get('HOTSPOT_REPLAY_CLIENTS', 5)),
+                                   host_id=int(os.environ.get('HOTSPOT_REPLAY_HOST', 0)),
+                                   gone=int(os.environ.get('HOTSPOT_REPLAY_GONE', 0)))
+        return hotspot.executor(latency=float(os.environ.get('HOTSPOT_REPLAY_LATENCY', 0)))
+    return SubprocessExecutor()
+
+
+_executor = _executor_from_env()
+
+
+def get_executor():
+    return _executor
+
+
+def set_executor(executor):
+    """Remplace l'exécuteur courant (banc d'essai, hotspot simulé)"""
+    global _executor
+    _executor = executor
+
+
+def run(cmd, timeout=None):
+    """Exécute une commande et retourne un ``CommandResult`` (chronométrée)"""
+    label = metrics.command_label(cmd)
+    start = time.perf_counter()
+    try:
+        result = _executor.run(cmd, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        metrics.observe_command(label, time.perf_counter() - start, timed_out=True)
+        raise
+    except Exception:
+        metrics.observe_command(label, time.perf_counter() - start, failed=True)
+        raise
+    metrics.observe_command(label, time.perf_counter() - start, failed=result.returncode != 0)
+    return result
+
+
+def check_output(cmd, timeout=None):
+    """Équivalent de ``subprocess.check_output`` via l'exécuteur courant"""
+    result = run(cmd, timeout=timeout)
+    if result.returncode != 0:
+        raise subprocess.CalledProcessError(result.returncode, cmd, result.stdout, result.stderr)
+    return result.stdout
+
+
+def iter_lines(cmd, timeout=None):
+    """Itère sur les lignes de sortie d'une commande (chronométrée jusqu'à la dernière ligne)"""
+    label = metrics.command_label(cmd)
+    start = time.perf_counter()
+    timed_out = failed = False
+    try:
+        yield from _executor.iter_lines(cmd, timeout=timeout)
+    except subprocess.TimeoutExpired:
+        timed_out = True
+        raise
+    except Exception:
+        failed = True
+        raise
+    finally:
+        metrics.observe_command(label, time.perf_counter() - start, failed=failed, timed_out=timed_out)
+
+
+def resolve_names(ips, nameserver=None, timeout=None):
+    """Résout un lot d'IPs en une passe ; retourne ip -> nom complet ou None"""
+    start = time.perf_counter()
+    results = _executor.resolve_names(ips, nameserver=nameserver, timeout=timeout)
+    metrics.observe_dns(time.perf_counter() - start, results)
+    return results
+
+
+def probe_hosts(ips, timeout=None, concurrency=None):
+    """Sonde ICMP groupée ; retourne les IPs qui ont répondu (chronométrée)"""
+    start = time.perf_counter()
+    alive = _executor.probe_hosts(ips, timeout=timeout, concurrency=concurrency)
+    metrics.observe_sweep(time.perf_counter() - start, len(ips), len(alive))
+    return alive
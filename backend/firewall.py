@@ -0,0 +1,138 @@
+"""Index des règles du pare-feu construit à partir d'un seul ``show rule name=all``.
+
+Au lieu de lancer un ``netsh ... show rule`` par appareil, on capture
+l'ensemble des règles une seule fois, on les indexe par IP et on garde
+l'index pendant quelques secondes.
+"""
+import ipaddress
+import threading
+import time
+
+import executor
+
+RULE_PREFIX = 'HOTSPOT_BLOCK_'
+SHOW_ALL_RULES = 'netsh advfirewall firewall show rule name=all'
+
+# Libellés anglais et français de la sortie netsh
+RULE_NAME_KEYS = ('Rule Name', 'Nom de la règle')
+LOCAL_IP_KEYS = ('LocalIP', 'IP locale')
+REMOTE_IP_KEYS = ('RemoteIP', 'IP distante')
+
+
+def parse_rules(output):
+    """Découpe la sortie de ``show rule`` en une liste de dictionnaires"""
+    rules = []
+    current_rule = None
+
+    for line in output.split('\n'):
+        line = line.strip()
+        if ':' not in line:
+            continue
+        key, value = line.split(':', 1)
+        key = key.strip()
+        value = value.strip()
+
+        if key in RULE_NAME_KEYS:
+            current_rule = {'name': value}
+            rules.append(current_rule)
+        elif current_rule is not None:
+            current_rule[key] = value
+
+    return rules
+
+
+def _field(rule, keys):
+    for key in keys:
+        if key in rule:
+            return rule[key]
+    return ''
+
+
+def rule_ips(rule):
+    """IPs individuelles citées par une règle (LocalIP, RemoteIP et nom HOTSPOT_BLOCK_)"""
+    ips = set()
+    for value in (_field(rule, LOCAL_IP_KEYS), _field(rule, REMOTE_IP_KEYS)):
+        for item in value.split(','):
+            item = item.strip()
+            if not item or item.lower() in ('any', 'tout', 'toutes') or '-' in item:
+                continue
+            try:
+                network = ipaddress.ip_network(item, strict=False)
+            except ValueError:
+                continue
+            if network.num_addresses == 1:
+                ips.add(str(network.network_address))
+
+    name = rule.get('name', '')
+    if name.startswith(RULE_PREFIX):
+        try:
+            ips.add(str(ipaddress.ip_address(name[len(RULE_PREFIX):].rsplit('_', 1)[0])))
+        except ValueError:
+            pass
+    return ips
+
+
+class RuleIndex:
+    """Instantané IP -> règles, rafraîchi au plus une fois par ``ttl`` secondes"""
+
+    def __init__(self, ttl=5):
+        self.ttl = ttl
+        self._by_ip = {}
+        self._rules = []
+        self._timestamp = 0
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+
+    def _is_fresh(self):
+        return time.time() - self._timestamp < self.ttl
+
+    def refresh(self):
+        """Relit toutes les règles en un seul appel à netsh"""
+        result = executor.run(SHOW_ALL_RULES, timeout=15)
+        rules = parse_rules(result.stdout)
+        by_ip = {}
+        for rule in rules:
+            for ip in rule_ips(rule):
+                by_ip.setdefault(ip, []).append(rule)
+
+        with self._lock:
+            self._rules = rules
+            self._by_ip = by_ip
+            self._timestamp = time.time()
+
+    def _ensure_fresh(self):
+        if self._is_fresh():
+            return
+        # Un seul rafraîchissement à la fois, les autres threads attendent son résultat
+        with self._refresh_lock:
+            if not self._is_fresh():
+                self.refresh()
+
+    def invalidate(self):
+        """Force une relecture au prochain accès (après block/unblock)"""
+        with self._lock:
+            self._timestamp = 0
+
+    def rules_for(self, ip):
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._by_ip.get(ip, ()))
+
+    def all_rules(self):
+        self._ensure_fresh()
+        with self._lock:
+            return list(self._rules)
+
+    def is_blocked(self, ip):
+        return any(rule['name'].startswith(RULE_PREFIX) for rule in self.rules_for(ip))
+
+    def blocked_ips(self):
+        self._ensure_fresh()
+        with self._lock:
+            return {
+                ip for ip, rules in self._by_ip.items()
+                if any(rule['name'].startswith(RULE_PREFIX) for rule in rules)
+            }
+
+
+rule_index = RuleIndex()
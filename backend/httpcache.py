@@ -0,0 +1,217 @@
+"""Réponses conditionnelles (ETag / If-None-Match), compression et cache de résultats.
+
+Le frontend interroge ``/devices`` en boucle : tant que la version de
+l'inventaire n'a pas changé, la réponse est un ``304`` sans corps. Les
+corps encodés (JSON, format compact, gzip) sont gardés pour la dernière
+version afin de ne pas resérialiser la liste à chaque client.
+
+Format compact (``?format=compact``) : noms des champs une seule fois
+puis une ligne (tableau) par appareil.
+"""
+import gzip
+import hashlib
+import json
+import threading
+import time
+import uuid
+
+from flask import Response, request
+
+GZIP_MIN_SIZE = 1024  # octets : en dessous, la compression ne rapporte rien
+GZIP_LEVEL = 5
+FORMATS = ('json', 'compact')
+
+# Change à chaque démarrage : les versions de l'inventaire repartent de zéro
+BOOT_ID = uuid.uuid4().hex[:8]
+
+
+def compact(items, fields):
+    """Tableau de tableaux : ``{"fields": [...], "rows": [[...], ...]}``"""
+    return {"fields": list(fields), "rows": [[item.get(f) for f in fields] for item in items]}
+
+
+def accepts_gzip():
+    return 'gzip' in request.headers.get('Accept-Encoding', '').lower()
+
+
+def response_format():
+    fmt = request.args.get('format', 'json').lower()
+    return fmt if fmt in FORMATS else 'json'
+
+
+def not_modified(etag):
+    """Vrai si le client possède déjà cette version (If-None-Match)"""
+    header = request.headers.get('If-None-Match')
+    if not header:
+        return False
+    if header.strip() == '*':
+        return True
+    # Comparaison faible : le préfixe W/ est ignoré des deux côtés
+    tags = {tag.strip().removeprefix('W/') for tag in header.split(',')}
+    return etag.removeprefix('W/') in tags
+
+
+def encode(payload, use_gzip):
+    body = json.dumps(payload, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    if use_gzip and len(body) >= GZIP_MIN_SIZE:
+        return gzip.compress(body, GZIP_LEVEL), True
+    return body, False
+
+
+def json_response(body, etag, gzipped=False, status=200, headers=None):
+    response = Response(body, status=status, mimetype='application/json')
+    response.headers['ETag'] = etag
+    # Le navigateur garde la réponse mais revalide à chaque fois
+    response.headers['Cache-Control'] = 'no-cache'
+    response.headers['Vary'] = 'Accept-Encoding'
+    if gzipped:
+        response.headers['Content-Encoding'] = 'gzip'
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+
+def not_modified_response(etag, headers=None):
+    response = Response(status=304)
+    response.headers['ETag'] = etag
+    response.headers['Cache-Control'] = 'no-cache'
+    for key, value in (headers or {}).items():
+        response.headers[key] = value
+    return response
+
+
+def content_etag(payload):
+    """ETag calculé sur le contenu, pour les réponses sans numéro de version"""
+    digest = hashlib.blake2b(json.dumps(payload, sort_keys=True, default=str).encode('utf-8'), digest_size=8)
+    return f'"{digest.hexdigest()}"'
+
+
+class VersionedBodies:
+    """Corps encodés de la dernière version, par (format, gzip)"""
+
+    def __init__(self):
+        self._version = None
+        self._bodies = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, version, key, build):
+        with self._lock:
+            if version != self._version:
+                self._version = version
+                self._bodies = {}
+            body = self._bodies.get(key)
+            if body is not None:
+                self.hits += 1
+                return body
+            self.misses += 1
+        body = build()
+        with self._lock:
+            if version == self._version:
+                self._bodies[key] = body
+        return body
+
+
+def versioned_response(version, payload, headers=None, bodies=None):
+    """Réponse JSON identifiée par ``version`` : 304 si le client l'a déjà
+
+    ``payload(fmt)`` construit le contenu, seulement si un corps doit être envoyé.
+    L'ETag est faible : le même contenu peut être servi compressé ou non.
+    """
+    fmt = response_format()
+    etag = f'W/"{BOOT_ID}-{version}-{fmt}"'
+    if not_modified(etag):
+        return not_modified_response(etag, headers)
+    use_gzip = accepts_gzip()
+    build = lambda: encode(payload(fmt), use_gzip)
+    body, gzipped = bodies.get(version, (fmt, use_gzip), build) if bodies is not None else build()
+    return json_response(body, etag, gzipped, headers=headers)
+
+
+def cached_response(payload):
+    """Réponse JSON avec ETag calculé sur le contenu : 304 si inchangé"""
+    etag = content_etag(payload)
+    if not_modified(etag):
+        return not_modified_response(etag)
+    body, gzipped = encode(payload, accepts_gzip())
+    return json_response(body, etag, gzipped)
+
+
+class ResultCache:
+    """Résultats de courte durée par clé, invalidés explicitement (blocage, déblocage)"""
+
+    def __init__(self, ttl=30, max_entries=256):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}  # clé -> (horodatage, valeur)
+        self._key_locks = {}  # clé -> [verrou, utilisateurs], seulement pendant un calcul
+        self._generation = 0  # incrémenté à chaque invalidation
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or time.time() - entry[0] >= self.ttl:
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def get(self, key, compute):
+        """Valeur en cache, ou ``compute()`` (un seul calcul simultané par clé)"""
+        value = self._lookup(key)
+        if value is not None:
+            return value
+        with self._lock:
+            # [verrou, threads qui l'utilisent] : retiré dès que plus personne n'attend la clé
+            slot = self._key_locks.get(key)
+            if slot is None:
+                slot = self._key_locks[key] = [threading.Lock(), 0]
+            slot[1] += 1
+        try:
+            with slot[0]:
+                value = self._lookup(key)
+                if value is not None:
+                    return value
+                with self._lock:
+                    self.misses += 1
+                    generation = self._generation
+                value = compute()
+                with self._lock:
+                    # Invalidation pendant le calcul : le résultat est peut-être déjà périmé
+                    if generation == self._generation:
+                        self._store(key, value)
+                return value
+        finally:
+            with self._lock:
+                slot[1] -= 1
+                if not slot[1]:
+                    del self._key_locks[key]
+
+    def _store(self, key, value):
+        now = time.time()
+        if key not in self._entries and len(self._entries) >= self.max_entries:
+            # Les entrées expirées partent d'abord, sinon la plus ancienne
+            expired = [k for k, (stamp, _) in self._entries.items() if now - stamp >= self.ttl]
+            for k in expired:
+                del self._entries[k]
+            if not expired:
+                oldest = min(self._entries, key=lambda k: self._entries[k][0])
+                del self._entries[oldest]
+        self._entries[key] = (now, value)
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._generation += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._generation += 1
+
+    def info(self):
+        with self._lock:
+            return {"entries": len(self._entries), "ttl": self.ttl, "hits": self.hits, "misses": self.misses}
@@ -0,0 +1,139 @@
+"""Inventaire des appareils tenu à jour par un thread de scan en arrière-plan.
+
+Les endpoints lisent le dernier instantané au lieu de relancer le scan
+complet (arp, DNS, ping, netsh) à chaque requête.
+"""
+import logging
+import threading
+import time
+
+log = logging.getLogger(__name__)
+
+class Snapshot:
+    """Instantané immuable de la table des appareils"""
+
+    __slots__ = ('version', 'devices', 'scanned_at', 'duration')
+
+    def __init__(self, version=0, devices=None, scanned_at=None, duration=None):
+        self.version = version
+        self.devices = devices or {}
+        self.scanned_at = scanned_at
+        self.duration = duration
+
+    def device_list(self):
+        return list(self.devices.values())
+
+    def info(self):
+        return {
+            "version": self.version,
+            "last_scan": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.scanned_at)) if self.scanned_at else None,
+            "scan_duration": round(self.duration, 3) if self.duration is not None else None,
+        }
+
+
+class DeviceInventory:
+    """Table versionnée des appareils, rafraîchie toutes les ``interval`` secondes"""
+
+    def __init__(self, scan, interval=5):
+        self.scan = scan
+        self.interval = interval
+        self._snapshot = Snapshot()
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._publish_lock = threading.Lock()
+        self._overrides = {}  # ip -> champs corrigés, appliqués aux scans commencés avant la correction
+        self._patched_at = 0
+        self._wakeup = threading.Event()
+        self._ready = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Démarre le thread de scan (sans effet s'il tourne déjà)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="device-inventory", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def add_listener(self, callback):
+        """``callback(old_snapshot, new_snapshot)`` est appelé à chaque nouvelle version"""
+        self._listeners.append(callback)
+
+    def refresh(self):
+        """Demande un scan immédiat (après un blocage par exemple)"""
+        self._wakeup.set()
+
+    def snapshot(self, wait=None):
+        """Dernier instantané ; ``wait`` attend le premier scan au plus ce délai"""
+        if wait:
+            self._ready.wait(wait)
+        return self._snapshot
+
+    def scan_once(self):
+        """Exécute un scan et publie l'instantané s'il diffère du précédent"""
+        start = time.time()
+        devices = {d['ip']: d for d in self.scan()}
+        duration = time.time() - start
+
+        with self._publish_lock:
+            if start < self._patched_at:
+                # Scan lancé avant la dernière correction : son état est peut-être déjà périmé
+                for ip, fields in self._overrides.items():
+                    if ip in devices:
+                        devices[ip] = {**devices[ip], **fields}
+            else:
+                self._overrides = {}
+            previous = self._snapshot
+            # Tous les champs comptent, last_seen compris : il ne bouge qu'à chaque sonde
+            # de présence, et le corps gardé pour une version ne doit pas le figer
+            changed = devices != previous.devices
+            version = previous.version + 1 if changed or not previous.scanned_at else previous.version
+            current = Snapshot(version, devices, start, duration)
+            self._snapshot = current
+        self._ready.set()
+
+        if version != previous.version:
+            self._notify(previous, current)
+        return current
+
+    def patch(self, updates):
+        """Corrige des champs d'appareils connus (``{ip: {champ: valeur}}``) sans attendre le scan
+
+        Publie aussitôt une nouvelle version si un champ a changé.
+        """
+        with self._publish_lock:
+            previous = self._snapshot
+            devices = dict(previous.devices)
+            for ip, fields in updates.items():
+                self._overrides.setdefault(ip, {}).update(fields)
+                if ip in devices and any(devices[ip].get(k) != v for k, v in fields.items()):
+                    devices[ip] = {**devices[ip], **fields}
+            self._patched_at = time.time()
+            if devices == previous.devices:
+                return previous
+            current = Snapshot(previous.version + 1, devices, previous.scanned_at, previous.duration)
+            self._snapshot = current
+        self._notify(previous, current)
+        return current
+
+    def _notify(self, previous, current):
+        for callback in self._listeners:
+            try:
+                callback(previous, current)
+            except Exception as e:
+                log.exception("Erreur listener inventaire: %s", e)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                self.scan_once()
+            except Exception as e:
+                log.exception("Erreur lors du scan des appareils: %s", e)
+            self._wakeup.wait(self.interval)
@@ -0,0 +1,187 @@
+"""Présence réelle des clients : sonde périodique du sous-réseau du hotspot.
+
+Une entrée de ``arp -a`` peut survivre plusieurs minutes au départ d'un
+appareil. Le moniteur sonde toutes les adresses du sous-réseau en une
+passe (ICMP en parallèle, voir ``prober``), puis lit une seule fois la
+table des voisins : la sonde a forcé une résolution ARP, si bien qu'un
+appareil qui ignore ICMP (pare-feu Windows, appareil bloqué) est tout de
+même vu ``Reachable``. Chaque preuve de présence met à jour ``last_seen``.
+
+    online    preuve de présence depuis moins de ``offline_after`` secondes
+    offline   plus de preuve depuis ``offline_after`` secondes
+    unknown   apparu depuis la dernière sonde (une sonde est alors demandée)
+"""
+import logging
+import re
+import threading
+import time
+
+import executor
+
+log = logging.getLogger(__name__)
+
+SWEEP_INTERVAL = 15    # secondes entre deux sondes du sous-réseau
+OFFLINE_AFTER = 60     # secondes sans preuve de présence avant de passer hors ligne
+MAX_SWEEP_HOSTS = 1024  # au-delà, seules les adresses de la table ARP sont sondées
+SHOW_NEIGHBORS = 'netsh interface ipv4 show neighbors'
+
+NEIGHBOR_PATTERN = re.compile(r'^\s*(\d{1,3}(?:\.\d{1,3}){3})\s+([0-9A-Fa-f]{2}(?:[-:][0-9A-Fa-f]{2}){5})\s+(\S+)')
+# États de la table des voisins confirmant une réponse ARP récente (Windows anglais et français)
+REACHABLE_STATES = ('reachable', 'accessible')
+
+
+def parse_neighbors(output, hotspot_info=None):
+    """IPs des clients dont l'entrée de voisin est ``Reachable``"""
+    reachable = set()
+    for line in output.splitlines():
+        match = NEIGHBOR_PATTERN.match(line)
+        if match is None or match.group(3).lower() not in REACHABLE_STATES:
+            continue
+        ip = match.group(1)
+        if hotspot_info is None or hotspot_info.contains(ip):
+            reachable.add(ip)
+    return reachable
+
+
+def sweep_targets(hotspot_info, known_ips=()):
+    """Adresses à sonder : tout le sous-réseau s'il est raisonnable, plus les IPs connues"""
+    targets = set(ip for ip in known_ips if hotspot_info.contains(ip))
+    network = hotspot_info.network
+    if network is not None and network.num_addresses - 2 <= MAX_SWEEP_HOSTS:
+        targets.update(str(host) for host in network.hosts() if hotspot_info.contains(str(host)))
+    return sorted(targets, key=lambda ip: tuple(int(part) for part in ip.split('.')))
+
+
+class LivenessMonitor:
+    """Dernière preuve de présence de chaque client (par MAC, à défaut par IP)"""
+
+    def __init__(self, hotspot_info, known_entries, interval=SWEEP_INTERVAL, offline_after=OFFLINE_AFTER,
+                 timeout=None, concurrency=None):
+        self.hotspot_info = hotspot_info    # () -> HotspotInfo
+        self.known_entries = known_entries  # () -> {ip: mac} (table ARP)
+        self.interval = interval
+        self.offline_after = offline_after
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self._seen = {}     # MAC et IP -> horodatage de la dernière preuve
+        self._arrived = {}  # IP -> arrivée dans la table ARP, en attente d'une sonde
+        self._lock = threading.Lock()
+        self._listeners = []
+        self._wakeup = threading.Event()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.last_sweep = None
+        self.last_duration = None
+        self.last_targets = 0
+        self.last_alive = 0
+
+    def add_listener(self, callback):
+        """``callback(ips)`` est appelé quand la présence de clients a changé"""
+        self._listeners.append(callback)
+
+    def start(self):
+        """Démarre la sonde périodique (sans effet si elle tourne déjà)"""
+        with self._lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="liveness", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+        self._wakeup.set()
+
+    def refresh(self):
+        """Demande une sonde immédiate"""
+        self._wakeup.set()
+
+    def note_arrivals(self, ips):
+        """Nouvelles entrées de la table ARP : présence inconnue jusqu'à la prochaine sonde"""
+        if not ips:
+            return
+        now = time.time()
+        with self._lock:
+            for ip in ips:
+                self._arrived[ip] = now
+        self.refresh()
+
+    def sweep(self):
+        """Une sonde du sous-réseau ; retourne les IPs dont la présence a changé"""
+        info = self.hotspot_info()
+        if not info.active:
+            return set()
+        entries = self.known_entries()
+        targets = sweep_targets(info, entries)
+        start = time.time()
+        before = {ip: self.presence(ip, mac, start) for ip, mac in entries.items()}
+
+        alive = executor.probe_hosts(targets, timeout=self.timeout, concurrency=self.concurrency)
+        result = executor.run(SHOW_NEIGHBORS, timeout=10)
+        alive |= parse_neighbors(result.stdout, info)
+
+        now = time.time()
+        with self._lock:
+            for ip in alive:
+                self._seen[ip] = now
+                if entries.get(ip):
+                    self._seen[entries[ip].upper()] = now
+            self._arrived = {ip: t for ip, t in self._arrived.items() if t > start}
+            self.last_sweep = now
+            self.last_duration = now - start
+            self.last_targets = len(targets)
+            self.last_alive = len(alive)
+            # Oubli des appareils absents depuis longtemps
+            for key in [k for k, seen in self._seen.items() if now - seen > 10 * self.offline_after]:
+                del self._seen[key]
+
+        changed = {ip for ip, mac in entries.items() if self.presence(ip, mac, now) != before[ip]}
+        # Répondants absents de la table ARP : ils y seront au prochain scan
+        changed |= alive - entries.keys()
+        if changed:
+            for callback in self._listeners:
+                try:
+                    callback(sorted(changed))
+                except Exception as e:
+                    log.exception("Erreur listener présence: %s", e)
+        return changed
+
+    def _lookup(self, ip, mac):
+        seen = self._seen.get(mac.upper()) if mac else None
+        return seen if seen is not None else self._seen.get(ip)
+
+    def last_seen(self, ip, mac=None):
+        """Horodatage de la dernière preuve de présence (None si jamais vu)"""
+        with self._lock:
+            return self._lookup(ip, mac)
+
+    def presence(self, ip, mac=None, now=None):
+        """``online``, ``offline`` ou ``unknown`` (voir le module)"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            seen = self._lookup(ip, mac)
+            if seen is not None and now - seen < self.offline_after:
+                return 'online'
+            if self.last_sweep is None or (seen is None and ip in self._arrived):
+                return 'unknown'
+        return 'offline'
+
+    def info(self):
+        with self._lock:
+            return {
+                "interval": self.interval,
+                "offline_after": self.offline_after,
+                "last_sweep": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_sweep)) if self.last_sweep else None,
+                "sweep_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+                "probed": self.last_targets,
+                "alive": self.last_alive,
+            }
+
+    def _run(self):
+        while not self._stopped.is_set():
+            self._wakeup.clear()
+            try:
+                self.sweep()
+            except Exception as e:
+                log.exception("Erreur de sonde de présence: %s", e)
+            self._wakeup.wait(self.interval)
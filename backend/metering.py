@@ -0,0 +1,414 @@
+"""Comptage du trafic par appareil et blocage automatique sur quota.
+
+Une source de compteurs fournit, pour chaque client du hotspot, les
+compteurs cumulés ``(octets reçus, octets émis, paquets reçus, paquets
+émis)``. Le compteur les échantillonne à intervalle fixe et range chaque
+échantillon dans un tampon circulaire par appareil, fait de tableaux
+``array`` de taille fixe : la mémoire ne grossit pas avec l'historique.
+
+Sources :
+    SyntheticCounterSource   trafic simulé, déterministe (tests, banc d'essai)
+    SnifferCounterSource     capture sur la carte du hotspot (scapy + Npcap)
+
+Sélection par variable d'environnement :
+    HOTSPOT_METER_SOURCE=auto|synthetic|sniffer|off
+"""
+import logging
+import math
+import os
+import threading
+import time
+import zlib
+from array import array
+
+try:
+    from scapy.all import AsyncSniffer, IP
+except ImportError:  # Capture indisponible : seule la source simulée fonctionne
+    AsyncSniffer = None
+
+log = logging.getLogger(__name__)
+
+FIELDS = ('rx_bytes', 'tx_bytes', 'rx_packets', 'tx_packets')
+SAMPLE_INTERVAL = 2  # secondes entre deux échantillons
+HISTORY_SIZE = int(os.environ.get('HOTSPOT_METER_HISTORY', 900))  # 30 min à 2 s
+DEVICE_EXPIRY = 600  # secondes sans échantillon avant d'oublier un appareil
+
+
+class RingBuffer:
+    """Derniers échantillons d'un appareil (horodatage + compteurs cumulés)"""
+
+    __slots__ = ('size', 'times', 'counters', 'head', 'count')
+
+    def __init__(self, size=HISTORY_SIZE):
+        self.size = size
+        self.times = array('d', bytes(8 * size))
+        # Un tableau par compteur, indexé comme ``times``
+        self.counters = [array('Q', bytes(8 * size)) for _ in FIELDS]
+        self.head = 0   # prochaine case écrite
+        self.count = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp, values):
+        i = self.head
+        self.times[i] = timestamp
+        for column, value in zip(self.counters, values):
+            column[i] = value
+        self.head = (i + 1) % self.size
+        if self.count < self.size:
+            self.count += 1
+
+    def _index(self, age):
+        """Case de l'échantillon ``age`` (0 = le plus récent)"""
+        return (self.head - 1 - age) % self.size
+
+    def latest(self):
+        if not self.count:
+            return None
+        i = self._index(0)
+        return self.times[i], tuple(column[i] for column in self.counters)
+
+    def _oldest_since(self, since):
+        """Âge de l'échantillon le plus ancien postérieur ou égal à ``since``"""
+        low, high = 0, self.count - 1
+        while low < high:
+            # Les horodatages décroissent avec l'âge : recherche dichotomique
+            middle = (low + high + 1) // 2
+            if self.times[self._index(middle)] >= since:
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    def delta(self, window):
+        """Trafic sur les ``window`` dernières secondes (limité à l'historique)
+
+        Retourne ``(durée couverte, (Δ octets reçus, Δ octets émis, ...))``.
+        """
+        if self.count < 2:
+            return 0.0, (0,) * len(FIELDS)
+        newest = self._index(0)
+        oldest = self._index(max(self._oldest_since(self.times[newest] - window), 1))
+        return (
+            self.times[newest] - self.times[oldest],
+            tuple(column[newest] - column[oldest] for column in self.counters)
+        )
+
+    def rate(self, window=SAMPLE_INTERVAL * 5):
+        """Débits moyens (par seconde) sur la fenêtre"""
+        elapsed, deltas = self.delta(window)
+        if not elapsed:
+            return (0.0,) * len(FIELDS)
+        return tuple(d / elapsed for d in deltas)
+
+    def history(self, limit=None):
+        """Débits entre échantillons successifs, du plus ancien au plus récent"""
+        n = self.count if limit is None else min(self.count, limit + 1)
+        points = []
+        for age in range(n - 2, -1, -1):
+            i, previous = self._index(age), self._index(age + 1)
+            elapsed = self.times[i] - self.times[previous]
+            if elapsed <= 0:
+                continue
+            point = {"time": round(self.times[i], 3)}
+            for field, column in zip(FIELDS, self.counters):
+                point[field + '_per_s'] = round((column[i] - column[previous]) / elapsed, 1)
+            points.append(point)
+        return points
+
+
+class QuotaRule:
+    """Volume maximal (octets reçus + émis) sur une fenêtre glissante"""
+
+    def __init__(self, limit_bytes, window):
+        if limit_bytes <= 0 or window <= 0:
+            raise ValueError("Quota et fenêtre doivent être positifs")
+        self.limit_bytes = int(limit_bytes)
+        self.window = float(window)
+
+    @classmethod
+    def from_dict(cls, data):
+        """Règle décrite par ``{"limit_mb": 500, "window": 900}`` (ou ``limit_bytes``)"""
+        if not isinstance(data, dict):
+            raise ValueError("Chaque quota doit être un objet {limit_mb, window}")
+        if data.get('limit_bytes') is not None:
+            limit = _number(data, 'limit_bytes')
+        else:
+            limit = _number(data, 'limit_mb') * 1e6
+        return cls(limit, _number(data, 'window'))
+
+    def usage(self, buffer):
+        _, deltas = buffer.delta(self.window)
+        return deltas[0] + deltas[1]
+
+    def info(self):
+        return {"limit_bytes": self.limit_bytes, "limit_mb": round(self.limit_bytes / 1e6, 3), "window": self.window}
+
+
+def _number(data, field):
+    value = data.get(field)
+    if value is None:
+        raise ValueError(f"Champ {field} manquant")
+    if isinstance(value, bool):
+        raise ValueError(f"Champ {field} : nombre attendu")
+    try:
+        value = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Champ {field} : nombre attendu") from None
+    if not math.isfinite(value):
+        raise ValueError(f"Champ {field} : nombre attendu")
+    return value
+
+
+class SyntheticCounterSource:
+    """Compteurs simulés : débit constant par client, dérivé de son IP.
+
+    ``clients()`` retourne les IPs connectées ; ``set_rate`` impose un débit
+    (octets/s) à un client pour déclencher un quota.
+    """
+
+    def __init__(self, clients, base_rate=50_000, clock=time.time):
+        self.clients = clients
+        self.base_rate = base_rate
+        self.clock = clock
+        self._rates = {}
+        self._totals = {}
+        self._last = {}
+        self._lock = threading.Lock()
+
+    def set_rate(self, ip, bytes_per_second):
+        with self._lock:
+            self._rates[ip] = bytes_per_second
+
+    def _rate(self, ip):
+        rate = self._rates.get(ip)
+        if rate is None:
+            # Débit stable d'un appel à l'autre, différent pour chaque client
+            rate = self.base_rate * (1 + zlib.crc32(ip.encode()) % 20) / 10
+        return rate
+
+    def read(self):
+        now = self.clock()
+        with self._lock:
+            for ip in self.clients():
+                rate = self._rate(ip)
+                elapsed = now - self._last.get(ip, now)
+                rx, tx, rx_packets, tx_packets = self._totals.get(ip, (0, 0, 0, 0))
+                received, sent = int(rate * elapsed), int(rate * elapsed / 4)
+                self._totals[ip] = (
+                    rx + received, tx + sent,
+                    rx_packets + received // 1200, tx_packets + sent // 600
+                )
+                self._last[ip] = now
+            return dict(self._totals)
+
+
+class SnifferCounterSource:
+    """Compteurs issus d'une capture passive sur la carte du hotspot (scapy)"""
+
+    def __init__(self, hotspot_info):
+        if AsyncSniffer is None:
+            raise RuntimeError("scapy n'est pas installé (pip install scapy, pilote Npcap)")
+        self.hotspot_info = hotspot_info
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._sniffer = AsyncSniffer(
+            iface=hotspot_info.interface,
+            filter=f"ip and net {hotspot_info.network}",
+            prn=self._count,
+            store=False
+        )
+        self._sniffer.start()
+
+    def _add(self, ip, index, length):
+        totals = self._totals.get(ip)
+        if totals is None:
+            totals = self._totals[ip] = [0, 0, 0, 0]
+        totals[index] += length
+        totals[index + 2] += 1
+
+    def _count(self, packet):
+        if IP not in packet:
+            return
+        src, dst, length = packet[IP].src, packet[IP].dst, packet[IP].len
+        with self._lock:
+            # Du point de vue du client : reçu = destination, émis = source
+            if dst != self.hotspot_info.gateway and self.hotspot_info.contains(dst):
+                self._add(dst, 0, length)
+            if src != self.hotspot_info.gateway and self.hotspot_info.contains(src):
+                self._add(src, 1, length)
+
+    def read(self):
+        with self._lock:
+            return {ip: tuple(totals) for ip, totals in self._totals.items()}
+
+    def stop(self):
+        self._sniffer.stop()
+
+
+class TrafficMeter:
+    """Échantillonne une source de compteurs et applique les quotas"""
+
+    def __init__(self, source=None, interval=SAMPLE_INTERVAL, history=HISTORY_SIZE, source_factory=None):
+        # source_factory : construit la source au premier démarrage (la capture ne démarre pas à l'import)
+        self.source = source
+        self.source_factory = source_factory
+        self.interval = interval
+        self.history_size = history
+        self.quotas = []
+        self._buffers = {}
+        self._previous = {}     # ip -> derniers compteurs bruts de la source
+        self._offsets = {}      # ip -> cumul conservé après une remise à zéro de la source
+        self._tripped = set()   # IPs ayant dépassé un quota (pas de nouveau déclenchement)
+        self._listeners = []
+        self._lock = threading.Lock()
+        self._stopped = threading.Event()
+        self._thread = None
+        self.last_sample = None
+
+    @property
+    def enabled(self):
+        return self.source is not None
+
+    def add_listener(self, callback):
+        """``callback(ips, rule)`` est appelé quand des appareils dépassent un quota"""
+        self._listeners.append(callback)
+
+    @property
+    def max_window(self):
+        """Fenêtre la plus longue couverte par l'historique (secondes)"""
+        return (self.history_size - 1) * self.interval
+
+    def set_quotas(self, rules):
+        """Remplace les quotas ; ``ValueError`` si une fenêtre dépasse l'historique"""
+        rules = list(rules)
+        for rule in rules:
+            if rule.window > self.max_window:
+                raise ValueError(f"Fenêtre de {rule.window:g}s supérieure à l'historique conservé "
+                                 f"({self.max_window:g}s, voir HOTSPOT_METER_HISTORY)")
+        with self._lock:
+            self.quotas = rules
+            self._tripped.clear()
+
+    def sample(self, now=None):
+        """Relève les compteurs de la source et vérifie les quotas"""
+        now = now if now is not None else time.time()
+        counters = self.source.read()
+        with self._lock:
+            for ip, values in counters.items():
+                previous = self._previous.get(ip)
+                if previous and any(v < p for v, p in zip(values, previous)):
+                    # Compteurs remis à zéro (redémarrage de la capture) : on garde le cumul
+                    self._offsets[ip] = tuple(o + p for o, p in zip(self._offsets.get(ip, (0,) * 4), previous))
+                self._previous[ip] = values
+                offset = self._offsets.get(ip)
+                if offset:
+                    values = tuple(v + o for v, o in zip(values, offset))
+                buffer = self._buffers.get(ip)
+                if buffer is None:
+                    buffer = self._buffers[ip] = RingBuffer(self.history_size)
+                buffer.append(now, values)
+
+            for ip in [ip for ip, b in self._buffers.items() if now - b.latest()[0] > DEVICE_EXPIRY]:
+                del self._buffers[ip]
+                self._previous.pop(ip, None)
+                self._offsets.pop(ip, None)
+            exceeded = self._check_quotas()
+            self.last_sample = now
+
+        for rule, ips in exceeded:
+            for callback in self._listeners:
+                try:
+                    callback(ips, rule)
+                except Exception as e:
+                    log.exception("Erreur listener quota: %s", e)
+        return len(counters)
+
+    def _check_quotas(self):
+        exceeded = []
+        over = set()
+        for rule in self.quotas:
+            ips = [ip for ip, buffer in self._buffers.items() if rule.usage(buffer) > rule.limit_bytes]
+            over.update(ips)
+            new = [ip for ip in ips if ip not in self._tripped]
+            if new:
+                self._tripped.update(new)
+                exceeded.append((rule, new))
+        # Un appareil repassé sous tous les quotas pourra déclencher à nouveau
+        self._tripped &= over
+        return exceeded
+
+    def rates(self, window=SAMPLE_INTERVAL * 5):
+        """Débit et cumul de chaque appareil"""
+        with self._lock:
+            result = {}
+            for ip, buffer in self._buffers.items():
+                _, totals = buffer.latest()
+                rates = buffer.rate(window)
+                result[ip] = {
+                    **{field: total for field, total in zip(FIELDS, totals)},
+                    **{field + '_per_s': round(rate, 1) for field, rate in zip(FIELDS, rates)},
+                }
+            return result
+
+    def history(self, ip, limit=None):
+        with self._lock:
+            buffer = self._buffers.get(ip)
+            return buffer.history(limit) if buffer else None
+
+    def info(self):
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "source": type(self.source).__name__ if self.source else None,
+                "interval": self.interval,
+                "history_size": self.history_size,
+                "max_window": self.max_window,
+                "devices": len(self._buffers),
+                "quotas": [rule.info() for rule in self.quotas],
+                "over_quota": sorted(self._tripped),
+                "last_sample": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_sample)) if self.last_sample else None,
+            }
+
+    def start(self):
+        """Démarre l'échantillonnage (sans effet s'il tourne déjà ou sans source)"""
+        with self._lock:
+            if self.source_factory:
+                self.source = self.source_factory()
+                self.source_factory = None
+            if not self.enabled or (self._thread and self._thread.is_alive()):
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="traffic-meter", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while True:
+            try:
+                self.sample()
+            except Exception as e:
+                log.exception("Erreur de comptage du trafic: %s", e)
+            if self._stopped.wait(self.interval):
+                return
+
+
+def source_from_env(clients, hotspot_info):
+    """Source choisie par HOTSPOT_METER_SOURCE ; None si le comptage est désactivé"""
+    choice = os.environ.get('HOTSPOT_METER_SOURCE', 'auto').lower()
+    if choice == 'auto':
+        if os.environ.get('HOTSPOT_EXECUTOR', '').lower() == 'replay':
+            choice = 'synthetic'
+        else:
+            choice = 'sniffer' if AsyncSniffer is not None else 'off'
+    if choice == 'synthetic':
+        return SyntheticCounterSource(clients)
+    if choice == 'sniffer':
+        try:
+            return SnifferCounterSource(hotspot_info)
+        except Exception as e:
+            log.warning("Comptage du trafic désactivé: %s", e)
+    return None
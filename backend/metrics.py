@@ -0,0 +1,231 @@
+"""Mesures de latence (histogrammes, compteurs) au format texte Prometheus.
+
+Chaque commande externe, chaque résolution DNS et chaque endpoint est
+chronométré. Les durées sont aussi ajoutées à la trace de la requête en
+cours (``contextvars``), restituée dans l'en-tête ``Server-Timing``.
+"""
+import contextvars
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(f'{n}="{str(v)}"' for n, v in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    def __init__(self, name, description, labelnames=()):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_format_labels(self.labelnames, labels)} {value}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets)
+        self._series = {}  # labels -> [compteurs par intervalle (+Inf inclus), somme, nombre]
+        self._lock = threading.Lock()
+
+    def observe(self, value, *labels):
+        index = bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.description}", f"# TYPE {self.name} histogram"]
+        names = self.labelnames + ('le',)
+        with self._lock:
+            for labels, (counts, total, count) in sorted(self._series.items()):
+                cumulative = 0
+                for bound, n in zip(self.buckets + ('+Inf',), counts):
+                    cumulative += n
+                    lines.append(f"{self.name}_bucket{_format_labels(names, labels + (bound,))} {cumulative}")
+                label_text = _format_labels(self.labelnames, labels)
+                lines.append(f"{self.name}_sum{label_text} {total:.6f}")
+                lines.append(f"{self.name}_count{label_text} {count}")
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+
+    def counter(self, name, description, labelnames=()):
+        metric = Counter(name, description, labelnames)
+        self._metrics.append(metric)
+        return metric
+
+    def histogram(self, name, description, labelnames=(), buckets=LATENCY_BUCKETS):
+        metric = Histogram(name, description, labelnames, buckets)
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+command_duration = registry.histogram(
+    'hotspot_command_duration_seconds', "Durée des commandes système", ('command',))
+command_timeouts = registry.counter(
+    'hotspot_command_timeouts_total', "Commandes système interrompues par leur délai", ('command',))
+command_errors = registry.counter(
+    'hotspot_command_errors_total', "Commandes système en échec (code retour non nul ou exception)", ('command',))
+dns_duration = registry.histogram(
+    'hotspot_dns_batch_duration_seconds', "Durée d'une résolution de noms groupée")
+dns_lookups = registry.counter(
+    'hotspot_dns_lookups_total', "Résolutions de noms par résultat", ('result',))
+sweep_duration = registry.histogram(
+    'hotspot_liveness_sweep_duration_seconds', "Durée d'une sonde de présence du sous-réseau")
+sweep_probes = registry.counter(
+    'hotspot_liveness_probes_total', "Adresses sondées par résultat ICMP", ('result',))
+section_duration = registry.histogram(
+    'hotspot_section_duration_seconds', "Durée des étapes du scan (table ARP, noms, statut...)", ('section',))
+request_duration = registry.histogram(
+    'hotspot_http_request_duration_seconds', "Durée de traitement des requêtes HTTP", ('endpoint', 'method', 'status'))
+
+KNOWN_COMMANDS = ('arp', 'ipconfig', 'netsh', 'route', 'ping', 'nbtstat')
+
+
+def command_label(cmd):
+    """Nom court et borné de la commande (``netsh -f ...`` -> ``netsh``)"""
+    name = cmd.split(None, 1)[0].lower() if cmd.strip() else ''
+    return name if name in KNOWN_COMMANDS else 'other'
+
+
+# --- Trace par requête ---
+
+class Trace:
+    """Durées cumulées par étape pendant une requête"""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.spans = {}  # nom -> [durée totale, nombre d'appels]
+        self._lock = threading.Lock()
+
+    def add(self, name, duration):
+        with self._lock:
+            span = self.spans.get(name)
+            if span is None:
+                self.spans[name] = [duration, 1]
+            else:
+                span[0] += duration
+                span[1] += 1
+
+    def server_timing(self, prefix=''):
+        with self._lock:
+            spans = sorted(self.spans.items(), key=lambda item: -item[1][0])
+        return [
+            f'{prefix}{name};dur={total * 1000:.1f};desc="{count}x"'
+            for name, (total, count) in spans
+        ]
+
+
+_current_trace = contextvars.ContextVar('hotspot_trace', default=None)
+
+
+def begin_trace():
+    """Démarre une trace pour le contexte courant"""
+    trace = Trace()
+    _current_trace.set(trace)
+    return trace
+
+
+def end_trace():
+    # Pas de jeton : la fin de requête peut s'exécuter dans un contexte copié (worker pare-feu)
+    _current_trace.set(None)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+@contextmanager
+def trace():
+    token = _current_trace.set(Trace())
+    try:
+        yield _current_trace.get()
+    finally:
+        _current_trace.reset(token)
+
+
+def record_span(name, duration):
+    current = _current_trace.get()
+    if current is not None:
+        current.add(name, duration)
+
+
+@contextmanager
+def section(name):
+    """Chronomètre une étape du traitement (histogramme + trace)"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        duration = time.perf_counter() - start
+        section_duration.observe(duration, name)
+        record_span(name, duration)
+
+
+def observe_command(label, duration, failed=False, timed_out=False):
+    command_duration.observe(duration, label)
+    if timed_out:
+        command_timeouts.inc(label)
+    if failed or timed_out:
+        command_errors.inc(label)
+    record_span(f"cmd_{label}", duration)
+
+
+def observe_dns(duration, results):
+    dns_duration.observe(duration)
+    resolved = sum(1 for name in results.values() if name)
+    if resolved:
+        dns_lookups.inc('resolved', amount=resolved)
+    if len(results) - resolved:
+        dns_lookups.inc('unresolved', amount=len(results) - resolved)
+    record_span("dns", duration)
+
+
+def observe_sweep(duration, probed, replied):
+    sweep_duration.observe(duration)
+    if replied:
+        sweep_probes.inc('reply', amount=replied)
+    if probed - replied:
+        sweep_probes.inc('silent', amount=probed - replied)
+    record_span("sweep", duration)
+
+
+def render():
+    return registry.render()
@@ -0,0 +1,180 @@
+"""Cache persistant des noms d'appareils.
+
+Les entrées sont indexées par MAC (l'IP change d'un bail DHCP à l'autre)
+avec un index secondaire par IP, limitées en taille (LRU) et sauvegardées
+sur disque pour que les noms soient disponibles dès le redémarrage.
+
+Un nom réellement résolu est conservé ``positive_ttl`` secondes ; un
+échec de résolution (nom par défaut ``Appareil-NN``) seulement
+``negative_ttl`` secondes, afin de retenter rapidement. Un nom périmé
+reste servi tant que la nouvelle résolution n'a rien donné de mieux.
+"""
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+
+log = logging.getLogger(__name__)
+
+
+class NameCache:
+    def __init__(self, path=None, max_entries=1024, positive_ttl=3600, negative_ttl=60):
+        self.path = path
+        self.max_entries = max_entries
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries = OrderedDict()  # clé (MAC ou IP) -> entrée
+        self._by_ip = {}               # IP -> clé
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = False
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @staticmethod
+    def _key(ip, mac):
+        return mac.lower() if mac else ip
+
+    def _find(self, ip, mac):
+        key = self._key(ip, mac)
+        if key in self._entries:
+            return key, self._entries[key]
+        # Repli sur l'IP : l'adresse a pu être réattribuée à un autre appareil
+        key = self._by_ip.get(ip)
+        entry = self._entries.get(key)
+        if entry is None or (mac and entry['mac'] and entry['mac'].lower() != mac.lower()):
+            return None, None
+        return key, entry
+
+    def lookup(self, ip, mac=None):
+        """Retourne ``(nom, frais)`` ou ``None`` ; un nom périmé est retourné avec ``frais=False``"""
+        with self._lock:
+            key, entry = self._find(ip, mac)
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            fresh = time.time() < entry['expires']
+            if fresh:
+                self.hits += 1
+            else:
+                self.misses += 1
+            return entry['name'], fresh
+
+    def peek(self, ip, mac=None):
+        """``(frais, résolu)`` sans toucher aux compteurs ni à l'ordre LRU"""
+        with self._lock:
+            _, entry = self._find(ip, mac)
+            if entry is None:
+                return False, False
+            return time.time() < entry['expires'], entry['resolved']
+
+    def store(self, ip, mac, name, resolved):
+        """Enregistre le résultat d'une résolution ; un échec n'écrase pas un vrai nom"""
+        now = time.time()
+        with self._lock:
+            old_key, previous = self._find(ip, mac)
+            key = self._key(ip, mac)
+            if not resolved and previous and previous['resolved']:
+                name = previous['name']
+            if old_key is not None and old_key != key:
+                self._entries.pop(old_key, None)
+            if previous and previous['ip'] != ip and self._by_ip.get(previous['ip']) == old_key:
+                del self._by_ip[previous['ip']]
+
+            self._entries[key] = {
+                'name': name,
+                'ip': ip,
+                'mac': mac,
+                'resolved': resolved or bool(previous and previous['resolved']),
+                'expires': now + (self.positive_ttl if resolved else self.negative_ttl),
+            }
+            self._entries.move_to_end(key)
+            self._by_ip[ip] = key
+            self._dirty = True
+
+            while len(self._entries) > self.max_entries:
+                evicted_key, evicted = self._entries.popitem(last=False)
+                if self._by_ip.get(evicted['ip']) == evicted_key:
+                    del self._by_ip[evicted['ip']]
+                self.evictions += 1
+
+    def invalidate(self, ip):
+        """Force une nouvelle résolution pour cette IP (le nom connu reste servi en attendant)"""
+        with self._lock:
+            key = self._by_ip.get(ip)
+            if key in self._entries:
+                self._entries[key]['expires'] = 0
+                self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_ip.clear()
+            self._dirty = True
+        self.save()
+
+    def info(self):
+        with self._lock:
+            now = time.time()
+            entries = list(self._entries.values())
+            return {
+                "cached_devices": len(entries),
+                "cache_entries": [e['ip'] for e in entries],
+                "resolved_entries": sum(1 for e in entries if e['resolved']),
+                "fresh_entries": sum(1 for e in entries if e['expires'] > now),
+                "max_entries": self.max_entries,
+                "positive_ttl": self.positive_ttl,
+                "negative_ttl": self.negative_ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "path": self.path,
+            }
+
+    def load(self):
+        """Recharge les noms résolus lors des exécutions précédentes"""
+        if not self.path or not os.path.exists(self.path):
+            return 0
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError) as e:
+            log.warning("Cache des noms illisible (%s): %s", self.path, e)
+            return 0
+
+        with self._lock:
+            for entry in stored.get('entries', []):
+                if not entry.get('resolved'):
+                    continue
+                key = self._key(entry['ip'], entry.get('mac'))
+                self._entries[key] = entry
+                self._by_ip[entry['ip']] = key
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._by_ip = {ip: key for ip, key in self._by_ip.items() if key in self._entries}
+            return len(self._entries)
+
+    def save(self):
+        """Écriture atomique du cache, uniquement s'il a changé"""
+        if not self.path:
+            return
+        # Une écriture à la fois : l'instantané pris en dernier est aussi écrit en dernier
+        with self._save_lock:
+            with self._lock:
+                if not self._dirty:
+                    return
+                data = {'saved_at': time.time(), 'entries': [dict(e) for e in self._entries.values()]}
+                self._dirty = False
+            tmp_path = self.path + '.tmp'
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump(data, f, ensure_ascii=False)
+                os.replace(tmp_path, self.path)
+            except OSError as e:
+                with self._lock:
+                    self._dirty = True
+                log.warning("Impossible d'enregistrer le cache des noms: %s", e)
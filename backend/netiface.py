@@ -0,0 +1,151 @@
+"""Détection de la carte du hotspot, de sa passerelle et de son sous-réseau.
+
+``ipconfig`` n'est analysé qu'une fois puis le résultat est partagé par
+tous les endpoints jusqu'à expiration (ou invalidation explicite).
+
+Variables d'environnement :
+    HOTSPOT_GATEWAY=192.168.137.1    forcer l'IP de la passerelle du hotspot
+    HOTSPOT_SUBNET=192.168.137.0/24  forcer le sous-réseau (sinon lu dans ipconfig)
+"""
+import ipaddress
+import logging
+import os
+import re
+import socket
+import threading
+import time
+
+import executor
+
+log = logging.getLogger(__name__)
+
+DEFAULT_GATEWAY = '192.168.137.1'  # Adresse par défaut du partage de connexion Windows
+DEFAULT_NETMASK = '255.255.255.0'
+
+# Carte virtuelle utilisée par le point d'accès mobile Windows
+HOTSPOT_ADAPTER_PATTERN = re.compile(r'(Local Area Connection|Connexion au réseau local)\*', re.IGNORECASE)
+IPV4_PATTERN = re.compile(r'^\s*(IPv4 Address|Adresse IPv4)[ .]*:\s*([\d.]+)', re.IGNORECASE)
+MASK_PATTERN = re.compile(r'^\s*(Subnet Mask|Masque de sous-réseau)[ .]*:\s*([\d.]+)', re.IGNORECASE)
+
+
+def parse_ipconfig(output):
+    """Liste des cartes ``{'name', 'ipv4', 'netmask'}`` de la sortie d'ipconfig"""
+    adapters = []
+    current = None
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        if not line[0].isspace() and line.rstrip().endswith(':'):
+            current = {'name': line.rstrip().rstrip(':').strip(), 'ipv4': None, 'netmask': None}
+            adapters.append(current)
+            continue
+        if current is None:
+            continue
+        match = IPV4_PATTERN.match(line)
+        if match:
+            current['ipv4'] = match.group(2)
+            continue
+        match = MASK_PATTERN.match(line)
+        if match:
+            current['netmask'] = match.group(2)
+    return adapters
+
+
+class HotspotInfo:
+    __slots__ = ('interface', 'gateway', 'network', 'active', 'detected_at',
+                 '_network_int', '_mask_int', '_excluded')
+
+    def __init__(self, interface, gateway, network, active, detected_at):
+        self.interface = interface
+        self.gateway = gateway
+        self.network = network
+        self.active = active
+        self.detected_at = detected_at
+        # Comparaisons sur entiers : contains() est appelé pour chaque ligne ARP
+        self._network_int = int(network.network_address)
+        self._mask_int = int(network.netmask)
+        self._excluded = {
+            int(network.network_address),
+            int(network.broadcast_address),
+            int(ipaddress.IPv4Address(gateway)),
+        }
+
+    def contains(self, ip):
+        """IP d'un client du hotspot (ni la passerelle, ni le réseau, ni la diffusion)"""
+        try:
+            address = int.from_bytes(socket.inet_aton(ip), 'big')
+        except OSError:
+            return False
+        return address & self._mask_int == self._network_int and address not in self._excluded
+
+    def to_dict(self):
+        return {
+            "interface": self.interface,
+            "gateway": self.gateway,
+            "subnet": str(self.network),
+            "active": self.active,
+        }
+
+
+def select_hotspot_adapter(adapters, gateway=None):
+    """Carte portant la passerelle demandée, sinon la carte virtuelle du hotspot"""
+    with_ip = [a for a in adapters if a['ipv4']]
+    if gateway:
+        return next((a for a in with_ip if a['ipv4'] == gateway), None)
+    return (
+        next((a for a in with_ip if HOTSPOT_ADAPTER_PATTERN.search(a['name'])), None)
+        or next((a for a in with_ip if a['ipv4'] == DEFAULT_GATEWAY), None)
+    )
+
+
+class HotspotDiscovery:
+    """Résultat de détection mis en cache ``ttl`` secondes"""
+
+    def __init__(self, ttl=30, gateway=None, subnet=None):
+        self.ttl = ttl
+        self.gateway = gateway
+        self.subnet = subnet
+        self._info = None
+        self._lock = threading.Lock()
+
+    def detect(self):
+        try:
+            adapters = parse_ipconfig(executor.check_output('ipconfig', timeout=3))
+        except Exception as e:
+            log.warning("Erreur ipconfig: %s", e)
+            adapters = []
+
+        adapter = select_hotspot_adapter(adapters, self.gateway)
+        gateway = adapter['ipv4'] if adapter else (self.gateway or DEFAULT_GATEWAY)
+        if self.subnet:
+            network = ipaddress.IPv4Network(self.subnet, strict=False)
+        else:
+            netmask = (adapter and adapter['netmask']) or DEFAULT_NETMASK
+            network = ipaddress.IPv4Interface(f"{gateway}/{netmask}").network
+        return HotspotInfo(
+            adapter['name'] if adapter else None,
+            gateway,
+            network,
+            adapter is not None,
+            time.time()
+        )
+
+    def get(self):
+        info = self._info
+        if info and time.time() - info.detected_at < self.ttl:
+            return info
+        with self._lock:
+            info = self._info
+            if not info or time.time() - info.detected_at >= self.ttl:
+                info = self._info = self.detect()
+        return info
+
+    def invalidate(self):
+        self._info = None
+
+
+hotspot = HotspotDiscovery(
+    ttl=30,
+    gateway=os.environ.get('HOTSPOT_GATEWAY'),
+    subnet=os.environ.get('HOTSPOT_SUBNET')
+)
@@ -0,0 +1,164 @@
+"""Base OUI (IEEE MA-L / MA-M / MA-S) pour identifier le fabricant d'une MAC.
+
+Le fichier ``data/oui.txt`` contient une ligne par bloc attribué :
+``PRÉFIXE FABRICANT`` où le préfixe fait 6, 7 ou 9 chiffres hexadécimaux
+(24, 28 ou 36 bits). Il est chargé à la première recherche seulement, dans
+une table par longueur de préfixe : la recherche du plus long préfixe
+coûte au plus trois accès.
+
+Le fichier livré est un extrait ; pour la base complète :
+
+    python oui.py build oui.csv mam.csv oui36.csv -o data/oui.txt
+
+(fichiers CSV publiés par l'IEEE sur standards-oui.ieee.org)
+"""
+import argparse
+import csv
+import logging
+import os
+import threading
+from functools import lru_cache
+
+log = logging.getLogger(__name__)
+
+OUI_FILE = os.environ.get(
+    'HOTSPOT_OUI_FILE',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'data', 'oui.txt')
+)
+
+PREFIX_BITS = (36, 28, 24)  # Du plus long au plus court
+
+# Type d'appareil déduit du fabricant (mots-clés en minuscules)
+VENDOR_TYPES = [
+    ('Mobile/IoT', ('apple', 'samsung', 'xiaomi', 'huawei', 'honor', 'oneplus', 'oppo', 'vivo',
+                    'realme', 'motorola', 'google', 'nokia', 'sony', 'lg electronics', 'htc',
+                    'zte', 'espressif', 'raspberry', 'amazon', 'nintendo', 'tuya', 'fitbit',
+                    'garmin', 'roku')),
+    ('Ordinateur', ('intel', 'dell', 'hewlett', 'lenovo', 'asustek', 'micro-star', 'gigabyte',
+                    'acer', 'liteon', 'azurewave', 'realtek', 'vmware', 'microsoft', 'toshiba',
+                    'fujitsu', 'framework')),
+    ('Appareil réseau', ('cisco', 'tp-link', 'netgear', 'ubiquiti', 'd-link', 'mikrotik',
+                         'aruba', 'juniper', 'zyxel', 'linksys')),
+]
+DEFAULT_TYPE = 'Appareil réseau'
+
+
+def mac_to_int(mac):
+    digits = ''.join(c for c in mac if c.isalnum())
+    if len(digits) != 12:
+        raise ValueError(f"MAC invalide: {mac}")
+    return int(digits, 16)
+
+
+def is_randomized(mac):
+    """MAC administrée localement (bit U/L) : adresse privée aléatoire d'un téléphone/PC"""
+    return bool(mac_to_int(mac) >> 40 & 0x02)
+
+
+class OuiDatabase:
+    def __init__(self, path=OUI_FILE):
+        self.path = path
+        self._tables = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        tables = {bits: {} for bits in PREFIX_BITS}
+        vendors = {}
+        skipped = 0
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                for line in f:
+                    if not line.strip() or line.startswith('#'):
+                        continue
+                    prefix, _, vendor = line.rstrip('\n').partition(' ')
+                    bits = len(prefix) * 4
+                    try:
+                        value = int(prefix, 16)
+                    except ValueError:
+                        bits = None
+                    if bits not in tables:
+                        skipped += 1
+                        continue
+                    # Un même nom de fabricant partagé par tous ses blocs
+                    tables[bits][value] = vendors.setdefault(vendor, vendor)
+        except OSError as e:
+            log.warning("Base OUI indisponible (%s): %s", self.path, e)
+        if skipped:
+            log.warning("Base OUI (%s) : %d ligne(s) invalide(s) ignorée(s)", self.path, skipped)
+        return tables
+
+    def _get_tables(self):
+        if self._tables is None:
+            with self._lock:
+                if self._tables is None:
+                    self._tables = self._load()
+        return self._tables
+
+    def __len__(self):
+        return sum(len(t) for t in self._get_tables().values())
+
+    def vendor(self, mac):
+        """Fabricant du plus long préfixe correspondant, ou None"""
+        value = mac_to_int(mac)
+        tables = self._get_tables()
+        for bits in PREFIX_BITS:
+            vendor = tables[bits].get(value >> (48 - bits))
+            if vendor is not None:
+                return vendor
+        return None
+
+
+@lru_cache(maxsize=4096)
+def vendor_type(vendor):
+    name = vendor.lower()
+    for device_type, keywords in VENDOR_TYPES:
+        if any(keyword in name for keyword in keywords):
+            return device_type
+    return DEFAULT_TYPE
+
+
+oui_database = OuiDatabase()
+
+
+def lookup(mac):
+    """``(fabricant, type d'appareil)`` d'une MAC"""
+    if is_randomized(mac):
+        # Adresse privée (iOS, Android, Windows) : le préfixe n'identifie aucun fabricant
+        return 'MAC aléatoire', 'Mobile/IoT'
+    vendor = oui_database.vendor(mac)
+    if vendor is None:
+        return None, DEFAULT_TYPE
+    return vendor, vendor_type(vendor)
+
+
+def build(csv_paths, output):
+    """Convertit les CSV de l'IEEE en fichier compact trié"""
+    entries = {}
+    for path in csv_paths:
+        with open(path, encoding='utf-8', newline='') as f:
+            for row in csv.DictReader(f):
+                prefix = row['Assignment'].strip().upper()
+                vendor = ' '.join(row['Organization Name'].split())
+                if len(prefix) in (6, 7, 9) and vendor:
+                    entries[prefix] = vendor
+    with open(output, 'w', encoding='utf-8', newline='\n') as f:
+        f.write("# Base OUI IEEE (MA-L, MA-M, MA-S) : PRÉFIXE FABRICANT\n")
+        for prefix in sorted(entries):
+            f.write(f"{prefix} {entries[prefix]}\n")
+    return len(entries)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Outils de la base OUI")
+    sub = parser.add_subparsers(dest='command', required=True)
+    build_parser = sub.add_parser('build', help="Générer le fichier compact depuis les CSV de l'IEEE")
+    build_parser.add_argument('csv', nargs='+')
+    build_parser.add_argument('-o', '--output', default=OUI_FILE)
+    lookup_parser = sub.add_parser('lookup', help="Rechercher le fabricant d'une MAC")
+    lookup_parser.add_argument('mac')
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        print(f"{build(args.csv, args.output)} préfixes écrits dans {args.output}")
+    else:
+        print(lookup(args.mac))
@@ -0,0 +1,119 @@
+"""Sonde de présence des clients du hotspot (ICMP echo en parallèle).
+
+Une seule boucle envoie les requêtes echo à toutes les adresses, au plus
+``concurrency`` en attente à la fois, chacune avec son propre délai :
+aucun processus ``ping`` n'est lancé par adresse.
+
+Le socket ICMP brut exige les droits administrateur (déjà requis pour
+netsh). À défaut, un datagramme UDP est envoyé à chaque adresse : il ne
+reçoit pas de réponse mais force la résolution ARP, dont le résultat est
+lu ensuite dans la table des voisins.
+"""
+import os
+import select
+import socket
+import struct
+import time
+from collections import OrderedDict, deque
+
+PROBE_CONCURRENCY = 64  # requêtes en attente de réponse au plus
+PROBE_TIMEOUT = 0.5     # délai de réponse de chaque adresse (s)
+DISCARD_PORT = 9
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+PAYLOAD = b'hotspot-liveness'
+
+
+def checksum(data):
+    if len(data) % 2:
+        data += b'\x00'
+    total = sum(struct.unpack(f'!{len(data) // 2}H', data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(ident, seq):
+    header = struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, 0, ident, seq)
+    return struct.pack('!BBHHH', ICMP_ECHO_REQUEST, 0, checksum(header + PAYLOAD), ident, seq) + PAYLOAD
+
+
+def is_echo_reply(packet, raw):
+    """Vrai pour une réponse echo ; un socket brut reçoit aussi l'en-tête IP"""
+    offset = (packet[0] & 0x0F) * 4 if raw and packet else 0
+    return len(packet) >= offset + 8 and packet[offset] == ICMP_ECHO_REPLY
+
+
+def open_icmp_socket():
+    """``(socket, brut)`` ; ``(None, False)`` si ICMP n'est pas autorisé"""
+    for kind in (socket.SOCK_RAW, socket.SOCK_DGRAM):
+        try:
+            return socket.socket(socket.AF_INET, kind, socket.IPPROTO_ICMP), kind == socket.SOCK_RAW
+        except OSError:
+            continue
+    return None, False
+
+
+class IcmpProber:
+    """Envoie une requête echo à des centaines d'adresses avec un délai par adresse"""
+
+    def __init__(self, timeout=PROBE_TIMEOUT, concurrency=PROBE_CONCURRENCY):
+        self.timeout = timeout
+        self.concurrency = concurrency
+
+    def probe(self, ips):
+        """Adresses ayant répondu (ensemble vide sans socket ICMP : voir ``touch``)"""
+        ips = list(ips)
+        if not ips:
+            return set()
+        sock, raw = open_icmp_socket()
+        if sock is None:
+            self.touch(ips)
+            return set()
+        sock.setblocking(False)
+        ident = os.getpid() & 0xFFFF
+        waiting = deque(ips)
+        pending = OrderedDict()  # ip -> échéance ; délai identique, donc dans l'ordre des échéances
+        alive = set()
+        seq = 0
+        try:
+            while waiting or pending:
+                now = time.monotonic()
+                while waiting and len(pending) < self.concurrency:
+                    ip = waiting.popleft()
+                    seq = (seq + 1) & 0xFFFF
+                    try:
+                        sock.sendto(build_echo_request(ident, seq), (ip, 0))
+                    except OSError:
+                        continue  # hôte injoignable immédiatement : pas de réponse à attendre
+                    pending[ip] = now + self.timeout
+                if not pending:
+                    continue
+                wait = max(0.0, next(iter(pending.values())) - now)
+                readable, _, _ = select.select([sock], [], [], wait)
+                while readable:
+                    try:
+                        packet, addr = sock.recvfrom(1024)
+                    except OSError:
+                        break  # plus rien à lire (BlockingIOError) ou erreur ICMP signalée
+                    if addr[0] in pending and is_echo_reply(packet, raw):
+                        del pending[addr[0]]
+                        alive.add(addr[0])
+                now = time.monotonic()
+                while pending and next(iter(pending.values())) <= now:
+                    pending.popitem(last=False)
+        finally:
+            sock.close()
+        return alive
+
+    def touch(self, ips):
+        """Datagramme UDP vers chaque adresse, puis attente de la résolution ARP"""
+        with socket.socket(socket.AF_INET, socket.SOCK_DGRAM) as sock:
+            sock.setblocking(False)
+            for ip in ips:
+                try:
+                    sock.sendto(b'\x00', (ip, DISCARD_PORT))
+                except OSError:
+                    continue
+        time.sleep(self.timeout)
@@ -0,0 +1,319 @@
+"""Réconciliation de l'état de blocage souhaité avec l'état réel.
+
+Le réconciliateur garde l'ensemble des IPs à bloquer, lit l'état réel en
+un seul instantané (règles ``HOTSPOT_BLOCK_`` + routes d'hôte) et n'émet
+que les opérations manquantes ou en trop. Un blocage déjà en place ne
+coûte donc aucune commande, et une passe périodique répare les écarts
+(redémarrage, règle supprimée à la main...).
+"""
+import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from blocking import (
+    BLOCK_RULES, MIN_PROTECTIONS, ROUTE_WORKERS, add_route, add_rule_line, delete_route, delete_rule_line,
+    host_routes, rule_name, run_netsh_script, run_routes, split_valid_ips
+)
+from firewall import RULE_PREFIX, rule_index
+from netiface import hotspot
+
+log = logging.getLogger(__name__)
+
+BLOCK_SUFFIXES = [suffix for suffix, _ in BLOCK_RULES]
+CLEANUP_BATCH = 100  # suppressions de règles par script netsh (une étape de progression)
+
+
+class ActualState:
+    __slots__ = ('rules', 'routes')
+
+    def __init__(self, rules, routes):
+        self.rules = rules    # ip -> noms des règles HOTSPOT_BLOCK_ présentes
+        self.routes = routes  # IPs ayant une route de blocage
+
+    def ips(self):
+        return set(self.rules) | self.routes
+
+
+class Plan:
+    def __init__(self):
+        self.netsh_lines = []
+        self.add_routes = []
+        self.delete_routes = []
+        self.changes = {}  # ip -> nombre d'opérations
+
+    def count(self, ip, n=1):
+        self.changes[ip] = self.changes.get(ip, 0) + n
+
+    def __len__(self):
+        return len(self.netsh_lines) + len(self.add_routes) + len(self.delete_routes)
+
+
+def read_actual_state(extra=()):
+    """Instantané frais des règles et des routes (une commande netsh, une route print).
+
+    Les routes sont lues pour les clients du hotspot et pour les IPs de
+    ``extra`` (IPs souhaitées ou visées), même hors du sous-réseau actuel :
+    une route posée avant un changement de sous-réseau reste visible et peut
+    être supprimée.
+    """
+    rule_index.invalidate()
+    rules = {}
+    for rule in rule_index.all_rules():
+        name = rule['name']
+        if name.startswith(RULE_PREFIX):
+            ip = name[len(RULE_PREFIX):].rsplit('_', 1)[0]
+            rules.setdefault(ip, set()).add(name)
+    extra = set(extra) | set(rules)
+    return ActualState(rules, host_routes(hotspot.get(), extra))
+
+
+def make_plan(desired, actual, scope):
+    """Opérations qui amènent les IPs de ``scope`` à l'état souhaité"""
+    plan = Plan()
+    for ip in sorted(scope):
+        present = actual.rules.get(ip, set())
+        if ip in desired:
+            expected = {rule_name(ip, suffix): suffix for suffix in BLOCK_SUFFIXES}
+            for name, suffix in expected.items():
+                if name not in present:
+                    plan.netsh_lines.append(add_rule_line(ip, suffix))
+                    plan.count(ip)
+            for name in sorted(present - expected.keys()):
+                plan.netsh_lines.append(delete_rule_line(name))
+                plan.count(ip)
+            if ip not in actual.routes:
+                plan.add_routes.append(ip)
+                plan.count(ip)
+        else:
+            for name in sorted(present):
+                plan.netsh_lines.append(delete_rule_line(name))
+                plan.count(ip)
+            if ip in actual.routes:
+                plan.delete_routes.append(ip)
+                plan.count(ip)
+    return plan
+
+
+class BlockReconciler:
+    def __init__(self, interval=60):
+        self.interval = interval
+        self._desired = None  # Adopté depuis l'état réel au premier passage
+        self._desired_view = frozenset()  # Copie lisible sans attendre la passe en cours
+        self._lock = threading.RLock()
+        self._thread_lock = threading.Lock()
+        self._listeners = []
+        self._stopped = threading.Event()
+        self._thread = None
+        self.last_run = None
+        self.last_operations = 0
+
+    def add_listener(self, callback):
+        """``callback(ips)`` est appelé quand une passe a modifié le pare-feu"""
+        self._listeners.append(callback)
+
+    def desired(self):
+        return set(self._desired_view)
+
+    def _publish(self):
+        self._desired_view = frozenset(self._desired or ())
+
+    def _notify(self, ips):
+        for callback in self._listeners:
+            try:
+                callback(ips)
+            except Exception as e:
+                log.exception("Erreur listener réconciliation: %s", e)
+
+    def set_desired(self, ips):
+        with self._lock:
+            self._desired = set(ips)
+            self._publish()
+
+    def _apply(self, plan, flush_arp):
+        lines = list(plan.netsh_lines)
+        if flush_arp:
+            # Forcer la reconnexion des appareils nouvellement bloqués
+            lines.append('interface ip delete arpcache')
+        if lines:
+            run_netsh_script(lines)
+        run_routes(add_route, plan.add_routes)
+        run_routes(delete_route, plan.delete_routes)
+        rule_index.invalidate()
+
+    def reconcile(self, scope=None):
+        """Une passe de réconciliation ; ``scope`` limite la passe à certaines IPs.
+
+        Retourne ``(état réel après la passe, plan exécuté)``.
+        """
+        with self._lock:
+            watched = set(self._desired or ()) | set(scope or ())
+            actual = read_actual_state(watched)
+            if self._desired is None:
+                self._desired = set(actual.rules)
+                self._publish()
+            if scope is None:
+                scope = self._desired | actual.ips()
+            plan = make_plan(self._desired, actual, scope)
+
+            if len(plan):
+                flush_arp = any(ip in self._desired for ip in plan.changes)
+                self._apply(plan, flush_arp)
+                after = read_actual_state(watched)
+            else:
+                after = actual
+
+            self.last_run = time.time()
+            self.last_operations = len(plan)
+
+        if len(plan):
+            self._notify(list(plan.changes))
+        return after, plan
+
+    def block(self, ips):
+        """Ajoute des IPs à l'état souhaité et les réconcilie ; sans effet si déjà bloquées.
+
+        Seuls les clients du hotspot peuvent être bloqués : une route /32
+        vers une autre adresse couperait l'accès de la machine elle-même.
+        """
+        start = time.time()
+        ips, results = split_valid_ips(ips)
+        hotspot_info = hotspot.get()
+        for ip in [ip for ip in ips if not hotspot_info.contains(ip)]:
+            ips.remove(ip)
+            results[ip] = {"success": False, "error": f"Adresse hors du hotspot ({hotspot_info.network})"}
+        if ips:
+            with self._lock:
+                if self._desired is None:
+                    self.reconcile(scope=())
+                self._desired.update(ips)
+                self._publish()
+                after, plan = self.reconcile(scope=set(ips))
+            for ip in ips:
+                rules = sorted(after.rules.get(ip, ()))
+                protections = len(rules) + (1 if ip in after.routes else 0)
+                results[ip] = {
+                    "success": protections >= MIN_PROTECTIONS,
+                    "protections": protections,
+                    "rules": rules,
+                    "route": ip in after.routes,
+                    "changes": plan.changes.get(ip, 0),
+                }
+        return results, time.time() - start
+
+    def unblock(self, ips):
+        """Retire des IPs de l'état souhaité et supprime leurs règles et routes"""
+        start = time.time()
+        ips, results = split_valid_ips(ips)
+        if ips:
+            with self._lock:
+                if self._desired is None:
+                    self.reconcile(scope=())
+                self._desired.difference_update(ips)
+                self._publish()
+                after, plan = self.reconcile(scope=set(ips))
+            for ip in ips:
+                remaining = len(after.rules.get(ip, ())) + (1 if ip in after.routes else 0)
+                results[ip] = {
+                    "success": remaining == 0,
+                    "removed": plan.changes.get(ip, 0),
+                    "route": ip not in after.routes,
+                    "changes": plan.changes.get(ip, 0),
+                }
+        return results, time.time() - start
+
+    def cleanup(self, dry_run=False, progress=None, workers=ROUTE_WORKERS, batch=CLEANUP_BATCH):
+        """Supprime toutes les règles ``HOTSPOT_BLOCK_`` et routes de blocage.
+
+        Un seul instantané, les suppressions de règles regroupées par scripts
+        netsh de ``batch`` lignes, les routes supprimées en parallèle par au
+        plus ``workers`` commandes. ``progress(événement)`` est appelé à chaque
+        étape. En ``dry_run``, rien n'est modifié : le plan est seulement décrit.
+        """
+        report = progress or (lambda event: None)
+        start = time.time()
+        with self._lock:
+            watched = set(self._desired or ())
+            actual = read_actual_state(watched)
+            plan = make_plan(set(), actual, actual.ips())
+            rule_names = sorted(name for names in actual.rules.values() for name in names)
+            routes = sorted(plan.delete_routes)
+            summary = {"rules": len(rule_names), "routes": len(routes), "ips": len(plan.changes)}
+            report({"phase": "snapshot", "dry_run": dry_run, **summary})
+            if dry_run:
+                result = {**summary, "dry_run": True, "rule_names": rule_names, "route_ips": routes,
+                          "duration": time.time() - start}
+                report({"phase": "done", **result})
+                return result
+
+            # Plus aucun blocage souhaité : la passe périodique ne doit rien recréer
+            self._desired = set()
+            self._publish()
+
+            lines = plan.netsh_lines
+            for i in range(0, len(lines), batch):
+                run_netsh_script(lines[i:i + batch])
+                report({"phase": "rules", "done": min(i + batch, len(lines)), "total": len(lines)})
+            rule_index.invalidate()
+
+            failed_routes = []
+            if routes:
+                with ThreadPoolExecutor(max_workers=max(1, min(workers, len(routes)))) as pool:
+                    futures = {pool.submit(delete_route, ip): ip for ip in routes}
+                    for done, future in enumerate(as_completed(futures), 1):
+                        if not future.result():
+                            failed_routes.append(futures[future])
+                        report({"phase": "routes", "done": done, "total": len(routes)})
+
+            after = read_actual_state(watched)
+            remaining_rules = sum(len(names) for names in after.rules.values())
+            self.last_run = time.time()
+            self.last_operations = len(plan)
+
+        result = {
+            **summary,
+            "dry_run": False,
+            "rules_deleted": len(rule_names) - remaining_rules,
+            "routes_deleted": len(routes) - len(after.routes & set(routes)),
+            "remaining_rules": remaining_rules,
+            "remaining_routes": sorted(after.routes),
+            "failed_routes": sorted(failed_routes),
+            "duration": time.time() - start,
+        }
+        report({"phase": "done", **result})
+        if len(plan):
+            self._notify(list(plan.changes))
+        return result
+
+    def info(self):
+        return {
+            "desired_blocked": sorted(self.desired()),
+            "last_reconcile": time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(self.last_run)) if self.last_run else None,
+            "last_operations": self.last_operations,
+            "interval": self.interval,
+        }
+
+    def start(self):
+        """Démarre la passe périodique de réparation (sans effet si elle tourne déjà)"""
+        with self._thread_lock:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped.clear()
+            self._thread = threading.Thread(target=self._run, name="block-reconciler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        self._stopped.set()
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            try:
+                _, plan = self.reconcile()
+                if len(plan):
+                    log.info("Réconciliation: %d opérations pour réparer l'état de blocage", len(plan),
+                             extra={"operations": len(plan), "ips": sorted(plan.changes)})
+            except Exception as e:
+                log.exception("Erreur de réconciliation: %s", e)
+
+
+reconciler = BlockReconciler()
@@ -0,0 +1,210 @@
+"""Résolution asynchrone des noms d'appareils (DNS inverse, NetBIOS, mDNS).
+
+Toutes les requêtes sont de simples datagrammes UDP envoyés depuis une
+boucle asyncio : aucun processus n'est lancé par appareil, chaque requête
+a son propre délai et le nombre d'appareils traités simultanément est
+borné par un sémaphore.
+
+    DNS     requête PTR vers le serveur DNS du hotspot (port 53)
+    NetBIOS requête NBSTAT directement vers l'appareil (port 137)
+    mDNS    requête PTR unicast directement vers l'appareil (port 5353)
+"""
+import asyncio
+import itertools
+import socket
+import struct
+
+DNS_PORT = 53
+NETBIOS_PORT = 137
+MDNS_PORT = 5353
+
+RESOLVER_CONCURRENCY = 128  # appareils interrogés en même temps
+
+TYPE_PTR = 12
+TYPE_NBSTAT = 0x21
+CLASS_IN = 1
+
+_transaction_ids = itertools.count(1)
+
+
+def _next_transaction_id():
+    return next(_transaction_ids) & 0xFFFF
+
+
+def reverse_name(ip):
+    return '.'.join(reversed(ip.split('.'))) + '.in-addr.arpa'
+
+
+def _encode_name(name):
+    encoded = b''
+    for label in name.rstrip('.').split('.'):
+        raw = label.encode('ascii')
+        encoded += bytes([len(raw)]) + raw
+    return encoded + b'\x00'
+
+
+def build_ptr_query(txid, ip, recursion=True):
+    flags = 0x0100 if recursion else 0x0000
+    header = struct.pack('>HHHHHH', txid, flags, 1, 0, 0, 0)
+    return header + _encode_name(reverse_name(ip)) + struct.pack('>HH', TYPE_PTR, CLASS_IN)
+
+
+def _read_name(data, offset):
+    """Lit un nom DNS (avec compression) et retourne (nom, offset après le nom)"""
+    labels = []
+    end = None
+    for _ in range(128):
+        length = data[offset]
+        if length & 0xC0 == 0xC0:
+            if end is None:
+                end = offset + 2
+            offset = ((length & 0x3F) << 8) | data[offset + 1]
+            continue
+        offset += 1
+        if length == 0:
+            break
+        labels.append(data[offset:offset + length].decode('utf-8', 'replace'))
+        offset += length
+    return '.'.join(labels), end if end is not None else offset
+
+
+def parse_ptr_response(data):
+    """Premier enregistrement PTR d'une réponse DNS, ou None"""
+    try:
+        _, flags, qdcount, ancount, _, _ = struct.unpack('>HHHHHH', data[:12])
+        if flags & 0x000F:  # RCODE != 0 (NXDOMAIN...)
+            return None
+        offset = 12
+        for _ in range(qdcount):
+            _, offset = _read_name(data, offset)
+            offset += 4
+        for _ in range(ancount):
+            _, offset = _read_name(data, offset)
+            rtype, _, _, rdlength = struct.unpack('>HHIH', data[offset:offset + 10])
+            offset += 10
+            if rtype == TYPE_PTR:
+                return _read_name(data, offset)[0] or None
+            offset += rdlength
+    except (IndexError, struct.error):
+        pass
+    return None
+
+
+def build_nbstat_query(txid):
+    # Nom "*" complété par des octets nuls, en encodage NetBIOS de premier niveau
+    raw = b'*' + b'\x00' * 15
+    encoded = bytes(c for b in raw for c in (0x41 + (b >> 4), 0x41 + (b & 0x0F)))
+    header = struct.pack('>HHHHHH', txid, 0x0000, 1, 0, 0, 0)
+    return header + bytes([32]) + encoded + b'\x00' + struct.pack('>HH', TYPE_NBSTAT, CLASS_IN)
+
+
+def parse_nbstat_response(data):
+    """Nom de poste (suffixe 0x00, nom unique) d'une réponse NBSTAT, ou None"""
+    try:
+        _, offset = _read_name(data, 12)
+        offset += 10  # type, classe, TTL, longueur
+        count = data[offset]
+        offset += 1
+        for i in range(count):
+            entry = data[offset + 18 * i:offset + 18 * (i + 1)]
+            name = entry[:15].decode('ascii', 'replace').strip()
+            suffix = entry[15]
+            flags = struct.unpack('>H', entry[16:18])[0]
+            if suffix == 0x00 and not flags & 0x8000 and name:
+                return name
+    except (IndexError, struct.error):
+        pass
+    return None
+
+
+class _UdpMux(asyncio.DatagramProtocol):
+    """Un seul socket UDP partagé ; les réponses sont aiguillées par (IP source, id de transaction)"""
+
+    def __init__(self):
+        self.transport = None
+        self.pending = {}
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        if len(data) < 2:
+            return
+        txid = struct.unpack('>H', data[:2])[0]
+        future = self.pending.pop((addr[0], txid), None)
+        if future and not future.done():
+            future.set_result(data)
+
+    def error_received(self, exc):
+        pass
+
+    async def query(self, packet, txid, addr, timeout):
+        future = asyncio.get_running_loop().create_future()
+        key = (addr[0], txid)
+        self.pending[key] = future
+        try:
+            self.transport.sendto(packet, addr)
+            return await asyncio.wait_for(future, timeout)
+        except (asyncio.TimeoutError, OSError):
+            return None
+        finally:
+            self.pending.pop(key, None)
+
+
+class AsyncResolver:
+    """Résout des centaines d'adresses en parallèle avec un délai par requête"""
+
+    def __init__(self, nameserver=None, timeout=1.0, concurrency=RESOLVER_CONCURRENCY, methods=('dns', 'netbios', 'mdns')):
+        self.nameserver = nameserver
+        self.timeout = timeout
+        self.concurrency = concurrency
+        self.methods = methods
+
+    async def _dns(self, mux, ip):
+        if not self.nameserver:
+            return None
+        txid = _next_transaction_id()
+        data = await mux.query(build_ptr_query(txid, ip), txid, (self.nameserver, DNS_PORT), self.timeout)
+        return parse_ptr_response(data) if data else None
+
+    async def _netbios(self, mux, ip):
+        txid = _next_transaction_id()
+        data = await mux.query(build_nbstat_query(txid), txid, (ip, NETBIOS_PORT), self.timeout)
+        return parse_nbstat_response(data) if data else None
+
+    async def _mdns(self, mux, ip):
+        txid = _next_transaction_id()
+        data = await mux.query(build_ptr_query(txid, ip, recursion=False), txid, (ip, MDNS_PORT), self.timeout)
+        return parse_ptr_response(data) if data else None
+
+    async def resolve(self, mux, ip):
+        """Interroge toutes les méthodes en même temps et garde la première par priorité"""
+        queries = [getattr(self, f"_{method}")(mux, ip) for method in self.methods]
+        results = await asyncio.gather(*queries, return_exceptions=True)
+        for name in results:
+            if isinstance(name, str) and name and name != ip:
+                return name
+        return None
+
+    async def resolve_many_async(self, ips):
+        loop = asyncio.get_running_loop()
+        transport, mux = await loop.create_datagram_endpoint(
+            _UdpMux, local_addr=('0.0.0.0', 0), family=socket.AF_INET
+        )
+        semaphore = asyncio.Semaphore(self.concurrency)
+
+        async def bounded(ip):
+            async with semaphore:
+                return ip, await self.resolve(mux, ip)
+
+        try:
+            return dict(await asyncio.gather(*(bounded(ip) for ip in ips)))
+        finally:
+            transport.close()
+
+    def resolve_many(self, ips):
+        """Version synchrone, utilisable depuis le thread de scan"""
+        ips = list(ips)
+        if not ips:
+            return {}
+        return asyncio.run(self.resolve_many_async(ips))
@@ -0,0 +1,160 @@
+"""Planification des sondes de nom à chaque scan.
+
+La table ARP et le statut (index des règles) ne coûtent qu'une commande
+pour tous les appareils ; la résolution de noms, elle, envoie des requêtes
+par appareil. Le planificateur choisit à chaque scan les appareils à
+sonder, par priorité :
+
+    new       jamais sondé
+    changed   a changé d'IP (nouveau bail DHCP)
+    blocked   vient d'être bloqué ou débloqué
+    stale     nom périmé dans le cache (échecs espacés de plus en plus)
+    stable    présent depuis longtemps sans changement : rafraîchi rarement
+
+Au plus ``max_probes`` appareils par scan, dans un délai ``time_budget`` ;
+le nombre de sondes s'adapte à la durée mesurée des résolutions
+(augmentation additive, réduction de moitié au dépassement), si bien que
+le coût d'un scan reste stable quand le nombre de clients augmente.
+"""
+import threading
+import time
+
+PRIORITIES = ('new', 'changed', 'blocked', 'stale', 'stable')
+NEW, CHANGED, BLOCKED, STALE, STABLE = range(len(PRIORITIES))
+
+SCAN_BUDGET = 1.5         # secondes de résolution de noms par scan
+MAX_PROBES = 64           # sondes par scan au plus
+MIN_PROBES = 4
+STABLE_AFTER = 900        # secondes sans changement avant d'être considéré stable
+STABLE_REFRESH = 3600     # rafraîchissement d'un appareil stable
+RETRY_BASE = 60           # premier délai après un échec de résolution, doublé ensuite
+RETRY_MAX = 1800
+FORGET_AFTER = 3600       # oubli d'un appareil absent de la table ARP
+
+
+class DeviceState:
+    __slots__ = ('ip', 'first_seen', 'last_seen', 'last_change', 'last_probe',
+                 'failures', 'status', 'status_changed')
+
+    def __init__(self, ip, now):
+        self.ip = ip
+        self.first_seen = now
+        self.last_seen = now
+        self.last_change = now
+        self.last_probe = None
+        self.failures = 0
+        self.status = None
+        self.status_changed = None
+
+
+class ScanPlanner:
+    def __init__(self, time_budget=SCAN_BUDGET, max_probes=MAX_PROBES, stable_after=STABLE_AFTER,
+                 stable_refresh=STABLE_REFRESH):
+        self.time_budget = time_budget
+        self.max_probes = max_probes
+        self.probe_limit = max_probes  # ajusté à chaque scan selon la durée mesurée
+        self.stable_after = stable_after
+        self.stable_refresh = stable_refresh
+        self._devices = {}  # MAC -> DeviceState
+        self._lock = threading.Lock()
+        self.last_plan = {}
+        self.last_duration = None
+        self.deferred = 0
+
+    def observe(self, entries, statuses, now=None):
+        """Met à jour l'état à partir de la table ARP (ip -> mac) et des statuts"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            for ip, mac in entries.items():
+                state = self._devices.get(mac)
+                if state is None:
+                    state = self._devices[mac] = DeviceState(ip, now)
+                elif state.ip != ip:
+                    state.ip = ip
+                    state.last_change = now
+                state.last_seen = now
+                status = statuses.get(ip)
+                if state.status is not None and status != state.status:
+                    state.status_changed = now
+                    state.last_change = now
+                state.status = status
+            for mac in [m for m, s in self._devices.items() if now - s.last_seen > FORGET_AFTER]:
+                del self._devices[mac]
+
+    def _priority(self, state, name_state, now):
+        """Priorité de l'appareil, ou None s'il n'a pas besoin d'être sondé"""
+        fresh, resolved = name_state
+        if state.last_probe is None:
+            if fresh:
+                # Nom déjà connu (cache persistant) : rien à sonder pour l'instant
+                state.last_probe = now
+                return None
+            return NEW
+        if state.last_change > state.last_probe:
+            return BLOCKED if state.status_changed == state.last_change else CHANGED
+        if fresh:
+            return None
+        since_probe = now - state.last_probe
+        if now - state.last_change >= self.stable_after:
+            return STABLE if since_probe >= self.stable_refresh else None
+        if not resolved and since_probe < min(RETRY_BASE * 2 ** max(state.failures - 1, 0), RETRY_MAX):
+            return None
+        return STALE
+
+    def plan(self, entries, name_state, now=None):
+        """Appareils à sonder ce scan, par priorité : liste de ``(ip, mac)``
+
+        ``name_state(ip, mac)`` retourne ``(frais, résolu)`` pour le nom en cache.
+        """
+        now = now if now is not None else time.time()
+        candidates = []
+        with self._lock:
+            for ip, mac in entries.items():
+                state = self._devices.get(mac)
+                if state is None:
+                    continue
+                priority = self._priority(state, name_state(ip, mac), now)
+                if priority is not None:
+                    # À priorité égale, le plus anciennement sondé d'abord
+                    candidates.append((priority, state.last_probe or 0, ip, mac))
+            candidates.sort()
+            selected = candidates[:self.probe_limit]
+            self.deferred = len(candidates) - len(selected)
+            counts = dict.fromkeys(PRIORITIES, 0)
+            for priority, _, _, _ in selected:
+                counts[PRIORITIES[priority]] += 1
+            self.last_plan = counts
+        return [(ip, mac) for _, _, ip, mac in selected]
+
+    def probe_timeout(self, default=1.0):
+        """Délai des requêtes de nom : jamais plus que le budget du scan"""
+        return min(default, self.time_budget)
+
+    def record(self, probed, resolved, duration, now=None):
+        """Résultat des sondes ; ajuste le nombre de sondes du prochain scan"""
+        now = now if now is not None else time.time()
+        with self._lock:
+            for ip, mac in probed:
+                state = self._devices.get(mac)
+                if state is None:
+                    continue
+                state.last_probe = now
+                state.failures = 0 if resolved.get(ip) else state.failures + 1
+            self.last_duration = duration
+            if probed:
+                if duration > self.time_budget:
+                    self.probe_limit = max(MIN_PROBES, self.probe_limit // 2)
+                elif len(probed) >= self.probe_limit:
+                    self.probe_limit = min(self.max_probes, self.probe_limit + MIN_PROBES)
+
+    def info(self):
+        with self._lock:
+            return {
+                "tracked_devices": len(self._devices),
+                "time_budget": self.time_budget,
+                "probe_limit": self.probe_limit,
+                "max_probes": self.max_probes,
+                "last_plan": self.last_plan,
+                "deferred": self.deferred,
+                "last_probe_duration": round(self.last_duration, 3) if self.last_duration is not None else None,
+            }
@@ -0,0 +1,275 @@
+"""Blocages programmés : blocage temporaire et plages horaires quotidiennes.
+
+Un seul thread sert toutes les échéances, rangées dans un tas (insertion
+en O(log n), annulation en O(1) par marquage). Les actions qui tombent
+dans la même fenêtre de regroupement sont appliquées ensemble, en un
+seul lot de blocage et un seul lot de déblocage. Les programmations sont
+enregistrées dans la base SQLite et rechargées au démarrage.
+
+Types de programmation :
+    once    une action (block/unblock) à une date donnée
+    daily   une plage quotidienne "HH:MM"-"HH:MM" pendant laquelle l'appareil est bloqué
+"""
+import heapq
+import itertools
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+
+from blockstore import DB_FILE
+
+log = logging.getLogger(__name__)
+
+COALESCE_WINDOW = 1.0  # secondes : échéances regroupées dans un même lot
+
+
+def parse_hhmm(value):
+    hours, minutes = value.split(':')
+    hours, minutes = int(hours), int(minutes)
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        raise ValueError(f"Heure invalide: {value}")
+    return hours, minutes
+
+
+def next_occurrence(hhmm, now=None):
+    """Prochain passage à l'heure locale ``HH:MM`` strictement après ``now``"""
+    now = datetime.fromtimestamp(now if now is not None else time.time())
+    hours, minutes = parse_hhmm(hhmm)
+    candidate = now.replace(hour=hours, minute=minutes, second=0, microsecond=0)
+    if candidate <= now:
+        candidate += timedelta(days=1)
+    return candidate.timestamp()
+
+
+def in_window(start, end, now=None):
+    """Vrai si ``now`` est dans la plage (qui peut passer minuit, ex. 23:00-07:00)"""
+    now = datetime.fromtimestamp(now if now is not None else time.time())
+    current = (now.hour, now.minute)
+    start, end = parse_hhmm(start), parse_hhmm(end)
+    if start <= end:
+        return start <= current < end
+    return current >= start or current < end
+
+
+class ScheduleStore:
+    def __init__(self, path=DB_FILE):
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        with self._conn:
+            self._conn.execute(
+                """CREATE TABLE IF NOT EXISTS schedules (
+                    id TEXT PRIMARY KEY,
+                    kind TEXT NOT NULL,
+                    action TEXT,
+                    ip TEXT NOT NULL,
+                    mac TEXT,
+                    due REAL,
+                    start TEXT,
+                    end TEXT,
+                    created_at REAL NOT NULL
+                )"""
+            )
+
+    def all(self):
+        with self._lock:
+            return [dict(row) for row in self._conn.execute("SELECT * FROM schedules")]
+
+    def save(self, job):
+        with self._lock, self._conn:
+            self._conn.execute(
+                """INSERT OR REPLACE INTO schedules (id, kind, action, ip, mac, due, start, end, created_at)
+                   VALUES (:id, :kind, :action, :ip, :mac, :due, :start, :end, :created_at)""",
+                job
+            )
+
+    def delete(self, job_ids):
+        with self._lock, self._conn:
+            self._conn.executemany("DELETE FROM schedules WHERE id = ?", [(i,) for i in job_ids])
+
+
+class Scheduler:
+    """File d'échéances servie par un thread unique"""
+
+    def __init__(self, apply, store=None, coalesce_window=COALESCE_WINDOW):
+        # apply(action, jobs) : applique "block" ou "unblock" à une liste de programmations
+        self.apply = apply
+        self.store = store
+        self.coalesce_window = coalesce_window
+        self._heap = []                     # (échéance, n°, id, action, récurrente)
+        self._entries = {}                  # n° d'entrée vivante -> id de la programmation
+        self._jobs = {}                     # id -> programmation
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    # --- Création / annulation ---
+
+    def _push(self, due, job_id, action, recurring=False):
+        seq = next(self._counter)
+        heapq.heappush(self._heap, (due, seq, job_id, action, recurring))
+        self._entries[seq] = job_id
+        self._jobs[job_id]['_entries'].add(seq)
+
+    def _register(self, job, reloaded=False):
+        job['_entries'] = set()
+        self._jobs[job['id']] = job
+        now = time.time()
+        if job['kind'] == 'once':
+            self._push(job['due'], job['id'], job['action'])
+        else:
+            if in_window(job['start'], job['end'], now):
+                # Déjà dans la plage : bloquer tout de suite
+                self._push(now, job['id'], 'block')
+            elif reloaded:
+                # Hors de la plage au redémarrage : la fin a pu tomber pendant l'arrêt
+                self._push(now, job['id'], 'unblock')
+            self._push(next_occurrence(job['start'], now), job['id'], 'block', recurring=True)
+            self._push(next_occurrence(job['end'], now), job['id'], 'unblock', recurring=True)
+
+    def _new_job(self, kind, ip, mac=None, action=None, due=None, start=None, end=None):
+        job = {
+            'id': uuid.uuid4().hex[:12], 'kind': kind, 'action': action, 'ip': ip, 'mac': mac,
+            'due': due, 'start': start, 'end': end, 'created_at': time.time(),
+        }
+        if self.store:
+            self.store.save(job)
+        with self._cond:
+            self._register(job)
+            self._cond.notify()
+        return self.describe(job)
+
+    def schedule_once(self, action, ip, due, mac=None):
+        if action not in ('block', 'unblock'):
+            raise ValueError(f"Action inconnue: {action}")
+        return self._new_job('once', ip, mac, action=action, due=due)
+
+    def schedule_daily(self, ip, start, end, mac=None):
+        parse_hhmm(start)
+        parse_hhmm(end)
+        return self._new_job('daily', ip, mac, start=start, end=end)
+
+    def cancel(self, job_id):
+        with self._cond:
+            job = self._jobs.pop(job_id, None)
+            if job is None:
+                return False
+            for seq in job['_entries']:
+                self._entries.pop(seq, None)
+            self._compact()
+        if self.store:
+            self.store.delete([job_id])
+        return True
+
+    def cancel_for(self, ip, kind='once'):
+        """Annule les programmations d'une IP (ex. blocage manuel qui remplace un blocage temporaire)"""
+        with self._cond:
+            job_ids = [j['id'] for j in self._jobs.values() if j['ip'] == ip and j['kind'] == kind]
+        for job_id in job_ids:
+            self.cancel(job_id)
+        return len(job_ids)
+
+    def _compact(self):
+        # Les entrées annulées restent dans le tas ; on le reconstruit si elles dominent
+        if len(self._heap) > 64 and len(self._entries) < len(self._heap) // 2:
+            self._heap = [e for e in self._heap if e[1] in self._entries]
+            heapq.heapify(self._heap)
+
+    # --- Consultation ---
+
+    @staticmethod
+    def describe(job):
+        info = {k: v for k, v in job.items() if not k.startswith('_') and v is not None}
+        if job.get('due'):
+            info['due_at'] = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(job['due']))
+        return info
+
+    def jobs(self):
+        with self._cond:
+            return [self.describe(j) for j in self._jobs.values()]
+
+    def pending(self):
+        with self._cond:
+            return len(self._entries)
+
+    # --- Exécution ---
+
+    def load(self):
+        """Recharge les programmations enregistrées ; les échéances passées partent aussitôt.
+
+        Une plage quotidienne est remise dans l'état du moment : bloquée si
+        l'on est dans la plage, débloquée sinon.
+        """
+        if not self.store:
+            return 0
+        jobs = self.store.all()
+        with self._cond:
+            for job in jobs:
+                self._register(job, reloaded=True)
+            self._cond.notify()
+        return len(jobs)
+
+    def start(self):
+        with self._cond:
+            if self._thread and self._thread.is_alive():
+                return
+            self._stopped = False
+            self._thread = threading.Thread(target=self._run, name="block-scheduler", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._cond:
+            self._stopped = True
+            self._cond.notify()
+
+    def _pop_due(self):
+        """Retire toutes les échéances de la fenêtre de regroupement"""
+        now = time.time()
+        horizon = now + self.coalesce_window
+        fired = []
+        finished = []
+        while self._heap and self._heap[0][0] <= horizon:
+            due, seq, job_id, action, recurring = heapq.heappop(self._heap)
+            if self._entries.pop(seq, None) is None:
+                continue  # annulée
+            job = self._jobs[job_id]
+            job['_entries'].discard(seq)
+            fired.append((action, job))
+            if job['kind'] == 'once':
+                del self._jobs[job_id]
+                finished.append(job_id)
+            elif recurring:
+                # Plage quotidienne : on reprogramme le même passage le lendemain
+                hhmm = job['start'] if action == 'block' else job['end']
+                self._push(next_occurrence(hhmm, max(due, now)), job_id, action, recurring=True)
+        return fired, finished
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._stopped:
+                    if self._heap and self._heap[0][0] <= time.time():
+                        break
+                    timeout = self._heap[0][0] - time.time() if self._heap else None
+                    self._cond.wait(timeout)
+                if self._stopped:
+                    return
+                fired, finished = self._pop_due()
+
+            if finished and self.store:
+                self.store.delete(finished)
+            # Une IP bloquée puis débloquée dans le même lot : la dernière action l'emporte
+            latest = {}
+            for action, job in fired:
+                latest[job['ip']] = (action, job)
+            for action in ('unblock', 'block'):
+                jobs = [job for a, job in latest.values() if a == action]
+                if jobs:
+                    try:
+                        self.apply(action, jobs)
+                    except Exception as e:
+                        log.exception("Erreur programmation (%s): %s", action, e)
@@ -0,0 +1,59 @@
+"""Configuration commune : modules du backend importables, hotspot simulé, fichiers temporaires."""
+import os
+import sys
+import tempfile
+
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, BACKEND_DIR)
+
+# Avant tout import du backend : aucune commande Windows réelle, aucune écriture dans le dépôt
+_tmp = tempfile.mkdtemp(prefix='hotspot_tests_')
+os.environ.setdefault('HOTSPOT_EXECUTOR', 'replay')
+os.environ.setdefault('HOTSPOT_DB_FILE', os.path.join(_tmp, 'hotspot.db'))
+os.environ.setdefault('HOTSPOT_NAME_CACHE_FILE', os.path.join(_tmp, 'device_names.json'))
+os.environ.setdefault('HOTSPOT_LOG_DIR', os.path.join(_tmp, 'logs'))
+os.environ.setdefault('HOTSPOT_LOG_LEVEL', 'WARNING')
+os.environ.setdefault('HOTSPOT_METER_SOURCE', 'off')
+
+
+@pytest.fixture
+def simulated():
+    """Hotspot simulé neuf (5 clients) branché sur l'exécuteur, caches remis à zéro"""
+    import executor
+    from firewall import rule_index
+    from netiface import hotspot
+
+    simulated = executor.SimulatedHotspot(clients=5, background_rules=3)
+    previous = executor.get_executor()
+    executor.set_executor(simulated.executor())
+    rule_index.invalidate()
+    hotspot.invalidate()
+    yield simulated
+    executor.set_executor(previous)
+    rule_index.invalidate()
+    hotspot.invalidate()
+
+
+@pytest.fixture
+def client(simulated, monkeypatch):
+    """Client de test Flask sur le hotspot simulé, état de blocage et caches vides"""
+    import app
+    import httpcache
+    from inventory import DeviceInventory
+
+    # Pas de threads de fond : ils continueraient sur l'exécuteur des tests suivants
+    monkeypatch.setattr(app, 'start_background_tasks', lambda: None)
+    monkeypatch.setattr(app, 'blocklist_restore', None)
+    inventory = DeviceInventory(app.get_devices, interval=app.SCAN_INTERVAL)
+    inventory.add_listener(app.event_broker.on_snapshot)
+    monkeypatch.setattr(app, 'inventory', inventory)
+    # Les versions de l'inventaire neuf repartent de zéro : pas de corps d'un test précédent
+    monkeypatch.setattr(app, 'device_bodies', httpcache.VersionedBodies())
+    app.block_store.clear()
+    app.reconciler.set_desired(set())
+    app.name_cache.clear()
+    app.rules_cache.clear()
+    app.arp_table.update([])
+    return app.app.test_client()
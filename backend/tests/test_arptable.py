@@ -0,0 +1,80 @@
+import ipaddress
+import subprocess
+import sys
+import time
+
+import pytest
+
+from arptable import ArpTable, normalize_mac, parse_arp_lines
+from executor import SubprocessExecutor
+from netiface import HotspotInfo
+
+ARP_OUTPUT = """
+Interface : 192.168.1.20 --- 0xb
+  Adresse Internet      Adresse physique      Type
+  192.168.1.1           00-11-22-33-44-55     dynamique
+  192.168.1.255         ff-ff-ff-ff-ff-ff     statique
+
+Interface : 192.168.137.1 --- 0x12
+  Adresse Internet      Adresse physique      Type
+  192.168.137.2         3c-22-fb-00-00-01     dynamique
+  192.168.137.3         3c-22-fb-00-00-02     dynamique
+  192.168.137.255       ff-ff-ff-ff-ff-ff     statique
+  224.0.0.22            01-00-5e-00-00-16     statique
+""".splitlines()
+
+
+def hotspot():
+    return HotspotInfo('Connexion au réseau local* 2', '192.168.137.1',
+                       ipaddress.ip_network('192.168.137.0/24'), True, 0)
+
+
+def test_only_hotspot_clients_are_kept():
+    assert list(parse_arp_lines(ARP_OUTPUT, hotspot())) == [
+        ('192.168.137.2', '3C:22:FB:00:00:01'),
+        ('192.168.137.3', '3C:22:FB:00:00:02'),
+    ]
+
+
+def test_parser_is_lazy():
+    lines = iter(ARP_OUTPUT)
+    pairs = parse_arp_lines(lines, hotspot())
+    assert next(pairs) == ('192.168.137.2', '3C:22:FB:00:00:01')
+    # La suite de la sortie n'a pas encore été lue
+    assert next(lines).strip().startswith('192.168.137.3')
+
+
+def test_without_hotspot_group_macs_are_skipped():
+    macs = {mac for _, mac in parse_arp_lines(ARP_OUTPUT)}
+    assert 'FF:FF:FF:FF:FF:FF' not in macs
+    assert '01:00:5E:00:00:16' not in macs
+    assert '00:11:22:33:44:55' in macs
+
+
+def test_update_reports_changed_mac_as_removed_and_added():
+    table = ArpTable()
+    table.update([('192.168.137.2', 'A'), ('192.168.137.3', 'B')])
+    diff = table.update([('192.168.137.2', 'C'), ('192.168.137.3', 'B')])
+    assert diff.added == {'192.168.137.2': 'C'}
+    assert diff.removed == {'192.168.137.2': 'A'}
+
+
+def test_normalize_mac():
+    assert normalize_mac('3c-22-fb-00-00-01') == '3C:22:FB:00:00:01'
+    assert normalize_mac('3c22.fb00.0001') == '3C:22:FB:00:00:01'
+    assert normalize_mac('3c-22-fb') is None
+    assert normalize_mac(None) is None
+
+
+def test_iter_lines_times_out_on_silent_command():
+    # Commande bloquée sans rien écrire : le délai doit s'appliquer quand même
+    cmd = f'"{sys.executable}" -c "import time; time.sleep(4)"'
+    start = time.monotonic()
+    with pytest.raises(subprocess.TimeoutExpired):
+        list(SubprocessExecutor().iter_lines(cmd, timeout=1))
+    assert time.monotonic() - start < 3
+
+
+def test_iter_lines_streams_real_output():
+    cmd = f'"{sys.executable}" -c "print(1); print(2)"'
+    assert list(SubprocessExecutor().iter_lines(cmd, timeout=10)) == ['1', '2']
@@ -0,0 +1,48 @@
+import executor
+
+
+def netsh_calls():
+    return [cmd for cmd in executor.get_executor().calls if cmd.startswith('netsh -f')]
+
+
+def test_batch_block_uses_one_netsh_script(client, simulated):
+    ips = list(simulated.clients)[:3]
+    client.get('/blocklist')  # restauration initiale hors mesure
+    executor.get_executor().calls.clear()
+    response = client.post('/block', json={"ips": ips})
+    body = response.get_json()
+    assert response.status_code == 200 and body['success']
+    assert set(body['results']) == set(ips)
+    assert len(netsh_calls()) == 1
+    assert simulated.routes == set(ips)
+
+
+def test_batch_unblock(client, simulated):
+    ips = list(simulated.clients)[:3]
+    client.post('/block', json={"ips": ips})
+    body = client.post('/unblock', json={"ips": ips}).get_json()
+    assert body['success']
+    assert not [r for r in simulated.rules if r['Rule Name'].startswith('HOTSPOT_BLOCK_')]
+    assert simulated.routes == set()
+
+
+def test_batch_rejects_missing_body(client):
+    assert client.post('/block', json={}).status_code == 400
+    assert client.post('/unblock', data='x').status_code == 400
+
+
+def test_invalid_ips_are_reported_individually(client, simulated):
+    ip = next(iter(simulated.clients))
+    body = client.post('/block', json={"ips": [ip, 'pas-une-ip']}).get_json()
+    assert body['results'][ip]['success']
+    assert not body['results']['pas-une-ip']['success']
+    assert not body['success']
+
+
+def test_block_outside_hotspot_is_not_stored(client, simulated):
+    import app
+
+    body = client.post('/block', json={"ips": ['10.9.9.9']}).get_json()
+    assert not body['results']['10.9.9.9']['success']
+    assert '10.9.9.9' not in simulated.routes
+    assert '10.9.9.9' not in {entry['ip'] for entry in app.block_store.entries()}
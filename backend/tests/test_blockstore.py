@@ -0,0 +1,72 @@
+import pytest
+
+from blockstore import BlockStore, map_to_current_ips
+
+MAC_A = '3C:22:FB:00:00:01'
+MAC_B = '3C:22:FB:00:00:02'
+
+
+def entry(mac, ip):
+    return {'mac': mac, 'ip': ip}
+
+
+def test_present_mac_follows_its_new_ip():
+    desired, moves = map_to_current_ips([entry(MAC_A, '192.168.137.2')], {'192.168.137.7': MAC_A})
+    assert desired == {'192.168.137.7'}
+    assert moves == {MAC_A: '192.168.137.7'}
+
+
+def test_absent_mac_stays_blocked_at_last_ip():
+    desired, moves = map_to_current_ips([entry(MAC_A, '192.168.137.2')], {})
+    assert desired == {'192.168.137.2'}
+    assert moves == {}
+
+
+def test_last_ip_reassigned_to_another_mac_is_pending():
+    desired, moves = map_to_current_ips([entry(MAC_A, '192.168.137.2')], {'192.168.137.2': MAC_B})
+    assert desired == set()
+    assert moves == {}
+
+
+def test_entry_without_mac_is_blocked_by_ip():
+    desired, _ = map_to_current_ips([entry(None, '192.168.137.4')], {'192.168.137.4': MAC_B})
+    assert desired == {'192.168.137.4'}
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = BlockStore(str(tmp_path / 'hotspot.db'))
+    yield store
+    store.close()
+
+
+def test_block_by_mac_follows_dhcp_lease(store):
+    store.add('192.168.137.2', mac=MAC_A, reason='test')
+    store.add('192.168.137.7', mac=MAC_A)
+    [row] = store.entries()
+    assert row['ip'] == '192.168.137.7'
+    assert row['reason'] == 'test'
+
+
+def test_mac_replaces_pending_entry_without_mac(store):
+    store.add('192.168.137.2')
+    store.add('192.168.137.2', mac=MAC_A)
+    assert [(row['mac'], row['ip']) for row in store.entries()] == [(MAC_A, '192.168.137.2')]
+
+
+def test_remove_keeps_other_mac_pending_on_same_ip(store):
+    store.add('192.168.137.2', mac=MAC_A)
+    store.add('192.168.137.2', mac=MAC_B)
+    store.remove('192.168.137.2', mac=MAC_A)
+    assert [row['mac'] for row in store.entries()] == [MAC_B]
+
+
+def test_update_ips_and_reload(tmp_path):
+    path = str(tmp_path / 'hotspot.db')
+    store = BlockStore(path)
+    store.add('192.168.137.2', mac=MAC_A)
+    store.update_ips({MAC_A: '192.168.137.9'})
+    store.close()
+    reopened = BlockStore(path)
+    assert [row['ip'] for row in reopened.entries()] == ['192.168.137.9']
+    reopened.close()
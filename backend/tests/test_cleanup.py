@@ -0,0 +1,78 @@
+import json
+import threading
+
+import pytest
+
+from blocking import RULE_PREFIX
+
+
+def block_rules(simulated):
+    return [rule for rule in simulated.rules if rule['Rule Name'].startswith(RULE_PREFIX)]
+
+
+@pytest.fixture
+def blocked(client, simulated):
+    ips = sorted(simulated.clients)[:3]
+    assert client.post('/block', json={"ips": ips}).get_json()['success']
+    return ips
+
+
+def test_dry_run_changes_nothing(client, simulated, blocked):
+    body = client.get('/rules/cleanup?dry_run=1').get_json()
+    assert body['dry_run'] and body['success']
+    assert body['routes'] == 3 and sorted(body['route_ips']) == blocked
+    assert body['rules'] == len(block_rules(simulated))
+    assert simulated.routes == set(blocked)
+
+
+def test_cleanup_removes_rules_and_routes(client, simulated, blocked):
+    import app
+
+    background = len(simulated.rules) - len(block_rules(simulated))
+    body = client.get('/rules/cleanup').get_json()
+    assert body['success']
+    assert body['routes_deleted'] == 3 and body['failed_routes'] == []
+    assert block_rules(simulated) == [] and simulated.routes == set()
+    # Les règles qui n'appartiennent pas à l'application restent en place
+    assert len(simulated.rules) == background
+    assert app.block_store.entries() == []
+    assert app.reconciler.desired() == set()
+
+
+def test_streamed_cleanup_reports_progress(client, simulated, blocked):
+    response = client.get('/rules/cleanup?stream=1')
+    events = [json.loads(line) for line in response.get_data(as_text=True).splitlines()]
+    phases = [event['phase'] for event in events]
+    assert phases[0] == 'snapshot' and phases[-1] == 'done'
+    assert 'rules' in phases and 'routes' in phases
+    assert events[-1]['routes_deleted'] == 3
+
+
+def test_streamed_cleanup_holds_its_firewall_slot(client, simulated, monkeypatch):
+    import app
+
+    monkeypatch.setattr(app, 'firewall_slots', threading.BoundedSemaphore(1))
+    started, finish = threading.Event(), threading.Event()
+
+    def slow_cleanup(dry_run=False, actor=None, progress=None):
+        progress({"phase": "snapshot"})
+        started.set()
+        finish.wait(5)
+        progress({"phase": "done", "success": True})
+
+    monkeypatch.setattr(app, 'run_cleanup', slow_cleanup)
+    response = client.get('/rules/cleanup?stream=1', buffered=False)
+    assert started.wait(5)
+    # Le nettoyage tourne encore après la réponse : pas de place pour une autre opération
+    ip = next(iter(simulated.clients))
+    assert client.get(f'/block/{ip}').status_code == 503
+
+    finish.set()
+    phases = [json.loads(line)['phase'] for line in response.get_data(as_text=True).splitlines()]
+    assert phases == ['snapshot', 'done']
+    for _ in range(50):
+        if app.firewall_slots.acquire(timeout=0.1):
+            break
+    else:
+        pytest.fail("place pare-feu jamais rendue")
+    app.firewall_slots.release()
@@ -0,0 +1,125 @@
+import socket
+import time
+
+import pytest
+
+import controller
+from controller import Agent, AgentError, Aggregator, launch_local_agents, parse_agents
+
+AGENTS = 3
+CLIENTS = 4
+
+
+def test_parse_agents_splits_on_first_equal_sign():
+    agents = parse_agents(['salle1=http://10.0.0.5:5000/?token=a=b', 'http://10.0.0.6:5000', ' ', 'x=http://h/?k=v'])
+    assert [(a.name, a.url) for a in agents] == [
+        ('salle1', 'http://10.0.0.5:5000/?token=a=b'),
+        ('10.0.0.6:5000', 'http://10.0.0.6:5000'),
+        ('x', 'http://h/?k=v'),
+    ]
+
+
+def test_parse_agents_url_with_query_and_no_name():
+    [agent] = parse_agents(['http://10.0.0.7:5000/?k=v'])
+    assert agent.name == '10.0.0.7:5000'
+    assert agent.url == 'http://10.0.0.7:5000/?k=v'
+
+
+def test_unreachable_agent_is_offline():
+    agent = Agent('absent', f'http://127.0.0.1:{free_ports(1)}', timeout=1)
+    assert agent.poll() is False
+    assert not agent.online and agent.last_error
+
+
+def free_ports(count):
+    """Premier port d'une plage de ``count`` ports libres sur 127.0.0.1"""
+    for _ in range(50):
+        with socket.socket() as probe:
+            probe.bind(('127.0.0.1', 0))
+            base = probe.getsockname()[1]
+        if base + count > 65535:
+            continue
+        try:
+            for port in range(base, base + count):
+                with socket.socket() as s:
+                    s.bind(('127.0.0.1', port))
+        except OSError:
+            continue
+        return base
+    raise RuntimeError("aucune plage de ports libre")
+
+
+def wait_ready(agent, timeout=60):
+    deadline = time.time() + timeout
+    while True:
+        try:
+            status, _, _ = agent.call('GET', '/devices/version', timeout=20)
+            if status == 200:
+                return
+        except AgentError:
+            pass
+        if time.time() > deadline:
+            raise RuntimeError(f"agent {agent.name} jamais prêt")
+        time.sleep(0.2)
+
+
+@pytest.fixture(scope='module')
+def local_agents(tmp_path_factory):
+    """Agents réels (app.py) sur 127.0.0.1, chacun sur un hotspot simulé différent"""
+    agents, stop = launch_local_agents(AGENTS, CLIENTS, free_ports(AGENTS),
+                                       workdir=str(tmp_path_factory.mktemp('agents')))
+    try:
+        for agent in agents:
+            wait_ready(agent)
+        yield agents
+    finally:
+        stop()
+
+
+@pytest.fixture
+def aggregator(local_agents, monkeypatch):
+    for agent in local_agents:
+        agent.etag = agent.token = None
+    aggregator = Aggregator(local_agents)
+    monkeypatch.setattr(controller, 'aggregator', aggregator)
+    aggregator.poll_once()
+    return aggregator
+
+
+def test_inventories_are_merged(aggregator):
+    view = aggregator.snapshot()
+    assert len(view.devices) == AGENTS * CLIENTS
+    # Même sous-réseau sur chaque hotspot : chaque IP existe sur tous les agents
+    assert all(len(keys) == AGENTS for keys in view.by_ip.values())
+    assert len(view.by_mac) == AGENTS * CLIENTS
+    assert {device['agent'] for device in view.devices} == {'local1', 'local2', 'local3'}
+
+
+def test_unchanged_agents_are_not_reread(aggregator):
+    version = aggregator.snapshot().version
+    aggregator.poll_once()
+    assert aggregator.snapshot().version == version
+    assert all(agent.not_modified >= 1 for agent in aggregator.agents.values())
+
+
+def test_ambiguous_ip_needs_an_agent(aggregator):
+    client = controller.app.test_client()
+    ip = aggregator.snapshot().devices[0]['ip']
+    response = client.get(f'/block/{ip}')
+    assert response.status_code == 409
+    assert len(response.get_json()['candidates']) == AGENTS
+
+
+def test_block_by_mac_reaches_only_its_agent(aggregator):
+    client = controller.app.test_client()
+    target = next(d for d in aggregator.snapshot().devices if d['agent'] == 'local2')
+    body = client.post('/block', json={"devices": [target['mac']]}).get_json()
+    assert body['success'] and list(body['agents']) == ['local2']
+
+    aggregator.poll_once()
+    statuses = {(d['agent'], d['ip']): d['status'] for d in aggregator.snapshot().devices}
+    assert statuses[('local2', target['ip'])] == 'blocked'
+    assert statuses[('local1', target['ip'])] != 'blocked'
+
+    body = client.get(f"/unblock/local2/{target['ip']}").get_json()
+    assert body['success'] and body['agent'] == 'local2'
@@ -0,0 +1,124 @@
+import threading
+
+import events
+from events import EventBroker, diff_devices
+from inventory import DeviceInventory
+
+
+def device(ip, **fields):
+    return {'ip': ip, 'mac': f'3C:22:FB:00:00:{ip[-1]:0>2}', 'name': None, 'status': 'active',
+            'presence': 'online', **fields}
+
+
+def types(old, new):
+    return [event['type'] for event in diff_devices(old, new)]
+
+
+def test_diff_join_leave_and_changes():
+    a, b = device('192.168.137.2'), device('192.168.137.3')
+    assert types({}, {a['ip']: a}) == ['joined']
+    assert types({a['ip']: a}, {}) == ['left']
+    assert types({a['ip']: a}, {a['ip']: {**a, 'name': 'iPhone'}}) == ['name_resolved']
+    assert types({a['ip']: a}, {a['ip']: {**a, 'status': 'blocked'}}) == ['blocked']
+    assert types({a['ip']: a}, {a['ip']: {**a, 'presence': 'offline'}}) == ['presence']
+    assert types({a['ip']: a, b['ip']: b}, {a['ip']: a, b['ip']: b}) == []
+
+
+def test_diff_ip_taken_by_another_mac():
+    a = device('192.168.137.2')
+    assert types({a['ip']: a}, {a['ip']: {**a, 'mac': '3C:22:FB:00:00:99'}}) == ['left', 'joined']
+
+
+class Setup:
+    def __init__(self):
+        self.scan = [device('192.168.137.2')]
+        self.inventory = DeviceInventory(lambda: [dict(d) for d in self.scan])
+        self.broker = EventBroker(boot_id='boot1')
+        self.inventory.add_listener(self.broker.on_snapshot)
+        self.inventory.scan_once()
+
+    def stream(self, last_event_id=None):
+        return self.broker.stream(self.inventory.snapshot, last_event_id)
+
+
+def event_of(message):
+    lines = dict(line.split(': ', 1) for line in message.strip().split('\n'))
+    return lines['id'], lines['event']
+
+
+def test_stream_starts_with_snapshot_then_diffs():
+    setup = Setup()
+    stream = setup.stream()
+    assert event_of(next(stream)) == ('boot1-1', 'snapshot')
+    setup.inventory.patch({'192.168.137.2': {'status': 'blocked'}})
+    assert event_of(next(stream)) == ('boot1-2', 'blocked')
+    stream.close()
+    assert setup.broker.subscriber_count() == 0
+
+
+def test_no_subscriber_before_first_iteration():
+    setup = Setup()
+    stream = setup.stream()
+    assert setup.broker.subscriber_count() == 0
+    stream.close()
+    assert setup.broker.subscriber_count() == 0
+
+
+def test_events_older_than_snapshot_are_dropped():
+    setup = Setup()
+
+    def snapshot_after_patch():
+        # Publication entre l'abonnement et la lecture de l'instantané : déjà incluse
+        setup.inventory.patch({'192.168.137.2': {'status': 'blocked'}})
+        return setup.inventory.snapshot()
+
+    stream = setup.broker.stream(snapshot_after_patch)
+    assert event_of(next(stream)) == ('boot1-2', 'snapshot')
+    setup.inventory.patch({'192.168.137.2': {'name': 'iPhone'}})
+    assert event_of(next(stream)) == ('boot1-3', 'name_resolved')
+    stream.close()
+
+
+def test_reconnect_with_current_id_skips_snapshot():
+    setup = Setup()
+    stream = setup.stream(last_event_id='boot1-1')
+    setup.scan.append(device('192.168.137.3'))
+    threading.Timer(0.05, setup.inventory.scan_once).start()
+    assert event_of(next(stream)) == ('boot1-2', 'joined')
+    stream.close()
+
+
+def test_id_from_previous_process_gets_a_snapshot():
+    setup = Setup()
+    stream = setup.stream(last_event_id='boot0-1')
+    assert event_of(next(stream)) == ('boot1-1', 'snapshot')
+    stream.close()
+
+
+def test_slow_subscriber_is_resynchronised(monkeypatch):
+    monkeypatch.setattr(events, 'SUBSCRIBER_QUEUE_SIZE', 1)
+    setup = Setup()
+    stream = setup.stream()
+    next(stream)
+    for n in range(3):
+        setup.inventory.patch({'192.168.137.2': {'name': f'nom-{n}'}})
+    assert event_of(next(stream)) == ('boot1-4', 'snapshot')
+    stream.close()
+
+
+def test_format_sse():
+    assert events.format_sse('joined', {'ip': 'é'}, 'b-1') == 'id: b-1\nevent: joined\ndata: {"ip":"é"}\n\n'
+
+
+def test_stream_endpoint(client):
+    import app
+    import httpcache
+
+    app.inventory.scan_once()
+    response = client.get('/devices/stream')
+    assert response.mimetype == 'text/event-stream'
+    first = next(response.response)
+    first = first.decode() if isinstance(first, bytes) else first
+    assert event_of(first) == (f'{httpcache.BOOT_ID}-{app.inventory.snapshot().version}', 'snapshot')
+    response.close()
+    assert app.event_broker.subscriber_count() == 0
@@ -0,0 +1,61 @@
+import subprocess
+
+import pytest
+
+import executor
+from executor import CommandResult, ReplayExecutor, SimulatedHotspot
+
+
+def test_first_matching_response_wins():
+    replay = ReplayExecutor().add(r'^arp -a', "premier").add(r'^arp', "second")
+    assert replay.run('arp -a').stdout == "premier"
+    assert replay.run('arp -d *').stdout == "second"
+    assert replay.calls == ['arp -a', 'arp -d *']
+
+
+def test_unknown_command_fails():
+    result = ReplayExecutor().run('format c:')
+    assert result.returncode == 1
+    assert 'non simulée' in result.stderr
+
+
+def test_callable_response_receives_match():
+    replay = ReplayExecutor().add(r'^ping (\S+)', lambda cmd, match: CommandResult(cmd, 0, match.group(1)))
+    assert replay.run('ping 192.168.137.2').stdout == '192.168.137.2'
+
+
+def test_latency_longer_than_timeout_raises():
+    replay = ReplayExecutor(latency=0.05).add(r'.', "ok")
+    with pytest.raises(subprocess.TimeoutExpired):
+        replay.run('arp -a', timeout=0.01)
+
+
+def test_simulated_rules_and_routes_keep_state():
+    hotspot = SimulatedHotspot(clients=2, background_rules=0)
+    replay = hotspot.executor()
+    replay.run('netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_192.168.137.2_OUT" dir=out '
+               'action=block localip=192.168.137.2')
+    assert 'HOTSPOT_BLOCK_192.168.137.2_OUT' in replay.run('netsh advfirewall firewall show rule name=all').stdout
+    assert replay.run('route add 192.168.137.2 mask 255.255.255.255 0.0.0.0').returncode == 0
+    assert replay.run('route add 192.168.137.2 mask 255.255.255.255 0.0.0.0').returncode == 1
+    assert replay.run('route delete 192.168.137.2').returncode == 0
+    assert replay.run('netsh advfirewall firewall delete rule name="HOTSPOT_BLOCK_192.168.137.2_OUT"').returncode == 0
+    assert hotspot.rules == [] and hotspot.routes == set()
+
+
+def test_netsh_script_runs_every_line(tmp_path):
+    hotspot = SimulatedHotspot(clients=1, background_rules=0)
+    script = tmp_path / 'script.txt'
+    script.write_text('advfirewall firewall add rule name="A" dir=out action=block localip=192.168.137.2\n'
+                      'advfirewall firewall add rule name="B" dir=in action=block remoteip=192.168.137.2\n',
+                      encoding='ascii')
+    result = hotspot.executor().run(f'netsh -f "{script}"')
+    assert result.returncode == 0
+    assert [rule['Rule Name'] for rule in hotspot.rules] == ['A', 'B']
+
+
+def test_module_functions_use_current_executor(simulated):
+    assert '192.168.137.2' in executor.check_output('arp -a')
+    assert any('192.168.137.2' in line for line in executor.iter_lines('arp -a'))
+    with pytest.raises(subprocess.CalledProcessError):
+        executor.check_output('route delete 10.0.0.1')
@@ -0,0 +1,58 @@
+import executor
+from firewall import RuleIndex, parse_rules, rule_ips
+
+SHOW_RULE_FR = """
+Nom de la règle :                     HOTSPOT_BLOCK_192.168.137.2_OUT
+----------------------------------------------------------------------
+Activé :                              Oui
+Direction :                           Sortie
+IP locale :                           192.168.137.2/32
+IP distante :                         Tout
+Action :                              Bloquer
+
+Nom de la règle :                     Partage de fichiers
+----------------------------------------------------------------------
+IP locale :                           Tout
+IP distante :                         192.168.137.3,10.0.0.0/8,192.168.137.10-192.168.137.20
+Ok.
+"""
+
+
+def test_parse_rules_french_output():
+    rules = parse_rules(SHOW_RULE_FR)
+    assert [rule['name'] for rule in rules] == ['HOTSPOT_BLOCK_192.168.137.2_OUT', 'Partage de fichiers']
+    assert rules[0]['Action'] == 'Bloquer'
+
+
+def test_rule_ips_keeps_single_addresses_only():
+    blocked, sharing = parse_rules(SHOW_RULE_FR)
+    assert rule_ips(blocked) == {'192.168.137.2'}
+    # Réseaux et plages ignorés : ils ne désignent pas un appareil
+    assert rule_ips(sharing) == {'192.168.137.3'}
+
+
+def test_rule_ips_reads_ip_from_hotspot_rule_name():
+    assert rule_ips({'name': 'HOTSPOT_BLOCK_192.168.137.7_DNS', 'RemoteIP': 'Any'}) == {'192.168.137.7'}
+
+
+def test_index_uses_a_single_netsh_call(simulated):
+    replay = executor.get_executor()
+    replay.run('netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_192.168.137.2_OUT" dir=out '
+               'action=block localip=192.168.137.2')
+    index = RuleIndex(ttl=60)
+    replay.calls.clear()
+    assert index.is_blocked('192.168.137.2')
+    assert not index.is_blocked('192.168.137.3')
+    assert index.blocked_ips() == {'192.168.137.2'}
+    assert len(replay.calls) == 1
+
+
+def test_invalidate_forces_a_reread(simulated):
+    replay = executor.get_executor()
+    index = RuleIndex(ttl=60)
+    assert not index.is_blocked('192.168.137.2')
+    replay.run('netsh advfirewall firewall add rule name="HOTSPOT_BLOCK_192.168.137.2_OUT" dir=out '
+               'action=block localip=192.168.137.2')
+    assert not index.is_blocked('192.168.137.2')  # encore dans le délai de validité
+    index.invalidate()
+    assert index.is_blocked('192.168.137.2')
@@ -0,0 +1,139 @@
+import gzip
+import json
+import threading
+import time
+
+import pytest
+
+import httpcache
+from httpcache import ResultCache, compact, content_etag
+
+
+def test_compact_format():
+    items = [{'ip': '192.168.137.2', 'name': 'a'}, {'ip': '192.168.137.3'}]
+    assert compact(items, ('ip', 'name')) == {
+        'fields': ['ip', 'name'],
+        'rows': [['192.168.137.2', 'a'], ['192.168.137.3', None]],
+    }
+
+
+def test_content_etag_ignores_key_order():
+    assert content_etag({'a': 1, 'b': 2}) == content_etag({'b': 2, 'a': 1})
+    assert content_etag({'a': 1}) != content_etag({'a': 2})
+
+
+def test_result_cache_computes_once_for_concurrent_callers():
+    cache = ResultCache(ttl=30)
+    calls = []
+    release = threading.Event()
+
+    def compute():
+        calls.append(1)
+        release.wait(1)
+        return 'règles'
+
+    threads = [threading.Thread(target=cache.get, args=('192.168.137.2', compute)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.1)
+    release.set()
+    for thread in threads:
+        thread.join()
+    assert len(calls) == 1
+    assert cache.get('192.168.137.2', lambda: 'autre') == 'règles'
+
+
+def test_invalidation_during_compute_is_not_cached():
+    cache = ResultCache(ttl=30)
+
+    def compute():
+        cache.invalidate('192.168.137.2')
+        return 'ancien'
+
+    assert cache.get('192.168.137.2', compute) == 'ancien'
+    assert cache.get('192.168.137.2', lambda: 'nouveau') == 'nouveau'
+
+
+def test_expired_entry_is_recomputed():
+    cache = ResultCache(ttl=0.05)
+    cache.get('k', lambda: 1)
+    time.sleep(0.06)
+    assert cache.get('k', lambda: 2) == 2
+
+
+def test_size_is_bounded_and_key_locks_are_released():
+    cache = ResultCache(ttl=30, max_entries=4)
+    for n in range(50):
+        cache.get(f'192.168.137.{n}', lambda: n)
+    assert cache.info()['entries'] == 4
+    assert cache._key_locks == {}
+    with pytest.raises(RuntimeError):
+        cache.get('erreur', lambda: (_ for _ in ()).throw(RuntimeError('échec')))
+    assert cache._key_locks == {}
+
+
+# --- Endpoints ---
+
+@pytest.fixture
+def scanned(client):
+    """Premier scan publié : sans thread de scan, /devices l'attendrait"""
+    import app
+
+    return app.inventory.scan_once()
+
+
+def test_devices_etag_and_304(client, scanned):
+    response = client.get('/devices')
+    assert response.status_code == 200
+    etag = response.headers['ETag']
+    assert etag.startswith('W/"') and httpcache.BOOT_ID in etag
+    assert response.headers['X-Inventory-Version'] in etag
+
+    again = client.get('/devices', headers={'If-None-Match': etag})
+    assert again.status_code == 304 and again.data == b''
+    # Comparaison faible : l'ETag sans W/ correspond aussi
+    assert client.get('/devices', headers={'If-None-Match': etag[2:]}).status_code == 304
+
+
+def test_devices_etag_changes_with_version(client, scanned, simulated):
+    import app
+
+    etag = client.get('/devices').headers['ETag']
+    ip = next(iter(simulated.clients))
+    app.inventory.patch({ip: {'status': 'blocked'}})
+    response = client.get('/devices', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] != etag
+
+
+def test_devices_compact_and_gzip(client, scanned, monkeypatch):
+    monkeypatch.setattr(httpcache, 'GZIP_MIN_SIZE', 10)
+    plain = client.get('/devices').get_json()
+    response = client.get('/devices?format=compact', headers={'Accept-Encoding': 'gzip, deflate'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['ETag'].endswith('-compact"')
+    body = json.loads(gzip.decompress(response.data))
+    assert len(body['rows']) == len(plain)
+    assert body['fields'][0] == 'ip'
+    assert {row[0] for row in body['rows']} == {device['ip'] for device in plain}
+
+
+def test_rules_endpoint_is_cached_until_block(client, scanned, simulated):
+    import executor
+
+    ip = next(iter(simulated.clients))
+    first = client.get(f'/rules/{ip}')
+    assert first.status_code == 200
+    etag = first.headers['ETag']
+    calls = len(executor.get_executor().calls)
+    assert client.get(f'/rules/{ip}', headers={'If-None-Match': etag}).status_code == 304
+    assert len(executor.get_executor().calls) == calls
+
+    client.post('/block', json={'ips': [ip]})
+    after = client.get(f'/rules/{ip}', headers={'If-None-Match': etag})
+    assert after.status_code == 200
+    assert after.get_json()['rules_count'] > 0
+
+
+def test_rules_endpoint_rejects_invalid_ip(client):
+    assert client.get('/rules/pas-une-ip').status_code == 400
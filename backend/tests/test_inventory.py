@@ -0,0 +1,82 @@
+import time
+
+from inventory import DeviceInventory
+
+
+class FakeScan:
+    def __init__(self, *devices):
+        self.devices = [dict(d) for d in devices]
+
+    def __call__(self):
+        return [dict(d) for d in self.devices]
+
+
+def device(ip, status='active', **fields):
+    return {'ip': ip, 'mac': f'3C:22:FB:00:00:{ip[-1]:0>2}', 'status': status, **fields}
+
+
+def test_version_changes_only_when_devices_change():
+    scan = FakeScan(device('192.168.137.2'))
+    inventory = DeviceInventory(scan)
+    assert inventory.scan_once().version == 1
+    assert inventory.scan_once().version == 1
+    scan.devices.append(device('192.168.137.3'))
+    assert inventory.scan_once().version == 2
+
+
+def test_listeners_receive_previous_and_current():
+    scan = FakeScan(device('192.168.137.2'))
+    inventory = DeviceInventory(scan)
+    seen = []
+    inventory.add_listener(lambda old, new: seen.append((old.version, new.version)))
+    inventory.scan_once()
+    inventory.scan_once()
+    scan.devices[0]['name'] = 'iPhone'
+    inventory.scan_once()
+    assert seen == [(0, 1), (1, 2)]
+
+
+def test_patch_publishes_a_new_version_immediately():
+    inventory = DeviceInventory(FakeScan(device('192.168.137.2')))
+    inventory.scan_once()
+    seen = []
+    inventory.add_listener(lambda old, new: seen.append(new.devices['192.168.137.2']['status']))
+    snapshot = inventory.patch({'192.168.137.2': {'status': 'blocked'}})
+    assert snapshot.version == 2
+    assert inventory.snapshot().devices['192.168.137.2']['status'] == 'blocked'
+    assert seen == ['blocked']
+
+
+def test_patch_without_change_keeps_the_version():
+    inventory = DeviceInventory(FakeScan(device('192.168.137.2')))
+    inventory.scan_once()
+    assert inventory.patch({'192.168.137.2': {'status': 'active'}}).version == 1
+    assert inventory.patch({'192.168.137.9': {'status': 'blocked'}}).version == 1
+
+
+def test_scan_started_before_patch_keeps_patched_fields():
+    scan = FakeScan(device('192.168.137.2'))
+    inventory = DeviceInventory(scan)
+    inventory.scan_once()
+
+    def slow_scan():
+        # Le pare-feu change pendant le scan : le résultat lu est déjà périmé
+        result = FakeScan(device('192.168.137.2'))()
+        inventory.patch({'192.168.137.2': {'status': 'blocked'}})
+        return result
+
+    inventory.scan = slow_scan
+    assert inventory.scan_once().devices['192.168.137.2']['status'] == 'blocked'
+    # Un scan commencé après la correction fait foi
+    time.sleep(0.01)
+    inventory.scan = scan
+    assert inventory.scan_once().devices['192.168.137.2']['status'] == 'active'
+
+
+def test_snapshot_waits_for_first_scan():
+    inventory = DeviceInventory(FakeScan(device('192.168.137.2')), interval=60)
+    inventory.start()
+    try:
+        assert inventory.snapshot(wait=5).version == 1
+    finally:
+        inventory.stop()
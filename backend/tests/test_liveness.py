@@ -0,0 +1,119 @@
+import ipaddress
+
+import pytest
+
+import executor
+from inventory import DeviceInventory
+from liveness import LivenessMonitor, parse_neighbors, sweep_targets
+from netiface import HotspotInfo
+
+NEIGHBORS_FR = """
+Interface 12 : Connexion au réseau local* 10
+
+Adresse Internet                              Adresse physique   Type
+--------------------------------------------  -----------------  -----------
+192.168.137.2                                 3c-22-fb-00-00-01  Accessible
+192.168.137.3                                 3c-22-fb-00-00-02  Obsolète
+192.168.1.1                                   00-11-22-33-44-55  Accessible
+192.168.137.255                               ff-ff-ff-ff-ff-ff  Permanent
+"""
+
+
+def hotspot_info(network='192.168.137.0/24'):
+    return HotspotInfo('hotspot', '192.168.137.1', ipaddress.ip_network(network), True, 0)
+
+
+def test_parse_neighbors_keeps_reachable_clients():
+    assert parse_neighbors(NEIGHBORS_FR, hotspot_info()) == {'192.168.137.2'}
+    assert parse_neighbors(NEIGHBORS_FR) == {'192.168.137.2', '192.168.1.1'}
+
+
+def test_sweep_targets_whole_subnet_or_known_ips():
+    targets = sweep_targets(hotspot_info(), ['192.168.137.9', '10.0.0.1'])
+    assert len(targets) == 253 and targets[0] == '192.168.137.2'
+    # Sous-réseau trop grand : seules les IPs connues sont sondées
+    assert sweep_targets(hotspot_info('192.168.0.0/16'), ['192.168.137.9']) == ['192.168.137.9']
+
+
+class Clock:
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def monitored(monkeypatch):
+    """Cinq clients dont un parti (toujours dans la table ARP) et un qui ignore ICMP"""
+    hotspot = executor.SimulatedHotspot(clients=5, background_rules=0, gone=1)
+    previous = executor.get_executor()
+    executor.set_executor(hotspot.executor())
+    clock = Clock()
+    monkeypatch.setattr('liveness.time.time', clock)
+    info = HotspotInfo('hotspot', hotspot.gateway, hotspot.network, True, 0)
+    entries = {ip: mac.upper().replace('-', ':') for ip, mac in hotspot.clients.items()}
+    monitor = LivenessMonitor(lambda: info, lambda: entries, offline_after=60)
+    yield hotspot, monitor, entries, clock
+    executor.set_executor(previous)
+
+
+def test_presence_after_sweep(monitored):
+    hotspot, monitor, entries, _ = monitored
+    assert {monitor.presence(ip, mac) for ip, mac in entries.items()} == {'unknown'}
+    changed = []
+    monitor.add_listener(changed.extend)
+    monitor.sweep()
+
+    gone = next(iter(hotspot.gone))
+    silent = next(iter(hotspot.silent))
+    for ip, mac in entries.items():
+        assert monitor.presence(ip, mac) == ('offline' if ip == gone else 'online')
+    # Sans réponse ICMP, l'entrée Reachable des voisins suffit
+    assert monitor.last_seen(silent, entries[silent]) is not None
+    assert sorted(changed) == sorted(entries)
+
+
+def test_device_goes_offline_after_delay_and_comes_back(monitored):
+    hotspot, monitor, entries, clock = monitored
+    monitor.sweep()
+    ip = sorted(set(entries) - hotspot.gone)[0]
+    hotspot.gone.add(ip)
+    clock.now += 30
+    monitor.sweep()
+    assert monitor.presence(ip, entries[ip]) == 'online'
+    clock.now += 40
+    monitor.sweep()
+    assert monitor.presence(ip, entries[ip]) == 'offline'
+
+    hotspot.gone.discard(ip)
+    clock.now += 15
+    assert monitor.sweep() == {ip}
+    assert monitor.presence(ip, entries[ip]) == 'online'
+
+
+def test_new_arp_entry_is_unknown_until_probed(monitored):
+    _, monitor, entries, clock = monitored
+    monitor.sweep()
+    clock.now += 1
+    monitor.note_arrivals(['192.168.137.50'])
+    assert monitor.presence('192.168.137.50') == 'unknown'
+    clock.now += 1
+    monitor.sweep()
+    assert monitor.presence('192.168.137.50') == 'offline'
+
+
+def test_last_seen_bumps_inventory_version(monitored):
+    _, monitor, entries, clock = monitored
+
+    def scan():
+        return [{'ip': ip, 'mac': mac, 'last_seen': monitor.last_seen(ip, mac)} for ip, mac in entries.items()]
+
+    inventory = DeviceInventory(scan)
+    monitor.sweep()
+    version = inventory.scan_once().version
+    assert inventory.scan_once().version == version
+    # Nouvelle sonde : last_seen avance, le corps en cache pour l'ancienne version est périmé
+    clock.now += 15
+    monitor.sweep()
+    assert inventory.scan_once().version == version + 1
@@ -0,0 +1,121 @@
+import pytest
+
+from metering import QuotaRule, RingBuffer, SyntheticCounterSource, TrafficMeter
+
+
+def filled(samples, size=8):
+    buffer = RingBuffer(size)
+    for t, rx in samples:
+        buffer.append(t, (rx, rx // 4, 0, 0))
+    return buffer
+
+
+def test_delta_needs_two_samples():
+    assert filled([(0, 100)]).delta(60) == (0.0, (0, 0, 0, 0))
+
+
+def test_delta_over_window():
+    buffer = filled([(t, t * 1000) for t in range(0, 20, 2)])
+    elapsed, deltas = buffer.delta(6)
+    assert elapsed == 6
+    assert deltas[:2] == (6000, 1500)
+
+
+def test_delta_is_limited_to_history_after_wraparound():
+    buffer = filled([(t, t * 1000) for t in range(0, 40, 2)], size=8)
+    elapsed, deltas = buffer.delta(1000)
+    # 8 cases : 7 intervalles de 2 s
+    assert elapsed == 14
+    assert deltas[0] == 14000
+
+
+def test_rate():
+    buffer = filled([(t, t * 1000) for t in range(0, 20, 2)])
+    assert buffer.rate(10)[0] == 1000
+
+
+def test_quota_window_longer_than_history_is_rejected():
+    meter = TrafficMeter(source=None, interval=2, history=10)
+    meter.set_quotas([QuotaRule(1e6, meter.max_window)])
+    with pytest.raises(ValueError):
+        meter.set_quotas([QuotaRule(1e6, meter.max_window + 1)])
+
+
+@pytest.mark.parametrize('data', [{'window': 60}, {'limit_mb': 'x', 'window': 60}, {'limit_mb': 1}, [1]])
+def test_invalid_quota_description(data):
+    with pytest.raises(ValueError):
+        QuotaRule.from_dict(data)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def metered():
+    """Compteurs simulés pour deux clients, un quota de 100 ko sur 10 s"""
+    clock = Clock()
+    source = SyntheticCounterSource(lambda: ['192.168.137.2', '192.168.137.3'], base_rate=1000, clock=clock)
+    meter = TrafficMeter(source, interval=1, history=30)
+    meter.set_quotas([QuotaRule(100_000, 10)])
+    fired = []
+    meter.add_listener(lambda ips, rule: fired.append(ips))
+
+    def run(seconds):
+        for _ in range(seconds):
+            clock.now += 1
+            meter.sample(clock.now)
+
+    return source, meter, fired, run
+
+
+def test_quota_fires_once_per_crossing(metered):
+    source, _, fired, run = metered
+    run(12)
+    assert fired == []
+
+    # 80 ko/s reçus + 20 ko/s émis : dépassé dès la deuxième seconde
+    source.set_rate('192.168.137.2', 80_000)
+    run(2)
+    assert fired == [['192.168.137.2']]
+    run(20)
+    assert fired == [['192.168.137.2']]
+
+
+def test_quota_rearms_after_usage_drops(metered):
+    source, _, fired, run = metered
+    source.set_rate('192.168.137.2', 80_000)
+    run(3)
+    source.set_rate('192.168.137.2', 1000)
+    # La fenêtre de 10 s glisse au-delà du pic : l'appareil repasse sous le quota
+    run(12)
+    assert fired == [['192.168.137.2']]
+    source.set_rate('192.168.137.2', 80_000)
+    run(3)
+    assert fired == [['192.168.137.2'], ['192.168.137.2']]
+
+
+def test_new_quotas_rearm_tripped_devices(metered):
+    source, meter, fired, run = metered
+    source.set_rate('192.168.137.2', 80_000)
+    run(3)
+    meter.set_quotas([QuotaRule(100_000, 10)])
+    run(1)
+    assert fired == [['192.168.137.2'], ['192.168.137.2']]
+
+
+def test_source_counter_reset_keeps_totals_and_does_not_refire(metered):
+    source, meter, fired, run = metered
+    source.set_rate('192.168.137.2', 80_000)
+    run(3)
+    before = meter.rates()['192.168.137.2']
+    # Redémarrage de la capture : les compteurs bruts repartent de zéro
+    source._totals.clear()
+    run(1)
+    after = meter.rates()['192.168.137.2']
+    assert after['rx_bytes'] > before['rx_bytes']
+    assert fired == [['192.168.137.2']]
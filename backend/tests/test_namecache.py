@@ -0,0 +1,106 @@
+import json
+import threading
+
+from namecache import NameCache
+
+IP = '192.168.137.2'
+MAC_A = '3C:22:FB:00:00:01'
+MAC_B = '3C:22:FB:00:00:02'
+
+
+def make_cache(tmp_path, **kwargs):
+    return NameCache(str(tmp_path / 'names.json'), **kwargs)
+
+
+def test_resolved_names_survive_a_restart(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(IP, MAC_A, 'iPhone-de-Lea', True)
+    cache.store('192.168.137.3', MAC_B, 'Appareil-03', False)
+    cache.save()
+    reloaded = make_cache(tmp_path)
+    # Les échecs de résolution ne sont pas rechargés : ils seront retentés
+    assert reloaded.load() == 1
+    assert reloaded.lookup(IP, MAC_A) == ('iPhone-de-Lea', True)
+
+
+def test_concurrent_saves_leave_a_valid_file(tmp_path, caplog):
+    cache = make_cache(tmp_path)
+    errors = []
+
+    def writer(n):
+        try:
+            for i in range(20):
+                cache.store(f'192.168.{n}.{i}', None, f'poste-{n}-{i}', True)
+                for _ in range(3):
+                    cache._dirty = True  # force une écriture à chaque appel
+                    cache.save()
+        except Exception as e:  # pragma: no cover - signalé par l'assertion
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(n,)) for n in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert "Impossible d'enregistrer" not in caplog.text
+    with open(tmp_path / 'names.json', encoding='utf-8') as f:
+        assert len(json.load(f)['entries']) == 160
+    assert not (tmp_path / 'names.json.tmp').exists()
+
+
+def test_lookup_by_mac_is_case_insensitive(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(IP, MAC_A, 'iPhone-de-Lea', True)
+    assert cache.lookup(IP, MAC_A.lower()) == ('iPhone-de-Lea', True)
+
+
+def test_same_mac_on_new_ip_keeps_its_name(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(IP, MAC_A, 'iPhone-de-Lea', True)
+    assert cache.lookup('192.168.137.9', MAC_A) == ('iPhone-de-Lea', True)
+
+
+def test_ip_reassigned_to_another_mac_is_a_miss(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(IP, MAC_A, 'iPhone-de-Lea', True)
+    assert cache.lookup(IP, MAC_B) is None
+    assert cache.peek(IP, MAC_B) == (False, False)
+
+
+def test_failed_resolution_of_new_device_does_not_inherit_name(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(IP, MAC_A, 'iPhone-de-Lea', True)
+    cache.store(IP, MAC_B, 'Appareil-02', False)
+    assert cache.lookup(IP, MAC_B) == ('Appareil-02', True)
+    assert cache.lookup('192.168.137.9', MAC_A) == ('iPhone-de-Lea', True)
+
+
+def test_entry_without_mac_is_found_by_ip(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(IP, None, 'imprimante', True)
+    assert cache.lookup(IP, MAC_B) == ('imprimante', True)
+
+
+def test_failure_does_not_overwrite_a_resolved_name(tmp_path):
+    cache = make_cache(tmp_path)
+    cache.store(IP, MAC_A, 'iPhone-de-Lea', True)
+    cache.store(IP, MAC_A, 'Appareil-02', False)
+    assert cache.lookup(IP, MAC_A) == ('iPhone-de-Lea', True)
+
+
+def test_negative_entries_expire_quickly(tmp_path):
+    cache = make_cache(tmp_path, negative_ttl=0)
+    cache.store(IP, MAC_A, 'Appareil-02', False)
+    assert cache.lookup(IP, MAC_A) == ('Appareil-02', False)
+
+
+def test_lru_eviction(tmp_path):
+    cache = make_cache(tmp_path, max_entries=2)
+    cache.store('192.168.137.2', None, 'a', True)
+    cache.store('192.168.137.3', None, 'b', True)
+    cache.lookup('192.168.137.2')
+    cache.store('192.168.137.4', None, 'c', True)
+    assert cache.lookup('192.168.137.3') is None
+    assert cache.lookup('192.168.137.2') == ('a', True)
+    assert cache.evictions == 1
@@ -0,0 +1,76 @@
+import ipaddress
+
+import executor
+from executor import SimulatedHotspot
+from netiface import HotspotDiscovery, HotspotInfo, parse_ipconfig, select_hotspot_adapter
+
+IPCONFIG_FR = """
+Configuration IP de Windows
+
+
+Carte Ethernet Ethernet :
+
+   Statut du média. . . . . . . . . . . . : Média déconnecté
+
+Carte réseau sans fil Connexion au réseau local* 2 :
+
+   Suffixe DNS propre à la connexion. . . :
+   Adresse IPv6 de liaison locale. . . . .: fe80::1c2d:3e4f:5a6b:7c8d%15
+   Adresse IPv4. . . . . . . . . . . . . .: 192.168.137.1
+   Masque de sous-réseau. . . . . . . . . : 255.255.255.0
+   Passerelle par défaut. . . . . . . . . :
+
+Carte réseau sans fil Wi-Fi :
+
+   Adresse IPv4. . . . . . . . . . . . . .: 192.168.1.46
+   Masque de sous-réseau. . . . . . . . . : 255.255.255.0
+"""
+
+
+def test_parse_ipconfig_english():
+    adapters = parse_ipconfig(SimulatedHotspot(netmask='255.255.254.0').ipconfig_output())
+    assert [a['name'] for a in adapters] == [
+        'Ethernet adapter Ethernet', 'Wireless LAN adapter Local Area Connection* 10', 'Wireless LAN adapter Wi-Fi']
+    assert adapters[0]['ipv4'] is None
+    assert (adapters[1]['ipv4'], adapters[1]['netmask']) == ('192.168.137.1', '255.255.254.0')
+
+
+def test_parse_ipconfig_french():
+    adapters = parse_ipconfig(IPCONFIG_FR)
+    hotspot = select_hotspot_adapter(adapters)
+    assert hotspot['name'] == 'Carte réseau sans fil Connexion au réseau local* 2'
+    assert (hotspot['ipv4'], hotspot['netmask']) == ('192.168.137.1', '255.255.255.0')
+
+
+def test_forced_gateway_selects_that_adapter():
+    assert select_hotspot_adapter(parse_ipconfig(IPCONFIG_FR), '192.168.1.46')['name'] == 'Carte réseau sans fil Wi-Fi'
+    assert select_hotspot_adapter(parse_ipconfig(IPCONFIG_FR), '10.0.0.1') is None
+
+
+def test_contains_excludes_gateway_network_and_broadcast():
+    info = HotspotInfo('hotspot', '192.168.137.1', ipaddress.ip_network('192.168.137.0/24'), True, 0)
+    assert info.contains('192.168.137.2')
+    assert not info.contains('192.168.137.1')
+    assert not info.contains('192.168.137.0')
+    assert not info.contains('192.168.137.255')
+    assert not info.contains('192.168.1.2')
+    assert not info.contains('pas-une-ip')
+
+
+def test_discovery_is_cached_until_invalidated(simulated):
+    discovery = HotspotDiscovery(ttl=60)
+    replay = executor.get_executor()
+    replay.calls.clear()
+    info = discovery.get()
+    assert (info.gateway, str(info.network), info.active) == ('192.168.137.1', '192.168.137.0/24', True)
+    assert discovery.get() is info
+    discovery.invalidate()
+    discovery.get()
+    assert replay.calls.count('ipconfig') == 2
+
+
+def test_discovery_falls_back_to_default_gateway(simulated):
+    # Aucune sortie simulée : ipconfig échoue
+    executor.set_executor(executor.ReplayExecutor())
+    info = HotspotDiscovery().get()
+    assert info.gateway == '192.168.137.1' and not info.active
@@ -0,0 +1,64 @@
+import pytest
+
+from oui import OuiDatabase, is_randomized
+
+
+@pytest.fixture
+def database(tmp_path):
+    path = tmp_path / 'oui.txt'
+    path.write_text(
+        "# PRÉFIXE FABRICANT\n"
+        "70B3D5 IEEE Registration Authority\n"
+        "70B3D52 Fabricant MA-M\n"
+        "70B3D5270 Fabricant MA-S\n"
+        "3C22FB Apple, Inc.\n",
+        encoding='utf-8'
+    )
+    return OuiDatabase(str(path))
+
+
+@pytest.mark.parametrize('mac, vendor', [
+    ('70:B3:D5:27:01:23', 'Fabricant MA-S'),
+    ('70:B3:D5:28:01:23', 'Fabricant MA-M'),
+    ('70:B3:D5:A0:01:23', 'IEEE Registration Authority'),
+    ('3c-22-fb-12-34-56', 'Apple, Inc.'),
+    ('00:00:5E:00:00:01', None),
+])
+def test_longest_prefix_wins(database, mac, vendor):
+    assert database.vendor(mac) == vendor
+
+
+def test_all_prefix_lengths_are_loaded(database):
+    assert len(database) == 4
+
+
+def test_missing_file_gives_no_vendor(tmp_path):
+    assert OuiDatabase(str(tmp_path / 'absent.txt')).vendor('3C:22:FB:12:34:56') is None
+
+
+def test_locally_administered_mac_is_randomized():
+    assert is_randomized('DA:A1:19:00:00:01')
+    assert not is_randomized('3C:22:FB:00:00:01')
+
+
+def test_malformed_lines_are_skipped(tmp_path, caplog):
+    path = tmp_path / 'oui.txt'
+    path.write_text(
+        "3C22FB Apple, Inc.\n"
+        "ZZZZZZ Préfixe non hexadécimal\n"
+        "3C22 Préfixe trop court\n"
+        "70B3D5270 Fabricant MA-S\n",
+        encoding='utf-8'
+    )
+    database = OuiDatabase(str(path))
+    assert database.vendor('3C:22:FB:12:34:56') == 'Apple, Inc.'
+    assert database.vendor('70:B3:D5:27:01:23') == 'Fabricant MA-S'
+    assert len(database) == 2
+    assert '2 ligne(s) invalide(s)' in caplog.text
+
+
+def test_shipped_extract_loads_every_line():
+    database = OuiDatabase()
+    assert database.vendor('00:50:C2:B0:41:00') == 'Ubiquiti Networks Inc.'
+    with open(database.path, encoding='utf-8') as f:
+        assert len(database) == sum(1 for line in f if line.strip() and not line.startswith('#'))
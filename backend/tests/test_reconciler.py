@@ -0,0 +1,140 @@
+import pytest
+
+import reconciler as reconciler_module
+from blocking import BLOCK_RULES, rule_name
+from reconciler import ActualState, BlockReconciler, make_plan
+
+SUFFIXES = [suffix for suffix, _ in BLOCK_RULES]
+
+
+def blocked_state(ip):
+    return {rule_name(ip, suffix) for suffix in SUFFIXES}
+
+
+def test_block_adds_all_rules_and_route():
+    plan = make_plan({'192.168.137.2'}, ActualState({}, set()), {'192.168.137.2'})
+    assert len(plan.netsh_lines) == len(SUFFIXES)
+    assert all('add rule' in line for line in plan.netsh_lines)
+    assert plan.add_routes == ['192.168.137.2']
+    assert plan.changes == {'192.168.137.2': len(SUFFIXES) + 1}
+
+
+def test_already_blocked_needs_nothing():
+    ip = '192.168.137.2'
+    actual = ActualState({ip: blocked_state(ip)}, {ip})
+    assert len(make_plan({ip}, actual, {ip})) == 0
+
+
+def test_partial_block_is_completed():
+    ip = '192.168.137.2'
+    present = blocked_state(ip)
+    missing = rule_name(ip, SUFFIXES[0])
+    present.discard(missing)
+    plan = make_plan({ip}, ActualState({ip: present}, {ip}), {ip})
+    assert plan.netsh_lines == [line for line in plan.netsh_lines if missing in line]
+    assert len(plan) == 1
+
+
+def test_unblock_removes_rules_and_route():
+    ip = '192.168.137.3'
+    plan = make_plan(set(), ActualState({ip: blocked_state(ip)}, {ip}), {ip})
+    assert len(plan.netsh_lines) == len(SUFFIXES)
+    assert all('delete rule' in line for line in plan.netsh_lines)
+    assert plan.delete_routes == [ip]
+
+
+def test_stale_rule_of_blocked_ip_is_deleted():
+    ip = '192.168.137.2'
+    stale = f'{rule_name(ip, "OLD")}'
+    actual = ActualState({ip: blocked_state(ip) | {stale}}, {ip})
+    plan = make_plan({ip}, actual, {ip})
+    assert plan.netsh_lines == [f'advfirewall firewall delete rule name="{stale}"']
+
+
+def test_scope_limits_the_plan():
+    actual = ActualState({'192.168.137.9': blocked_state('192.168.137.9')}, {'192.168.137.9'})
+    plan = make_plan({'192.168.137.2'}, actual, {'192.168.137.2'})
+    assert set(plan.changes) == {'192.168.137.2'}
+    assert plan.delete_routes == []
+
+
+@pytest.fixture
+def reconciler(simulated):
+    instance = BlockReconciler()
+    instance.set_desired(set())
+    return instance
+
+
+def client_ip(simulated, n=0):
+    return sorted(simulated.clients)[n]
+
+
+def test_block_then_unblock_on_simulated_hotspot(simulated, reconciler):
+    ip = client_ip(simulated)
+    results, _ = reconciler.block([ip])
+    assert results[ip]['success'] and results[ip]['route']
+    assert ip in simulated.routes
+    assert {rule['Rule Name'] for rule in simulated.rules} >= blocked_state(ip)
+
+    # Déjà bloquée : aucune commande de plus
+    results, _ = reconciler.block([ip])
+    assert results[ip]['changes'] == 0
+
+    results, _ = reconciler.unblock([ip])
+    assert results[ip]['success']
+    assert ip not in simulated.routes
+    assert not any(rule['Rule Name'] in blocked_state(ip) for rule in simulated.rules)
+
+
+def test_block_reports_failure_when_protections_are_missing(simulated, reconciler, monkeypatch):
+    monkeypatch.setattr(reconciler_module, 'add_route', lambda ip: False)
+    monkeypatch.setattr(reconciler_module, 'run_netsh_script', lambda lines: None)
+    ip = client_ip(simulated)
+    results, _ = reconciler.block([ip])
+    assert not results[ip]['success']
+    assert results[ip]['protections'] == 0
+
+
+def test_unblock_fails_while_route_is_present(simulated, reconciler, monkeypatch):
+    ip = client_ip(simulated)
+    reconciler.block([ip])
+    monkeypatch.setattr(reconciler_module, 'delete_route', lambda ip: False)
+    results, _ = reconciler.unblock([ip])
+    assert not results[ip]['success']
+    assert not results[ip]['route']
+    assert ip in simulated.routes
+
+
+def test_block_outside_hotspot_is_rejected(simulated, reconciler):
+    results, _ = reconciler.block(['10.9.9.9'])
+    assert not results['10.9.9.9']['success']
+    assert 'hors du hotspot' in results['10.9.9.9']['error']
+    assert '10.9.9.9' not in simulated.routes
+    assert reconciler.desired() == set()
+
+
+def test_leftover_route_outside_subnet_is_removed(simulated, reconciler):
+    # Route posée avant un changement de sous-réseau (ou par une ancienne version)
+    simulated.routes.add('10.9.9.9')
+    results, _ = reconciler.unblock(['10.9.9.9'])
+    assert results['10.9.9.9']['success']
+    assert '10.9.9.9' not in simulated.routes
+
+
+def test_cleanup_removes_routes_of_desired_ips_outside_subnet(simulated, reconciler):
+    simulated.routes.add('10.9.9.9')
+    reconciler.set_desired({'10.9.9.9'})
+    result = reconciler.cleanup()
+    assert '10.9.9.9' not in simulated.routes
+    assert result['remaining_routes'] == []
+
+
+def test_periodic_pass_repairs_a_deleted_rule(simulated, reconciler):
+    ip = client_ip(simulated)
+    reconciler.block([ip])
+    with simulated.lock:
+        simulated.rules = [rule for rule in simulated.rules if rule['Rule Name'] != rule_name(ip, SUFFIXES[0])]
+    _, plan = reconciler.reconcile()
+    assert plan.changes == {ip: 1}
+    _, plan = reconciler.reconcile()
+    assert len(plan) == 0
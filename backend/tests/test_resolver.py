@@ -0,0 +1,86 @@
+import socket
+import struct
+import threading
+
+import pytest
+
+import resolver
+from resolver import (AsyncResolver, _encode_name, build_nbstat_query, build_ptr_query,
+                      parse_nbstat_response, parse_ptr_response, reverse_name)
+
+
+def ptr_response(query, name, rcode=0):
+    """Réponse à ``query`` avec un PTR ``name`` (nom de la question compressé)"""
+    txid = struct.unpack('>H', query[:2])[0]
+    header = struct.pack('>HHHHHH', txid, 0x8180 | rcode, 1, 0 if rcode else 1, 0, 0)
+    answer = b''
+    if not rcode:
+        rdata = _encode_name(name)
+        answer = b'\xc0\x0c' + struct.pack('>HHIH', resolver.TYPE_PTR, resolver.CLASS_IN, 60, len(rdata)) + rdata
+    return header + query[12:] + answer
+
+
+def nbstat_response(names):
+    entries = b''.join(name.ljust(15).encode('ascii') + bytes([suffix]) + struct.pack('>H', flags)
+                       for name, suffix, flags in names)
+    header = struct.pack('>HHHHHH', 1, 0x8400, 0, 1, 0, 0)
+    question = build_nbstat_query(1)[12:-4]
+    return header + question + struct.pack('>HHIH', resolver.TYPE_NBSTAT, 1, 0, len(entries) + 1) \
+        + bytes([len(names)]) + entries
+
+
+def test_reverse_name():
+    assert reverse_name('192.168.137.2') == '2.137.168.192.in-addr.arpa'
+
+
+def test_parse_ptr_response():
+    query = build_ptr_query(7, '192.168.137.2')
+    assert parse_ptr_response(ptr_response(query, 'iphone-de-lea.mshome.net')) == 'iphone-de-lea.mshome.net'
+
+
+def test_nxdomain_and_garbage_give_no_name():
+    query = build_ptr_query(7, '192.168.137.2')
+    assert parse_ptr_response(ptr_response(query, '', rcode=3)) is None
+    assert parse_ptr_response(b'\x00\x07\x81') is None
+
+
+def test_parse_nbstat_keeps_unique_workstation_name():
+    data = nbstat_response([('WORKGROUP', 0x00, 0x8400), ('PC-SALON', 0x20, 0x0400), ('PC-SALON', 0x00, 0x0400)])
+    assert parse_nbstat_response(data) == 'PC-SALON'
+    assert parse_nbstat_response(nbstat_response([('WORKGROUP', 0x00, 0x8400)])) is None
+
+
+@pytest.fixture
+def dns_server(monkeypatch):
+    """Serveur DNS sur la boucle locale : répond aux PTR de 127.0.0.x sauf 127.0.0.9"""
+    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+    sock.bind(('127.0.0.1', 0))
+    sock.settimeout(0.1)
+    monkeypatch.setattr(resolver, 'DNS_PORT', sock.getsockname()[1])
+    stopped = threading.Event()
+
+    def serve():
+        while not stopped.is_set():
+            try:
+                query, addr = sock.recvfrom(512)
+            except socket.timeout:
+                continue
+            if b'\x019\x010\x010\x03127' not in query:
+                sock.sendto(ptr_response(query, 'poste.mshome.net'), addr)
+
+    thread = threading.Thread(target=serve, daemon=True)
+    thread.start()
+    yield '127.0.0.1'
+    stopped.set()
+    thread.join()
+    sock.close()
+
+
+def test_resolve_many_with_per_query_timeout(dns_server):
+    names = AsyncResolver(nameserver=dns_server, timeout=0.3, methods=('dns',)).resolve_many(
+        ['127.0.0.2', '127.0.0.3', '127.0.0.9'])
+    assert names == {'127.0.0.2': 'poste.mshome.net', '127.0.0.3': 'poste.mshome.net', '127.0.0.9': None}
+
+
+def test_resolve_many_empty():
+    assert AsyncResolver().resolve_many([]) == {}
@@ -0,0 +1,93 @@
+import pytest
+
+from scanplan import MIN_PROBES, RETRY_BASE, ScanPlanner
+
+MAC_A = '3C:22:FB:00:00:01'
+MAC_B = '3C:22:FB:00:00:02'
+UNKNOWN = (False, False)   # (frais, résolu) : rien en cache
+FRESH = (True, True)
+STALE_NAME = (False, True)
+
+
+def names(state=UNKNOWN):
+    """``name_state`` identique pour tous les appareils"""
+    return lambda ip, mac: state
+
+
+@pytest.fixture
+def planner():
+    return ScanPlanner(time_budget=1.0, max_probes=8, stable_after=900, stable_refresh=3600)
+
+
+def probe(planner, entries, name_state, now, resolved=True, duration=0.1):
+    selected = planner.plan(entries, name_state, now=now)
+    planner.record(selected, {ip: resolved for ip, _ in selected}, duration, now=now)
+    return selected
+
+
+def test_new_device_is_probed_once(planner):
+    entries = {'192.168.137.2': MAC_A}
+    planner.observe(entries, {}, now=0)
+    assert probe(planner, entries, names(), now=0) == [('192.168.137.2', MAC_A)]
+    assert planner.last_plan['new'] == 1
+    planner.observe(entries, {}, now=10)
+    assert planner.plan(entries, names(FRESH), now=10) == []
+
+
+def test_name_from_persistent_cache_needs_no_probe(planner):
+    entries = {'192.168.137.2': MAC_A}
+    planner.observe(entries, {}, now=0)
+    assert planner.plan(entries, names(FRESH), now=0) == []
+
+
+def test_changed_ip_and_status_get_priority(planner):
+    entries = {'192.168.137.2': MAC_A, '192.168.137.3': MAC_B}
+    planner.observe(entries, {}, now=0)
+    probe(planner, entries, names(), now=0)
+
+    moved = {'192.168.137.9': MAC_A, '192.168.137.3': MAC_B}
+    planner.observe(moved, {'192.168.137.3': 'blocked'}, now=10)
+    planner.observe(moved, {'192.168.137.3': 'active'}, now=20)
+    assert planner.plan(moved, names(FRESH), now=20) == [
+        ('192.168.137.9', MAC_A),   # changed
+        ('192.168.137.3', MAC_B),   # blocked
+    ]
+    assert planner.last_plan['changed'] == 1 and planner.last_plan['blocked'] == 1
+
+
+def test_failures_are_retried_with_backoff(planner):
+    entries = {'192.168.137.2': MAC_A}
+    planner.observe(entries, {}, now=0)
+    probe(planner, entries, names(), now=0, resolved=False)
+    probe(planner, entries, names(), now=RETRY_BASE, resolved=False)
+    # Deuxième échec : prochain essai après 2 × RETRY_BASE
+    assert planner.plan(entries, names(), now=RETRY_BASE * 2) == []
+    assert planner.plan(entries, names(), now=RETRY_BASE * 3) == [('192.168.137.2', MAC_A)]
+
+
+def test_stable_device_is_refreshed_rarely(planner):
+    entries = {'192.168.137.2': MAC_A}
+    planner.observe(entries, {}, now=0)
+    probe(planner, entries, names(), now=0)
+    assert planner.plan(entries, names(STALE_NAME), now=1000) == []
+    assert planner.plan(entries, names(STALE_NAME), now=3600) == [('192.168.137.2', MAC_A)]
+    assert planner.last_plan['stable'] == 1
+
+
+def test_probe_limit_defers_and_adapts(planner):
+    entries = {f'192.168.137.{n}': f'3C:22:FB:00:00:{n:02X}' for n in range(2, 22)}
+    planner.observe(entries, {}, now=0)
+    first = probe(planner, entries, names(), now=0, duration=0.5)
+    assert len(first) == 8 and planner.deferred == 12
+    # Budget dépassé : moitié moins de sondes au scan suivant
+    second = probe(planner, entries, names(), now=1, duration=2.0)
+    assert len(second) == 8 and planner.probe_limit == 4
+    third = probe(planner, entries, names(), now=2, duration=0.2)
+    assert not set(third) & set(first + second)
+    assert planner.probe_limit == 4 + MIN_PROBES
+
+
+def test_absent_device_is_forgotten(planner):
+    planner.observe({'192.168.137.2': MAC_A}, {}, now=0)
+    planner.observe({}, {}, now=4000)
+    assert planner.info()['tracked_devices'] == 0
@@ -0,0 +1,159 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from scheduler import Scheduler, ScheduleStore, in_window, next_occurrence, parse_hhmm
+
+
+def at(hour, minute, day=15):
+    return datetime(2026, 10, day, hour, minute).timestamp()
+
+
+@pytest.mark.parametrize('hour, minute, expected', [
+    (22, 59, False),
+    (23, 0, True),
+    (23, 59, True),
+    (0, 0, True),
+    (6, 59, True),
+    (7, 0, False),
+    (12, 0, False),
+])
+def test_window_across_midnight(hour, minute, expected):
+    assert in_window('23:00', '07:00', at(hour, minute)) is expected
+
+
+@pytest.mark.parametrize('hour, minute, expected', [
+    (8, 59, False),
+    (9, 0, True),
+    (16, 59, True),
+    (17, 0, False),
+])
+def test_window_within_a_day(hour, minute, expected):
+    assert in_window('09:00', '17:00', at(hour, minute)) is expected
+
+
+def test_next_occurrence_rolls_over_to_tomorrow():
+    assert next_occurrence('07:00', at(23, 30)) == at(7, 0, day=16)
+    assert next_occurrence('23:00', at(22, 0)) == at(23, 0)
+    # Strictement après : l'heure courante renvoie au lendemain
+    assert next_occurrence('23:00', at(23, 0)) == at(23, 0, day=16)
+
+
+@pytest.mark.parametrize('value', ['24:00', '12:60', 'midi'])
+def test_invalid_hour_is_rejected(value):
+    with pytest.raises(ValueError):
+        parse_hhmm(value)
+
+
+class Recorder:
+    """``apply`` factice : garde les lots reçus"""
+
+    def __init__(self):
+        self.batches = []
+        self.event = threading.Event()
+
+    def __call__(self, action, jobs):
+        self.batches.append((action, sorted(job['ip'] for job in jobs)))
+        self.event.set()
+
+    def wait(self, count, timeout=5):
+        deadline = time.time() + timeout
+        while len(self.batches) < count and time.time() < deadline:
+            self.event.wait(0.05)
+            self.event.clear()
+        return self.batches
+
+
+def hhmm(offset_hours):
+    return (datetime.now() + timedelta(hours=offset_hours)).strftime('%H:%M')
+
+
+@pytest.fixture
+def store(tmp_path):
+    return ScheduleStore(str(tmp_path / 'hotspot.db'))
+
+
+def saved_daily(store, ip, start, end):
+    job = {'id': ip, 'kind': 'daily', 'action': None, 'ip': ip, 'mac': None, 'due': None,
+           'start': start, 'end': end, 'created_at': time.time()}
+    store.save(job)
+
+
+@pytest.fixture
+def run_scheduler():
+    schedulers = []
+
+    def run(recorder, **kwargs):
+        scheduler = Scheduler(recorder, **kwargs)
+        schedulers.append(scheduler)
+        return scheduler
+
+    yield run
+    for scheduler in schedulers:
+        scheduler.stop()
+
+
+def test_reload_inside_window_blocks(store, run_scheduler):
+    saved_daily(store, '192.168.137.2', hhmm(-1), hhmm(1))
+    recorder = Recorder()
+    scheduler = run_scheduler(recorder, store=store)
+    assert scheduler.load() == 1
+    scheduler.start()
+    assert recorder.wait(1) == [('block', ['192.168.137.2'])]
+
+
+def test_reload_outside_window_unblocks(store, run_scheduler):
+    # La fin de plage a pu passer pendant l'arrêt : l'appareil ne doit pas rester bloqué
+    saved_daily(store, '192.168.137.2', hhmm(2), hhmm(3))
+    recorder = Recorder()
+    scheduler = run_scheduler(recorder, store=store)
+    scheduler.load()
+    scheduler.start()
+    assert recorder.wait(1) == [('unblock', ['192.168.137.2'])]
+
+
+def test_new_daily_outside_window_does_nothing_yet(run_scheduler):
+    recorder = Recorder()
+    scheduler = run_scheduler(recorder)
+    scheduler.start()
+    scheduler.schedule_daily('192.168.137.2', hhmm(2), hhmm(3))
+    time.sleep(0.3)
+    assert recorder.batches == []
+    assert scheduler.pending() == 2
+
+
+def test_close_deadlines_are_coalesced(run_scheduler):
+    recorder = Recorder()
+    scheduler = run_scheduler(recorder, coalesce_window=0.5)
+    due = time.time() + 0.2
+    for n, ip in enumerate(('192.168.137.2', '192.168.137.3', '192.168.137.4')):
+        scheduler.schedule_once('block', ip, due + n * 0.1)
+    scheduler.start()
+    assert recorder.wait(1) == [('block', ['192.168.137.2', '192.168.137.3', '192.168.137.4'])]
+    time.sleep(0.3)
+    assert len(recorder.batches) == 1
+    assert scheduler.pending() == 0
+
+
+def test_last_action_wins_within_a_batch(run_scheduler):
+    recorder = Recorder()
+    scheduler = run_scheduler(recorder, coalesce_window=0.5)
+    due = time.time() + 0.1
+    scheduler.schedule_once('block', '192.168.137.2', due)
+    scheduler.schedule_once('unblock', '192.168.137.2', due + 0.1)
+    scheduler.schedule_once('block', '192.168.137.3', due)
+    scheduler.start()
+    recorder.wait(2, timeout=1)
+    assert recorder.batches == [('unblock', ['192.168.137.2']), ('block', ['192.168.137.3'])]
+
+
+def test_cancelled_job_does_not_fire(run_scheduler):
+    recorder = Recorder()
+    scheduler = run_scheduler(recorder, coalesce_window=0)
+    job = scheduler.schedule_once('block', '192.168.137.2', time.time() + 0.2)
+    assert scheduler.cancel(job['id'])
+    scheduler.start()
+    time.sleep(0.4)
+    assert recorder.batches == []